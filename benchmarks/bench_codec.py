@@ -0,0 +1,54 @@
+"""
+Microbenchmark: encode/decode throughput and size of block records with the
+binary codec versus the JSON path (json.dumps / json.loads + Block.from_record).
+
+Run from the repository root:  python -m benchmarks.bench_codec
+"""
+import json
+import time
+
+from src import codec
+from src.block import Block, BLOCK_VERSION
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+ROUNDS = 2000
+
+
+def make_block(transactions_count):
+    sender = Wallet()
+    transactions = []
+    for i in range(transactions_count):
+        tx = Transaction(sender.address, sender.public_key, Wallet().address, i + 1, fee=1)
+        tx.sign_transaction(sender.private_key)
+        transactions.append(tx)
+    return Block(1, "0" * 64, Block.encode_transactions(transactions), miner=sender.address, difficulty=20, version=BLOCK_VERSION)
+
+
+def bench(fn, rounds=ROUNDS):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return rounds / (time.perf_counter() - started)
+
+
+def main():
+    for transactions_count in (0, 10, 100):
+        block = make_block(transactions_count)
+        record = block.to_record()
+        json_payload = json.dumps(record).encode()
+        binary_payload = codec.encode_record(record)
+        rates = {
+            "json encode": bench(lambda: json.dumps(record).encode()),
+            "binary encode": bench(lambda: codec.encode_record(record)),
+            "json decode": bench(lambda: Block.from_record(json.loads(json_payload))),
+            "binary decode": bench(lambda: codec.decode_block(binary_payload)),
+        }
+        print(f"{transactions_count:>4} txs: json {len(json_payload):>7,} B | binary {len(binary_payload):>7,} B "
+              f"(x{len(json_payload) / len(binary_payload):.2f} smaller)")
+        for name, rate in rates.items():
+            print(f"    {name:<14} {rate:>10,.0f} blocks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Microbenchmark: per-nonce hashing with Block.calculate_hash versus the
+precomputed prefix/midstate path returned by Block.nonce_hasher.
+
+Run from the repository root:  python -m benchmarks.bench_hashing
+"""
+import json
+import time
+
+from src.block import Block, LEGACY_VERSION, MERKLE_VERSION
+
+ATTEMPTS = 100000
+
+
+def make_block(transactions_count, version=LEGACY_VERSION):
+    transactions = json.dumps([{"tx_id": f"{i:064x}", "amount": i} for i in range(transactions_count)])
+    return Block(1, "0" * 64, transactions, miner="bench", difficulty=64, version=version, merkle_root="0" * 64)
+
+
+def bench_calculate_hash(block, attempts=ATTEMPTS):
+    started = time.perf_counter()
+    for nonce in range(attempts):
+        block.nonce = nonce
+        block.calculate_hash()
+    return attempts / (time.perf_counter() - started)
+
+
+def bench_nonce_hasher(block, attempts=ATTEMPTS):
+    started = time.perf_counter()
+    hasher, suffix = block.nonce_hasher()
+    for nonce in range(attempts):
+        h = hasher.copy()
+        h.update(str(nonce).encode() + suffix)
+        h.hexdigest()
+    return attempts / (time.perf_counter() - started)
+
+
+def main():
+    for version in (LEGACY_VERSION, MERKLE_VERSION):
+        for transactions_count in (0, 10, 100):
+            block = make_block(transactions_count, version)
+            slow = bench_calculate_hash(block)
+            fast = bench_nonce_hasher(block)
+            print(f"v{version} {transactions_count:>4} txs: calculate_hash {slow:>12,.0f} H/s | "
+                  f"nonce_hasher {fast:>12,.0f} H/s | x{fast / slow:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Benchmark suite: mining, validation, storage, snapshots, signature checks and multi-node sync.
+Results are written as JSON so runs can be compared across commits.
+
+Run from the repository root:
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --heights 10000 100000 1000000
+    python -m benchmarks.run --quick --compare results.json   # exits with 1 on a regression
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from threading import Event, Thread, Timer
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+from benchmarks.bench_hashing import bench_calculate_hash, make_block
+from src import difficulty
+from src.block import Block, BLOCK_VERSION, MINER_HASHES
+from src.blockchain import Blockchain
+from src.node import Node
+from src.node_api import NodeAPI
+from src.snapshot import export_snapshot, import_snapshot
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+DEFAULT_HEIGHTS = (10000, 100000)
+QUICK_HEIGHTS = (1000,)
+DEFAULT_THRESHOLD = 0.15  # Allowed relative slowdown before a result counts as a regression
+THRESHOLDS = {  # Noisier benchmarks get more slack
+    "sync_blocks_per_sec": 0.30,
+    "mine_block_hashes_per_sec": 0.25,
+}
+
+
+class Results:
+    """Keeps the best value of every benchmark over the repeated rounds, which filters out scheduling noise."""
+
+    def __init__(self):
+        self.results = {}
+
+    def add(self, name, value, unit, higher_is_better=True):
+        print(f"  {name:<40} {value:>14,.2f} {unit}")
+        previous = self.results.get(name)
+        if previous and (previous["value"] >= value) == higher_is_better:
+            return
+        self.results[name] = {"value": round(value, 3), "unit": unit, "higher_is_better": higher_is_better}
+
+
+_chains = {}
+
+
+def make_chain(height, miner="bench"):
+    """
+    A valid chain of empty blocks at the lowest difficulty, timestamped one target
+    interval apart in the past so retargeting keeps the difficulty constant.
+    Generated once per height and reused by later rounds.
+    """
+    if height in _chains:
+        return _chains[height]
+    start = time.time() - (height + 1) * difficulty.TARGET_BLOCK_TIME
+    genesis = Block(0, "empty_hash", "Genesis Block", miner=miner, difficulty=0, timestamp=start)
+    chain = [genesis]
+    for index in range(1, height + 1):
+        block = Block(index, chain[-1].hash, "empty", miner, difficulty=difficulty.MIN_BITS,
+                      timestamp=start + index * difficulty.TARGET_BLOCK_TIME, version=BLOCK_VERSION)
+        block.mine_block()
+        chain.append(block)
+    _chains[height] = chain
+    return chain
+
+
+def bench_hashing(results):
+    block = make_block(0, BLOCK_VERSION)
+    results.add("calculate_hash_per_sec", bench_calculate_hash(block), "H/s")
+
+    # Unreachable difficulty, stopped after one second: hashes counted by the miner metrics
+    block = Block(1, "0" * 64, "empty", "bench", difficulty=128, version=BLOCK_VERSION)
+    stop_event = Event()
+    before = MINER_HASHES.get(worker="in-process")
+    started = time.perf_counter()
+    Timer(1.0, stop_event.set).start()
+    block.mine_block(stop_event)
+    hashes = MINER_HASHES.get(worker="in-process") - before
+    results.add("mine_block_hashes_per_sec", hashes / (time.perf_counter() - started), "H/s")
+
+
+def bench_validation_and_storage(results, heights):
+    chain = make_chain(max(heights))
+    for height in sorted(heights):
+        blockchain = Blockchain(node_id=f"bench_{height}", difficulty=0, mining_workers=1)
+        blocks = chain[:height + 1]
+
+        started = time.perf_counter()
+        assert blockchain.validate_chain(blocks)
+        results.add(f"validate_chain_{height}_blocks_per_sec", height / (time.perf_counter() - started), "blocks/s")
+
+        blockchain.chain = blocks
+        started = time.perf_counter()
+        blockchain.save_chain()
+        results.add(f"save_chain_{height}_seconds", time.perf_counter() - started, "s", higher_is_better=False)
+        blockchain.store.close()
+        blockchain.index.close()
+
+        for full_verify in (False, True):
+            started = time.perf_counter()
+            reloaded = Blockchain(node_id=f"bench_{height}", difficulty=0, mining_workers=1, full_verify=full_verify)
+            name = "load_chain_full_verify" if full_verify else "load_chain_checkpoint"
+            results.add(f"{name}_{height}_seconds", time.perf_counter() - started, "s", higher_is_better=False)
+            assert len(reloaded.chain) == height + 1
+            reloaded.store.close()
+            reloaded.index.close()
+
+        # Another node bootstrapped from a snapshot of this chain
+        source = Blockchain(node_id=f"bench_{height}", difficulty=0, mining_workers=1)
+        started = time.perf_counter()
+        export_snapshot(source, f"bench_{height}.snap")
+        results.add(f"snapshot_export_{height}_seconds", time.perf_counter() - started, "s", higher_is_better=False)
+        source.store.close()
+        source.index.close()
+        started = time.perf_counter()
+        import_snapshot(f"bench_{height}.snap", f"bench_import_{height}", force=True)
+        results.add(f"snapshot_import_{height}_seconds", time.perf_counter() - started, "s", higher_is_better=False)
+
+
+def bench_signatures(results, count=500):
+    wallet = Wallet()
+    transactions = []
+    for i in range(count):
+        tx = Transaction(wallet.address, wallet.public_key, Wallet().address, i + 1, fee=1)
+        tx.sign_transaction(wallet.private_key)
+        transactions.append(tx)
+    started = time.perf_counter()
+    assert all(tx.is_valid() for tx in transactions)
+    results.add("transaction_verify_per_sec", count / (time.perf_counter() - started), "tx/s")
+
+
+def start_node(node_id, **kwargs):
+    """A node served over HTTP on a free local port, in a background thread. Also used by the tests' start_node fixture."""
+    app = Flask(node_id)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    node = Node(app=app, node_id=node_id, port=server.server_port, mining_workers=1, **kwargs)
+    node.node_url = f"http://127.0.0.1:{server.server_port}"
+    NodeAPI(app, node)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return node, server
+
+
+def bench_sync(results, height):
+    """Node B starts from A's genesis block and downloads A's chain over HTTP."""
+    chain = make_chain(height)
+    node_a, server_a = start_node("bench_sync_a")
+    node_a.blockchain.chain = chain
+    node_a.blockchain.save_chain()
+    node_a.blockchain.tree.reset(chain)
+
+    node_b, server_b = start_node("bench_sync_b")
+    node_b.blockchain.chain = chain[:1]
+    node_b.blockchain.save_chain()
+    node_b.blockchain.tree.reset(node_b.blockchain.chain)
+
+    started = time.perf_counter()
+    node_b.sync_chain(peers=[node_a.node_url])
+    elapsed = time.perf_counter() - started
+    assert node_b.blockchain.get_latest_block().hash == chain[-1].hash
+    results.add("sync_blocks_per_sec", height / elapsed, "blocks/s")
+    for server in (server_a, server_b):
+        server.shutdown()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Print the change of every result present in both runs. Returns the names of the regressions."""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit')}:")
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if not previous or not previous["value"]:
+            continue
+        change = (result["value"] - previous["value"]) / previous["value"]
+        worse = -change if result["higher_is_better"] else change
+        allowed = THRESHOLDS.get(name, threshold)
+        flag = "REGRESSION" if worse > allowed else ""
+        print(f"  {name:<40} {previous['value']:>14,.2f} -> {result['value']:>14,.2f} ({change:+.1%}) {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--heights", type=int, nargs="+", help=f"chain heights for validation and storage (default {DEFAULT_HEIGHTS})")
+    parser.add_argument("--sync-height", type=int, default=2000, help="blocks downloaded by the sync benchmark")
+    parser.add_argument("--quick", action="store_true", help=f"small heights {QUICK_HEIGHTS} for a fast check")
+    parser.add_argument("--repeat", type=int, default=3, help="rounds to run, the best result of each benchmark is kept")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    heights = args.heights or (QUICK_HEIGHTS if args.quick else DEFAULT_HEIGHTS)
+    sync_height = min(args.sync_height, 200) if args.quick else args.sync_height
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = Results()
+    cwd = os.getcwd()
+    for round_number in range(1, args.repeat + 1):
+        print(f"Round {round_number}/{args.repeat}")
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)  # Nodes keep their chain files under ./blockchain
+            try:
+                bench_hashing(results)
+                bench_signatures(results)
+                bench_validation_and_storage(results, heights)
+                bench_sync(results, sync_height)
+            finally:
+                os.chdir(cwd)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.time(),
+            "heights": list(heights),
+            "repeat": args.repeat,
+            "sync_height": sync_height
+        },
+        "results": results.results
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+    if baseline and compare(results.results, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
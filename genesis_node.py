@@ -1,10 +1,11 @@
+import argparse
 from flask import Flask, jsonify
 from src.node import Node
 from src.node_api import NodeAPI
 
 class GenesisNode(Node):
-    def __init__(self, app, node_id, port, peers=None):
-        super().__init__(app=app, node_id=node_id, port=port, peers=peers)
+    def __init__(self, app, node_id, port, peers=None, full_verify=False, miner_address=None, headers_only=False):
+        super().__init__(app=app, node_id=node_id, port=port, peers=peers, full_verify=full_verify, miner_address=miner_address, headers_only=headers_only)
         # Define additional routes for the genesis node
 
         @self.app.route('/status')
@@ -14,7 +15,14 @@ class GenesisNode(Node):
         # You could add special testing/debug endpoints here
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full-verify", action="store_true", help="validate the whole chain from genesis, ignoring the checkpoint")
+    parser.add_argument("--miner-address", help="wallet address credited with block rewards and fees")
+    parser.add_argument("--headers-only", action="store_true", help="keep only block headers in memory, read transactions from the block store")
+    parser.add_argument("--async-runtime", action="store_true", help="serve connections on an asyncio event loop instead of Flask's threaded server")
+    args = parser.parse_args()
+
     app = Flask(__name__)
-    node = GenesisNode(app=app, node_id="genesis_node", port=5000)
+    node = GenesisNode(app=app, node_id="genesis_node", port=5000, full_verify=args.full_verify, miner_address=args.miner_address, headers_only=args.headers_only)
     api = NodeAPI(app, node)
-    node.run()
\ No newline at end of file
+    node.run(async_runtime=args.async_runtime)
\ No newline at end of file
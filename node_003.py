@@ -1,9 +1,17 @@
+import argparse
 from src.node import Node
 from flask import Flask
 from src.node_api import NodeAPI
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--full-verify", action="store_true", help="validate the whole chain from genesis, ignoring the checkpoint")
+    parser.add_argument("--miner-address", help="wallet address credited with block rewards and fees")
+    parser.add_argument("--headers-only", action="store_true", help="keep only block headers in memory, read transactions from the block store")
+    parser.add_argument("--async-runtime", action="store_true", help="serve connections on an asyncio event loop instead of Flask's threaded server")
+    args = parser.parse_args()
+
     app = Flask(__name__)
-    node = Node(app=app, node_id="node_003", port=5003, peers=["http://localhost:5000", "http://localhost:5002"])
+    node = Node(app=app, node_id="node_003", port=5003, peers=["http://localhost:5000", "http://localhost:5002"], full_verify=args.full_verify, miner_address=args.miner_address, headers_only=args.headers_only)
     api = NodeAPI(app, node)
-    node.run()
+    node.run(async_runtime=args.async_runtime)
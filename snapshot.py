@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import time
+from src.blockchain import Blockchain
+from src.snapshot import SnapshotError, export_snapshot, import_snapshot, read_manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a node's chain and state to a snapshot file, or start a node's data from one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write a snapshot of a node's chain (stop the node first)")
+    export.add_argument("path", help="snapshot file to write")
+    export.add_argument("--node-id", required=True, help="node whose chain is exported, e.g. genesis_node")
+
+    load = commands.add_parser("import", help="build a node's block store, index and state from a snapshot")
+    load.add_argument("path", help="snapshot file to read")
+    load.add_argument("--node-id", required=True, help="node the chain is imported for, e.g. node_002")
+    load.add_argument("--workers", type=int, help="processes decoding and checking chunks (default: every core)")
+    load.add_argument("--skip-signatures", action="store_true", help="trust transaction signatures, check hashes, PoW and Merkle roots only")
+    load.add_argument("--force", action="store_true", help="replace the node's existing chain")
+
+    info = commands.add_parser("info", help="print the tip and size of a snapshot")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    started = time.time()
+    try:
+        if args.command == "export":
+            blockchain = Blockchain(node_id=args.node_id, mining_workers=1)
+            manifest = export_snapshot(blockchain, args.path)
+            blockchain.validator.shutdown()
+            print(f"📦 Exported {manifest['height'] + 1} blocks in {len(manifest['chunks'])} chunks to {args.path} "
+                  f"({os.path.getsize(args.path):,} bytes) in {time.time() - started:.1f}s")
+        elif args.command == "import":
+            manifest = import_snapshot(args.path, args.node_id, workers=args.workers,
+                                       verify_signatures=not args.skip_signatures, force=args.force)
+            print(f"✅ Imported {manifest['height'] + 1} blocks for {args.node_id} in {time.time() - started:.1f}s, "
+                  f"tip {manifest['tip_hash']}")
+        else:
+            manifest = read_manifest(args.path)
+            print(f"Node:      {manifest['node_id']}")
+            print(f"Height:    {manifest['height']}")
+            print(f"Tip:       {manifest['tip_hash']}")
+            print(f"Chunks:    {len(manifest['chunks'])}")
+            print(f"Addresses: {len(manifest['state']['balances'])}")
+            print(f"Created:   {time.ctime(manifest['created'])}")
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
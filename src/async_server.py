@@ -0,0 +1,362 @@
+"""
+Asyncio runtime for a node, an alternative to Flask's threaded server (Node.run(async_runtime=True)).
+
+Connections live on one event loop, so idle keep-alive connections and /stream subscribers
+cost a coroutine instead of a thread. The NodeAPI routes run unchanged in thread pools:
+their blocking peer calls, hashing, signature checks and validation never block the loop,
+and the event loop keeps accepting and reading requests while they run.
+Block and transaction relay routes get a pool of their own, so slow /sync calls and chain
+downloads cannot delay an incoming block.
+"""
+import asyncio
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from threading import Event, Thread
+from urllib.parse import unquote_to_bytes, urlsplit
+
+from . import metrics
+from .event_bus import HEARTBEAT
+
+WORKERS = 32  # Threads running NodeAPI handlers
+RELAY_WORKERS = 8  # Threads reserved for the routes below
+RELAY_PATHS = frozenset({"/receive_block", "/compact_block", "/inv", "/tx_inv", "/submit_transaction", "/submit_transactions"})
+KEEP_ALIVE = 75  # Seconds an idle connection stays open
+MAX_HEADER_BYTES = 65536
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+CONNECTIONS = metrics.gauge("http_connections", "Open HTTP connections of the async runtime")
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class HttpRequest:
+    __slots__ = ("method", "target", "version", "headers", "body")
+
+    def __init__(self, method, target, version, headers, body):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers  # Lowercase name -> value, repeated headers joined with ","
+        self.body = body
+
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+def _head(version, status, headers):
+    lines = [f"{version} {status}"] + [f"{name}: {value}" for name, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _chunk(data):
+    return b"%x\r\n%s\r\n" % (len(data), data)
+
+
+def _error_response(status, message, version="HTTP/1.1"):
+    body = json.dumps({"error": message}).encode()
+    status = HTTPStatus(status)
+    return _head(version, f"{status.value} {status.phrase}", [
+        ("Content-Type", "application/json"), ("Content-Length", len(body)), ("Connection", "close")]) + body
+
+
+class AsyncNodeServer:
+    def __init__(self, node, host="127.0.0.1", port=None, workers=WORKERS, relay_workers=RELAY_WORKERS, heartbeat=HEARTBEAT):
+        self.node = node
+        self.heartbeat = heartbeat  # Seconds between keep-alive comments on idle /stream connections
+        self.app = node.app
+        self.host = host
+        self.port = node.port if port is None else port
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http")
+        self.relay_executor = ThreadPoolExecutor(max_workers=relay_workers, thread_name_prefix="http-relay")
+        self.loop = None
+        self.server = None
+        self.connections = 0
+        self._published = None  # asyncio.Event set when the event bus publishes, then replaced
+        self._wake_pending = False
+
+
+    # Lifecycle
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._published = asyncio.Event()
+        self.node.events.add_listener(self._on_publish)
+        CONNECTIONS.set_function(lambda: self.connections)
+        self.server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_HEADER_BYTES, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"🚀 Async runtime serving on http://{self.host}:{self.port}")
+
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+
+    def run(self):
+        asyncio.run(self.serve_forever())
+
+
+    def serve_in_background(self):
+        """Run the event loop in a daemon thread. Returns once the server is listening."""
+        started = Event()
+        async def main():
+            await self.start()
+            started.set()
+            async with self.server:
+                try:
+                    await self.server.serve_forever()
+                except asyncio.CancelledError:
+                    pass
+        Thread(target=asyncio.run, args=(main(),), name="async-runtime", daemon=True).start()
+        started.wait()
+        return self.port
+
+
+    def shutdown(self):
+        """Stop listening, from any thread. Open /stream connections end with the loop."""
+        self.node.events.remove_listener(self._on_publish)
+        if self.loop is not None and self.server is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.server.close)
+        self.executor.shutdown(wait=False)
+        self.relay_executor.shutdown(wait=False)
+
+
+    # Event bus -> /stream subscribers
+
+    def _on_publish(self):
+        """Called by the publishing thread: wake the waiting streams once per loop iteration."""
+        if not self._wake_pending and not self.loop.is_closed():
+            self._wake_pending = True
+            try:
+                self.loop.call_soon_threadsafe(self._wake_streams)
+            except RuntimeError:  # The loop closed since the check
+                pass
+
+
+    def _wake_streams(self):
+        self._wake_pending = False
+        published, self._published = self._published, asyncio.Event()
+        published.set()
+
+
+    async def _stream(self, request, writer):
+        bus = self.node.events
+        try:
+            last_event_id = int(request.headers["last-event-id"])
+        except (KeyError, ValueError):
+            last_event_id = None
+        subscription = bus.subscribe(last_event_id)
+        if subscription is None:
+            writer.write(_error_response(503, "Too many subscribers", request.version))
+            await writer.drain()
+            return
+        try:
+            writer.write(_head("HTTP/1.1", "200 OK", [
+                ("Content-Type", "text/event-stream"), ("Cache-Control", "no-cache"),
+                ("X-Accel-Buffering", "no"), ("Transfer-Encoding", "chunked")]))
+            writer.write(_chunk(b"retry: 3000\n\n"))
+            await writer.drain()
+            while True:
+                published = self._published  # Taken before reading, a publish in between still wakes us
+                events = bus.get(subscription, timeout=0)
+                if events:
+                    writer.write(_chunk("".join(event.to_sse() for event in events).encode()))
+                else:
+                    try:
+                        await asyncio.wait_for(published.wait(), self.heartbeat)
+                        continue
+                    except asyncio.TimeoutError:
+                        writer.write(_chunk(b": keep-alive\n\n"))
+                await writer.drain()
+        finally:
+            bus.unsubscribe(subscription)
+
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE)
+                except BadRequest as e:
+                    writer.write(_error_response(e.status, str(e)))
+                    await writer.drain()
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                if request is None:
+                    break
+                path = urlsplit(request.target).path
+                if path == "/stream" and request.method == "GET":
+                    await self._stream(request, writer)
+                    break
+                executor = self.relay_executor if path in RELAY_PATHS else self.executor
+                keep_alive = await self.loop.run_in_executor(executor, self._call_app, request, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+    async def _read_request(self, reader):
+        """Next request on the connection, None when the client closed it."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise BadRequest(400, "Incomplete request")
+            return None
+        except asyncio.LimitOverrunError:
+            raise BadRequest(431, "Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise BadRequest(400, "Malformed request line")
+        if version not in ("HTTP/1.0", "HTTP/1.1"):
+            raise BadRequest(505, "HTTP version not supported")
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise BadRequest(400, "Malformed header")
+            name = name.strip().lower()
+            headers[name] = f"{headers[name]},{value.strip()}" if name in headers else value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            body = await self._read_chunked(reader)
+        else:
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                raise BadRequest(400, "Invalid Content-Length")
+            if length < 0 or length > MAX_BODY_BYTES:
+                raise BadRequest(413, "Request body too large")
+            body = await reader.readexactly(length) if length else b""
+        return HttpRequest(method, target, version, headers, body)
+
+
+    async def _read_chunked(self, reader):
+        body = bytearray()
+        while True:
+            try:
+                size = int((await reader.readline()).split(b";")[0], 16)
+            except ValueError:
+                raise BadRequest(400, "Malformed chunk")
+            if size == 0:
+                while (await reader.readline()).strip():  # Trailers
+                    pass
+                return bytes(body)
+            if len(body) + size > MAX_BODY_BYTES:
+                raise BadRequest(413, "Request body too large")
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+
+
+    def _environ(self, request, writer):
+        url = urlsplit(request.target)
+        peername = writer.get_extra_info("peername") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote_to_bytes(url.path).decode("latin-1"),
+            "QUERY_STRING": url.query,
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": str(self.port),
+            "SERVER_PROTOCOL": request.version,
+            "REMOTE_ADDR": peername[0],
+            "REMOTE_PORT": str(peername[1]),
+            "CONTENT_LENGTH": str(len(request.body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(request.body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in request.headers.items():
+            if name == "content-type":
+                environ["CONTENT_TYPE"] = value
+            elif name not in ("content-length", "transfer-encoding"):
+                environ["HTTP_" + name.upper().replace("-", "_")] = value
+        return environ
+
+
+    def _call_app(self, request, writer):
+        """
+        Run the Flask app for one request on a worker thread and send its response.
+        Responses without a length (streamed block downloads) use chunked encoding.
+        Returns whether the connection can serve another request.
+        """
+        response = {}
+        def start_response(status, headers, exc_info=None):
+            response["status"] = status
+            response["headers"] = headers
+
+        def send(data):
+            asyncio.run_coroutine_threadsafe(self._write(writer, data), self.loop).result()
+
+        keep_alive = request.keep_alive()
+        result = self.app(self._environ(request, writer), start_response)
+        try:
+            head_sent = False
+            chunked = False
+            for data in result:
+                if not data:
+                    continue
+                if not head_sent:
+                    chunked = self._has_no_length(response["headers"]) and request.version == "HTTP/1.1"
+                    keep_alive = keep_alive and (chunked or not self._has_no_length(response["headers"]))
+                    send(self._response_head(request, response, keep_alive, chunked))
+                    head_sent = True
+                if request.method != "HEAD":
+                    send(_chunk(data) if chunked else data)
+            if not head_sent:
+                headers = response["headers"]
+                if self._has_no_length(headers):
+                    headers = headers + [("Content-Length", "0")]
+                send(self._response_head(request, dict(response, headers=headers), keep_alive, False))
+            elif chunked:
+                send(b"0\r\n\r\n")
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return keep_alive
+
+
+    @staticmethod
+    def _has_no_length(headers):
+        return not any(name.lower() == "content-length" for name, _ in headers)
+
+
+    @staticmethod
+    def _response_head(request, response, keep_alive, chunked):
+        headers = [(name, value) for name, value in response["headers"] if name.lower() != "connection"]
+        if chunked:
+            headers.append(("Transfer-Encoding", "chunked"))
+        headers.append(("Connection", "keep-alive" if keep_alive else "close"))
+        return _head(request.version, response["status"], headers)
+
+
+    async def _write(self, writer, data):
+        writer.write(data)
+        await writer.drain()
@@ -1,24 +1,87 @@
 import hashlib
+import sys
 import time
 import json
 from .transaction import Transaction
+from .merkle import merkle_root, merkle_proof
+from .difficulty import leading_zero_bits, target_bytes
+from . import metrics
+
+LEGACY_VERSION = 1  # Header hashes the full transactions payload
+MERKLE_VERSION = 2  # Header commits to the Merkle root of the transaction ids
+BITS_VERSION = 3  # Merkle header, difficulty counts leading zero bits instead of hex digits
+BLOCK_VERSION = BITS_VERSION  # Version of newly mined blocks
+
+NONCE_MARKER = json.dumps("\x00nonce")  # Placeholder that splits the header around the nonce
+
+MINER_HASHES = metrics.counter("miner_hashes_total", "Nonces tried, per mining worker")
+MINER_HASH_RATE = metrics.gauge("miner_hash_rate", "Hashes per second of the last mining run, per mining worker")
 
 # Block class with PoW
 class Block:
-    def __init__(self, index, previous_hash, transactions: list[Transaction], miner, difficulty=1, timestamp=None, nonce=0, hash=None):
+    # Slots instead of a per-instance dict: a node keeps every block of the chain in memory
+    __slots__ = ("index", "previous_hash", "timestamp", "_transactions", "_load_body", "miner", "difficulty",
+                 "nonce", "hash", "version", "merkle_root")
+
+    def __init__(self, index, previous_hash, transactions: list[Transaction], miner, difficulty=1, timestamp=None, nonce=0, hash=None, version=LEGACY_VERSION, merkle_root=None):
         self.index = index
         self.previous_hash = previous_hash
         self.timestamp = round(timestamp or time.time(), 6)
+        self._load_body = None
         self.transactions = transactions
         self.miner = miner
-        self.difficulty = difficulty  # Number of leading zeros required in hash
+        self.difficulty = difficulty  # Leading zeros required in hash: hex digits, bits from BITS_VERSION on
         self.nonce = nonce
+        self.version = version
+        self.merkle_root = merkle_root
+        if version >= MERKLE_VERSION and merkle_root is None:
+            self.merkle_root = self.compute_merkle_root()
         self.hash = hash or self.calculate_hash()
         
 
-    def calculate_hash(self):
-        """Returns SHA-256 hash of block data."""
-        block_dict = {
+    @property
+    def transactions(self):
+        """Raw transactions field. Evicted bodies are read back through the loader on every access."""
+        if self._transactions is None and self._load_body is not None:
+            return self._load_body(self)
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, transactions):
+        self._transactions = transactions
+        self._load_body = None
+
+
+    def evict_body(self, load_body):
+        """Drop the transactions from memory, load_body(block) returns them when they are needed again."""
+        self._transactions = None
+        self._load_body = load_body
+
+
+    def restore_body(self):
+        """Keep the transactions resident again, e.g. before the storage they were paged from is rewritten."""
+        if self._load_body is not None:
+            self.transactions = self._load_body(self)
+
+
+    def has_body(self):
+        return self._load_body is None
+
+
+    def hash_fields(self):
+        if self.version >= MERKLE_VERSION:
+            # The body is committed through the Merkle root, hashing cost does not grow with block size
+            return {
+                "version": self.version,
+                "index": self.index,
+                "previous_hash": self.previous_hash,
+                "timestamp": self.timestamp,
+                "merkle_root": self.merkle_root,
+                "miner": self.miner,
+                "difficulty": self.difficulty,
+                "nonce": self.nonce
+            }
+        return {
             "index": self.index,
             "previous_hash": self.previous_hash,
             "timestamp": self.timestamp,
@@ -27,22 +90,73 @@ class Block:
             "difficulty": self.difficulty,
             "nonce": self.nonce
         }
-        block_string = json.dumps(block_dict, sort_keys=True).encode()
+
+
+    def calculate_hash(self):
+        """Returns SHA-256 hash of block data."""
+        block_string = json.dumps(self.hash_fields(), sort_keys=True).encode()
         return hashlib.sha256(block_string).hexdigest()
-    
-    
+
+
+    def nonce_hasher(self):
+        """
+        Mining fast path. Serializes the header once and returns (prefix hasher, suffix bytes):
+        hasher.copy() fed with str(nonce) and the suffix gives the same hash as calculate_hash.
+        """
+        fields = self.hash_fields()
+        fields["nonce"] = "\x00nonce"
+        head, tail = json.dumps(fields, sort_keys=True).split(f'"nonce": {NONCE_MARKER}')
+        prefix = hashlib.sha256((head + '"nonce": ').encode())
+        return prefix, tail.encode()
+
+
+    def difficulty_bits(self):
+        """Difficulty as leading zero bits, whatever the block version (a hex digit is 4 bits)."""
+        return self.difficulty if self.version >= BITS_VERSION else 4 * self.difficulty
+
+
+    def meets_difficulty(self):
+        """Proof of Work check: the hash has at least `difficulty_bits()` leading zero bits."""
+        return leading_zero_bits(self.hash) >= self.difficulty_bits()
+
+
+    def work(self):
+        """Expected number of hashes needed to mine this block, summed up for chain selection."""
+        return 2 ** self.difficulty_bits()
+
+
     def mine_block(self, stop_event=None):
         """Proof of Work: Adjust nonce until hash meets difficulty criteria."""
-        prefix = '0' * self.difficulty
-        while not self.hash.startswith(prefix):
+        if self.meets_difficulty():
+            return self.hash
+        target = target_bytes(self.difficulty_bits())
+        hasher, suffix = self.nonce_hasher()
+        nonce = self.nonce
+        started = time.perf_counter()
+        while True:
             if stop_event and stop_event.is_set():
                 print("⛔ Mining interrupted on Block level!")
+                self._report_hashes(nonce - self.nonce, started)
                 return None
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+            nonce += 1
+            h = hasher.copy()
+            h.update(str(nonce).encode() + suffix)
+            if h.digest() < target:
+                break
+        self._report_hashes(nonce - self.nonce, started)
+        self.nonce = nonce
+        self.hash = h.hexdigest()
         return self.hash
     
 
+    @staticmethod
+    def _report_hashes(hashes, started):
+        elapsed = time.perf_counter() - started
+        MINER_HASHES.inc(hashes, worker="in-process")
+        if elapsed > 0:
+            MINER_HASH_RATE.set(hashes / elapsed, worker="in-process")
+
+
     def to_dict(self):
         return {
             'index': self.index,
@@ -57,6 +171,90 @@ class Block:
 
     def to_json(self):
         return json.dumps(self.to_dict(), indent=4)
+
+
+    def to_record(self):
+        """Flat representation used by block storage (transactions stay a raw string)."""
+        record = {
+            'index': self.index,
+            'previous_hash': self.previous_hash,
+            'timestamp': self.timestamp,
+            'transactions': self.transactions,
+            'miner': self.miner,
+            'difficulty': self.difficulty,
+            'nonce': self.nonce,
+            'hash': self.hash
+        }
+        if self.version >= MERKLE_VERSION:  # Legacy records keep their original shape
+            record['version'] = self.version
+            record['merkle_root'] = self.merkle_root
+        return record
+
+
+    def get_transactions(self):
+        """
+        Transactions of the block as objects. Blocks keep them as a JSON string: one transaction
+        in older blocks, a list in newer ones, and plain text for empty and genesis blocks.
+        """
+        if isinstance(self.transactions, list):
+            return self.transactions
+        try:
+            data = json.loads(self.transactions)
+        except (TypeError, ValueError):
+            return []
+        if isinstance(data, dict):
+            data = [data]
+        return [Transaction.from_dict(tx) for tx in data]
+
+
+    def tx_ids(self):
+        return [tx.tx_id for tx in self.get_transactions()]
+
+
+    def compute_merkle_root(self):
+        return merkle_root(self.tx_ids())
+
+
+    def get_merkle_proof(self, tx_id):
+        """Inclusion proof of a transaction against the header's merkle_root, or None if it is not in the block."""
+        tx_ids = self.tx_ids()
+        if self.version < MERKLE_VERSION or tx_id not in tx_ids:
+            return None
+        return merkle_proof(tx_ids, tx_ids.index(tx_id))
+
+
+    @staticmethod
+    def encode_transactions(transactions):
+        """Transactions field for a new block."""
+        if not transactions:
+            return "empty"
+        return json.dumps([tx.to_dict() for tx in transactions])
+
+
+    def to_header(self):
+        """Block without its transactions, enough to follow and compare chains."""
+        header = self.to_record()
+        del header['transactions']
+        return header
+
+
+    @staticmethod
+    def from_record(data):
+        version = data.get('version')
+        if version is None or version != version:  # Missing, or NaN in a CSV mixing block versions
+            version = LEGACY_VERSION
+        return Block(
+            index=int(data['index']),
+            previous_hash=data['previous_hash'],
+            transactions=data['transactions'],
+            miner=sys.intern(data['miner']),  # A handful of miners sign most blocks, share their strings
+            difficulty=int(data['difficulty']),
+            timestamp=float(data['timestamp']),
+            nonce=int(data['nonce']),
+            hash=data['hash'],
+            version=int(version),
+            merkle_root=data.get('merkle_root') if version >= MERKLE_VERSION else None
+        )
     
 
     def __str__(self):
@@ -65,6 +263,8 @@ class Block:
                 f"  Previous Hash: {self.previous_hash} type: {type(self.previous_hash)}\n" \
                 f"  Timestamp: {self.timestamp} type: {type(self.timestamp)}\n" \
                 f"  Transactions: {self.transactions} type: {type(self.transactions)}\n" \
+                f"  Version: {self.version} type: {type(self.version)}\n" \
+                f"  Merkle Root: {self.merkle_root} type: {type(self.merkle_root)}\n" \
                 f"  Difficulty: {self.difficulty} type: {type(self.difficulty)}\n" \
                 f"  Nonce: {self.nonce} type: {type(self.nonce)}\n" \
                 f"  Hash: {self.hash} type: {type(self.hash)}\n" \
@@ -74,8 +274,8 @@ class Block:
     def __eq__(self, other):
         if not isinstance(other, Block):
             return False
-        transactions = [tx.to_dict() for tx in self.transactions]
-        other_transactions = [tx.to_dict() for tx in other.transactions]
+        transactions = [tx.to_dict() for tx in self.get_transactions()]
+        other_transactions = [tx.to_dict() for tx in other.get_transactions()]
         if len(transactions) != len(other_transactions):
             return False
         for i in range(len(transactions)):
@@ -89,13 +289,17 @@ class Block:
             self.miner == other.miner and
             self.difficulty == other.difficulty and
             self.nonce == other.nonce and
+            self.version == other.version and
+            self.merkle_root == other.merkle_root and
             self.hash == other.hash
         )
 
 
     @staticmethod
     def from_dict(data):
-        transactions = [Transaction.from_dict(tx) for tx in data['transactions']]
+        transactions = data['transactions']
+        if not isinstance(transactions, str):  # Blocks on the wire keep transactions as a raw JSON string
+            transactions = [Transaction.from_dict(tx) for tx in transactions]
         block = Block(
             index=data['index'],
             previous_hash=data['previous_hash'],
@@ -104,7 +308,9 @@ class Block:
             miner=data['miner'],
             difficulty=data['difficulty'],
             nonce=data['nonce'],
-            hash=data['hash']
+            hash=data['hash'],
+            version=data.get('version', LEGACY_VERSION),
+            merkle_root=data.get('merkle_root')
         )
         if block.hash != block.calculate_hash():
             print(f"Invalid block {block.index} from dictionary: hash {block.hash} does not match calculated hash {block.calculate_hash()}.")
@@ -0,0 +1,189 @@
+import json
+import os
+import struct
+import zlib
+from threading import Lock
+
+from . import codec
+from . import metrics
+
+RECORD_HEADER = struct.Struct("<II")  # payload length, crc32 of payload
+INDEX_ENTRY = struct.Struct("<Q")  # offset of a record in the data file
+
+WRITE_SECONDS = metrics.histogram("store_write_seconds", "Time to append one block record to the block store")
+SYNC_SECONDS = metrics.histogram("store_sync_seconds", "Time to fsync the block store")
+
+
+class BlockStore:
+    """
+    Append-only block storage.
+    The data file is a sequence of length-prefixed, checksummed records, one per block.
+    The index file holds the offset of every record, so blocks can be read by height.
+    Writes are flushed on every append and fsynced in batches of `sync_every` blocks.
+    Records are JSON, or the compact binary codec with binary=True. Both can be read from any store.
+    """
+
+    def __init__(self, path, sync_every=16, binary=False):
+        self.data_path = f"{path}.dat"
+        self.index_path = f"{path}.idx"
+        self.sync_every = sync_every
+        self.binary = binary
+        self.offsets = []
+        self._unsynced = 0
+        self.lock = Lock()  # Nodes append and read from several request threads
+
+        os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
+        for file_path in (self.data_path, self.index_path):
+            if not os.path.exists(file_path):
+                open(file_path, "wb").close()
+        self.data_file = open(self.data_path, "r+b")
+        self.index_file = open(self.index_path, "r+b")
+        self._recover()
+
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+    def _read_at(self, offset):
+        """Returns (payload, end offset) of the record at offset, or (None, offset) if it is torn."""
+        self.data_file.seek(offset)
+        header = self.data_file.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None, offset
+        length, checksum = RECORD_HEADER.unpack(header)
+        payload = self.data_file.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return None, offset
+        return payload, offset + RECORD_HEADER.size + length
+
+
+    def _recover(self):
+        """Rebuild a consistent state after a crash: drop torn records and re-index unindexed ones."""
+        raw = self.index_file.read()
+        count = len(raw) // INDEX_ENTRY.size
+        offsets = [INDEX_ENTRY.unpack_from(raw, i * INDEX_ENTRY.size)[0] for i in range(count)]
+        data_size = os.path.getsize(self.data_path)
+
+        # Drop index entries pointing past the data file or at a torn record
+        end = 0
+        while offsets:
+            if offsets[-1] < data_size:
+                payload, end = self._read_at(offsets[-1])
+                if payload is not None:
+                    break
+            offsets.pop()
+            end = 0
+
+        # Pick up records that were written but never made it into the index
+        while True:
+            payload, next_end = self._read_at(end)
+            if payload is None:
+                break
+            offsets.append(end)
+            end = next_end
+
+        if end < data_size:
+            print(f"⚠️  Truncating torn record at offset {end} in {self.data_path}")
+        self.data_file.truncate(end)
+        self.offsets = offsets
+        self._rewrite_index()
+
+
+    def _rewrite_index(self):
+        self.index_file.seek(0)
+        self.index_file.truncate()
+        self.index_file.write(b"".join(INDEX_ENTRY.pack(offset) for offset in self.offsets))
+        self.sync()
+
+
+    def _encode(self, record):
+        return codec.encode_record(record) if self.binary else json.dumps(record).encode()
+
+
+    @staticmethod
+    def _decode(payload):
+        return codec.decode_record(payload) if payload[0] == codec.FORMAT else json.loads(payload)
+
+
+    @metrics.timed(WRITE_SECONDS)
+    def append(self, record):
+        """Append one block record (a dict) to the end of the store."""
+        payload = self._encode(record)
+        with self.lock:
+            self.data_file.seek(0, os.SEEK_END)
+            offset = self.data_file.tell()
+            self.data_file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self.index_file.seek(0, os.SEEK_END)
+            self.index_file.write(INDEX_ENTRY.pack(offset))
+            self.offsets.append(offset)
+
+            self.data_file.flush()
+            self.index_file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self.sync()
+
+
+    def append_encoded(self, payloads):
+        """
+        Append records already in the binary codec (codec.encode_record), e.g. from a snapshot,
+        and fsync once at the end.
+        """
+        with self.lock:
+            self.data_file.seek(0, os.SEEK_END)
+            offset = self.data_file.tell()
+            data, offsets = [], []
+            for payload in payloads:
+                offsets.append(offset)
+                data.append(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+                data.append(payload)
+                offset += RECORD_HEADER.size + len(payload)
+            self.data_file.write(b"".join(data))
+            self.index_file.seek(0, os.SEEK_END)
+            self.index_file.write(b"".join(INDEX_ENTRY.pack(offset) for offset in offsets))
+            self.offsets.extend(offsets)
+            self.sync()
+
+
+    def read(self, height):
+        """Random access to the block record at the given height."""
+        with self.lock:
+            payload, _ = self._read_at(self.offsets[height])
+        return self._decode(payload)
+
+
+    def read_range(self, start=0, stop=None):
+        """Iterate block records from start up to (not including) stop with sequential reads."""
+        stop = len(self.offsets) if stop is None else min(stop, len(self.offsets))
+        offset = self.offsets[start] if start < stop else None
+        for _ in range(start, stop):
+            with self.lock:
+                payload, offset = self._read_at(offset)
+            yield self._decode(payload)
+
+
+    def truncate(self, height):
+        """Keep only the first `height` records, e.g. before writing a replaced chain suffix."""
+        with self.lock:
+            if height >= len(self.offsets):
+                return
+            self.data_file.truncate(self.offsets[height])
+            del self.offsets[height:]
+            self.index_file.truncate(height * INDEX_ENTRY.size)
+            self.sync()
+
+
+    @metrics.timed(SYNC_SECONDS)
+    def sync(self):
+        """Force buffered records to disk."""
+        for f in (self.data_file, self.index_file):
+            f.flush()
+            os.fsync(f.fileno())
+        self._unsynced = 0
+
+
+    def close(self):
+        self.sync()
+        self.data_file.close()
+        self.index_file.close()
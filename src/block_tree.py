@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+MAX_ORPHANS = 256  # Blocks kept while waiting for their parent
+MAX_INVALID = 10000  # Hashes of invalid blocks remembered, so they are refused without validating them again
+
+
+class TreeNode:
+    __slots__ = ("block", "parent", "children", "height", "work")
+
+    def __init__(self, block, parent, work):
+        self.block = block
+        self.parent = parent
+        self.children = []
+        self.height = block.index
+        self.work = work  # Cumulative work from genesis up to and including this block
+
+
+class BlockTree:
+    """
+    Every known block (main chain and side branches) linked to its parent.
+    The best tip is the one with the most cumulative work, the earliest timestamp wins ties.
+    Blocks whose parent is unknown wait in a bounded orphan pool.
+    """
+
+    def __init__(self, max_orphans=MAX_ORPHANS, max_invalid=MAX_INVALID):
+        self.nodes = {}
+        self.best = None
+        # Hashes of blocks found invalid once linked, and of their descendants, oldest first
+        self.invalid = OrderedDict()
+        self.orphans = OrderedDict()  # hash -> block, oldest first
+        self.max_orphans = max_orphans
+        self.max_invalid = max_invalid
+
+
+    def __contains__(self, block_hash):
+        return block_hash in self.nodes or block_hash in self.orphans
+
+
+    def get(self, block_hash):
+        return self.nodes.get(block_hash)
+
+
+    def reset(self, chain):
+        """Rebuild the tree from the main chain alone."""
+        self.nodes = {}
+        self.best = None
+        parent = None
+        for block in chain:
+            parent = self.insert(block, parent)
+        return self
+
+
+    def insert(self, block, parent):
+        """Link an already validated block under its parent node (None for genesis)."""
+        node = TreeNode(block, parent, (parent.work if parent else 0) + block.work())
+        self.nodes[block.hash] = node
+        if parent is not None:
+            parent.children.append(node)
+        if self.best is None or self.is_better(node, self.best):
+            self.best = node
+        return node
+
+
+    @staticmethod
+    def is_better(node, other):
+        if node.work != other.work:
+            return node.work > other.work
+        return node.block.timestamp < other.block.timestamp
+
+
+    def mark_invalid(self, block_hash):
+        self.invalid[block_hash] = True
+        self.invalid.move_to_end(block_hash)
+        while len(self.invalid) > self.max_invalid:
+            self.invalid.popitem(last=False)
+
+
+    def invalidate(self, node, best):
+        """
+        Drop node and everything built on it, e.g. a branch block that turned out to overspend
+        when the branch was connected, and make best (the main chain tip that was kept) the best tip.
+        O(size of the dropped subtree).
+        """
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            stack.extend(current.children)
+            del self.nodes[current.block.hash]
+            self.mark_invalid(current.block.hash)
+        self.best = best
+
+
+    def add_orphan(self, block):
+        self.orphans[block.hash] = block
+        while len(self.orphans) > self.max_orphans:
+            self.orphans.popitem(last=False)
+
+
+    def pop_children(self, block_hash):
+        """Orphans that were waiting for this block."""
+        children = [b for b in self.orphans.values() if b.previous_hash == block_hash]
+        for child in children:
+            del self.orphans[child.hash]
+        return children
+
+
+    def branch(self, node, is_main):
+        """
+        Blocks from the fork point with the main chain (exclusive) up to node, lowest first.
+        is_main(node) tells whether a node is on the current main chain.
+        Returns (fork node, blocks). O(depth of the branch).
+        """
+        blocks = []
+        while node is not None and not is_main(node):
+            blocks.append(node.block)
+            node = node.parent
+        blocks.reverse()
+        return node, blocks
@@ -1,69 +1,312 @@
-from .block import Block
-import os, time
+from .block import Block, BLOCK_VERSION, BITS_VERSION
+from . import difficulty as retargeting
+from .block_store import BlockStore
+from .miner import Miner
+from .state import AccountState
+from .chain_index import ChainIndex
+from .block_tree import BlockTree
+from .validation import ValidationPipeline, check_block, PARALLEL_THRESHOLD
+from . import metrics
+import os, time, json, sqlite3
+from threading import RLock
 import pandas as pd
 
+CHECKPOINT_INTERVAL = 100  # Blocks appended between checkpoint and state snapshot writes
+RESIDENT_BODIES = 100  # Most recent blocks whose transactions stay in memory in headers-only mode
+# Every node builds the same genesis block, so independently started nodes share a common ancestor
+GENESIS_TIMESTAMP = 1700000000.0
+GENESIS_MINER = "genesis"
+
+VALIDATION_SECONDS = metrics.histogram("block_validation_seconds", "Time to validate one block against its parent")
+BLOCKS_MINED = metrics.counter("blocks_mined_total", "Blocks mined by this node that extended the chain")
+CHAIN_HEIGHT = metrics.gauge("chain_height", "Height of the main chain tip")
+
 # Blockchain class - the sequence of blocks
 class Blockchain:
-    difficulty = 1  # difficulty of the genesis Block
-    def __init__(self, node_id=None, difficulty=5):  # Set default difficulty to 4
+    def __init__(self, node_id=None, difficulty=5, mining_workers=None, full_verify=False, miner_address=None, headers_only=False, validation_workers=None):
         self.node_id = node_id or "default"
-        self.difficulty = difficulty  # Initialize difficulty
+        self.headers_only = headers_only  # Keep only headers in memory, transactions are read from the block store
+        self.miner_address = miner_address or self.node_id  # Receives block rewards and fees
+        self.difficulty = difficulty  # Of a new chain's genesis block, in hex digits; later blocks follow next_difficulty
+        self.full_verify = full_verify  # Ignore the checkpoint and validate from genesis
+        self.checkpoint = self.load_checkpoint()  # Height and hash of the last validated tip
+        # Process-pool miner, None uses every core. With 1 worker blocks are mined in-process
+        self.miner = Miner(workers=mining_workers) if mining_workers != 1 else None
+        # Hash, PoW and signature checks of long block ranges on a process pool, None uses every core
+        self.validator = ValidationPipeline(workers=validation_workers)
         self.chain = []
-        if os.path.exists(self.get_csv_path()):
-            self.load_chain(self.get_csv_path())
+        self.lock = RLock()  # Mining, block reception and sync change the chain from different threads
+        self.state = AccountState.load(self.get_state_path())  # Balances, caught up with the chain below
+        self.store = BlockStore(self.get_store_path(), binary=True)
+        self.index = ChainIndex(self.get_index_path())  # hash, tx_id and address lookups
+        if len(self.store):
+            self.load_chain()
+        elif os.path.exists(self.get_csv_path()):
+            # Migrate a chain saved by older versions
+            self.import_csv(self.get_csv_path())
         else:
             self.chain = [self.create_genesis_block()]
             self.save_chain()
+        self.tree = BlockTree().reset(self.chain)  # Main chain plus side branches, for fork choice
+        CHAIN_HEIGHT.set_function(lambda: len(self.chain) - 1)
+        if self.headers_only:
+            for block in self.chain[:-RESIDENT_BODIES]:
+                self.evict_body(block)
 
     def get_csv_path(self):
         return f"blockchain/blockchain_{self.node_id}.csv"
 
-    def load_chain(self, path):
-        """Load blockchain from CSV, or create genesis block if file is missing."""
+    def get_store_path(self):
+        return f"blockchain/blocks_{self.node_id}"
+
+    def get_index_path(self):
+        return f"blockchain/index_{self.node_id}.sqlite"
+
+    def get_state_path(self):
+        return f"blockchain/state_{self.node_id}.json"
+
+    def get_checkpoint_path(self):
+        return f"blockchain/checkpoint_{self.node_id}.json"
+
+    def load_checkpoint(self):
+        if not os.path.exists(self.get_checkpoint_path()):
+            return None
+        with open(self.get_checkpoint_path(), 'r') as f:
+            return json.load(f)
+
+    def save_checkpoint(self):
+        """Record the current tip as validated. Everything up to it is trusted on the next start."""
+        tip = self.get_latest_block()
+        self.checkpoint = {"height": tip.index, "hash": tip.hash}
+        tmp_path = self.get_checkpoint_path() + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, self.get_checkpoint_path())
+
+    def trusted_height(self, chain):
+        """
+        Returns the height up to which `chain` is covered by the checkpoint, or -1.
+        Blocks are hash-linked, so a matching hash at the checkpoint height vouches for the whole prefix.
+        """
+        if self.full_verify or not self.checkpoint:
+            return -1
+        height = self.checkpoint["height"]
+        if height < len(chain) and chain[height].hash == self.checkpoint["hash"]:
+            return height
+        return -1
+
+    def load_chain(self):
+        """Load blockchain from the block store."""
         chain = []
+        for record in self.store.read_range():
+            block = Block.from_record(record)
+            if chain and block.previous_hash == chain[-1].hash:
+                block.previous_hash = chain[-1].hash  # One string per hash instead of two
+            if self.headers_only:
+                self.evict_body(block)  # Validation pages the body back in, one block at a time
+            chain.append(block)
+        print(f"Loaded {len(chain)} blocks from the block store.")
+        self._set_loaded_chain(chain)
+
+
+    def import_csv(self, path):
+        """Load blockchain from CSV and write it to the block store."""
         df = pd.read_csv(path)
         print(f"Iterating over {len(df)} blocks in loaded chain.")
-        for _, row in df.iterrows():
-            block = Block(
-                index=int(row['index']),
-                previous_hash=row['previous_hash'],
-                transactions=row['transactions'],
-                miner=row['miner'],
-                difficulty=int(row['difficulty']),
-                timestamp=float(row['timestamp']),
-                nonce=int(row['nonce']),
-                hash=row['hash']
-            )
-            chain.append(block)
+        chain = [Block.from_record(row) for _, row in df.iterrows()]
+        self._set_loaded_chain(chain)
 
-        if self.validate_chain(chain):
+
+    def _set_loaded_chain(self, chain):
+        start = self.trusted_height(chain) + 1
+        if start:
+            print(f"Checkpoint at height {start - 1}: validating {len(chain) - start} block(s) above it.")
+        if self.validate_chain(chain, start=start):
             self.chain = chain
         else:
             print(f"Chain invalid!!!")
             self.chain = [self.create_genesis_block()]
-            self.save_chain()
+        self.save_chain()
 
 
-    def save_chain(self):
+    def load_body(self, block):
+        """Transactions of a main chain block whose body was evicted, read from the block store."""
+        record = self.store.read(block.index)
+        if record['hash'] != block.hash:
+            raise KeyError(f"Block {block.hash} is no longer in the block store")
+        return record['transactions']
+
+
+    def evict_body(self, block):
+        if block.has_body() and block.index < len(self.store):
+            block.evict_body(self.load_body)
+
+
+    def export_csv(self, path=None):
         """Save current blockchain to CSV."""
-        data = [{
-            "index": block.index,
-            "previous_hash": block.previous_hash,
-            "timestamp": block.timestamp,
-            "transactions": block.transactions,
-            "miner": block.miner,
-            "difficulty": block.difficulty,
-            "nonce": block.nonce,
-            "hash": block.hash
-        } for block in self.chain]
+        df = pd.DataFrame([block.to_record() for block in self.chain])
+        df.to_csv(path or self.get_csv_path(), index=False)
+
+
+    def save_chain(self):
+        """
+        Write the current chain to the block store.
+        Only the blocks after the last one the store already holds are written.
+        """
+        height = min(len(self.store), len(self.chain))
+        while height > 0 and self.store.read(height - 1)['hash'] != self.chain[height - 1].hash:
+            height -= 1
+        disconnected = [Block.from_record(record) for record in self.store.read_range(height)]
+        tree = getattr(self, "tree", None)
+        for block in disconnected:
+            # Blocks leaving the store can no longer page their body in from it
+            node = tree.get(block.hash) if tree else None
+            if node and not node.block.has_body():
+                node.block.transactions = block.transactions
+        self.store.truncate(height)
+        for block in self.chain[height:]:
+            self.store.append(block.to_record())
+        self.store.sync()
+        self.update_state(disconnected)
+        self.update_index(height)
+        self.save_checkpoint()
+        self.state.save(self.get_state_path())
+
+
+    def update_state(self, disconnected=()):
+        """
+        Bring the account state to the current tip: revert the blocks that left the chain
+        (highest first), then apply the blocks it has not seen yet.
+        """
+        for block in reversed(disconnected):
+            if block.index == self.state.height and block.hash == self.state.tip_hash:
+                self.state.revert_block(block)
+        height = self.state.height
+        if height >= len(self.chain) or (height >= 0 and self.chain[height].hash != self.state.tip_hash):
+            print("Account state does not match the chain, rebuilding it from genesis.")
+            self.state = AccountState()
+        for block in self.chain[self.state.height + 1:]:
+            self.state.apply_block(block)
+
 
-        df = pd.DataFrame(data)
-        df.to_csv(self.get_csv_path(), index=False)
+    def update_index(self, fork_height=None):
+        """Drop index rows from fork_height on, then index the blocks above the index tip."""
+        height, tip_hash = self.index.tip
+        if fork_height is not None and fork_height <= height:
+            self.index.truncate(fork_height, self.chain[fork_height - 1].hash if fork_height else None)
+            height = fork_height - 1
+        elif height >= len(self.chain) or (height >= 0 and self.chain[height].hash != tip_hash):
+            print("Chain index does not match the chain, rebuilding it from genesis.")
+            self.index.truncate(0)
+            height = -1
+        self.index.add_blocks(self.chain[height + 1:])
+
+
+    def add_block(self, block):
+        """Append a block that extends the current tip. Returns False, with nothing written, if the index refuses it."""
+        with self.lock:
+            self.chain.append(block)
+            try:
+                self.update_index()  # First: a duplicate tx_id fails here, before the tree, store and state are written
+            except sqlite3.IntegrityError:
+                self.chain.pop()
+                print(f"Block {block.index} holds a transaction that was already mined")
+                return False
+            self.tree.insert(block, self.tree.get(block.previous_hash))
+            self.store.append(block.to_record())
+            self.update_state()
+            if self.headers_only and len(self.chain) > RESIDENT_BODIES:
+                self.evict_body(self.chain[-RESIDENT_BODIES - 1])
+            if block.index % CHECKPOINT_INTERVAL == 0:
+                self.store.sync()
+                self.save_checkpoint()
+                self.state.save(self.get_state_path())
+            return True
+
+
+    def accept_block(self, block, checked=False):
+        """
+        Add a block received from the network wherever it fits in the block tree.
+        checked: the block passed the validation pipeline's own checks already.
+        Returns (status, disconnected, connected), status being "extended", "reorg", "side",
+        "orphan", "known" or "invalid", and the other two the blocks that left and joined the main chain.
+        """
+        with self.lock:
+            if block.hash in self.tree:
+                return "known", [], []
+            if block.hash in self.tree.invalid or block.previous_hash in self.tree.invalid:
+                self.tree.mark_invalid(block.hash)
+                return "invalid", [], []
+            parent = self.tree.get(block.previous_hash)
+            if parent is None:
+                self.tree.add_orphan(block)
+                return "orphan", [], []
+            if not self.validate_block(block, parent.block, checked=checked):
+                return "invalid", [], []
+            replayed = self.find_replay(block, self.ancestor_lookup(parent.block), self.branch_tx_ids(parent))
+            if replayed:
+                print(f"Block {block.index} replays transaction {replayed}, already mined below it")
+                return "invalid", [], []
+
+            disconnected, connected = [], []
+            if parent is self.tree.best:
+                if not self.state.can_apply(block):
+                    print(f"Block {block.index} spends more than its senders have")
+                    return "invalid", [], []
+                if not self.add_block(block):
+                    return "invalid", [], []
+                status, connected = "extended", [block]
+            else:
+                node = self.tree.insert(block, parent)
+                if node is self.tree.best:
+                    disconnected, connected = self.reorganize(node)
+                    status = "reorg" if connected else "invalid"
+                else:
+                    status = "side"
+
+            # Orphans that were waiting for this block can now be connected too
+            for child in self.tree.pop_children(block.hash):
+                child_status, child_disconnected, child_connected = self.accept_block(child)
+                if child_status in ("extended", "reorg"):
+                    status = "reorg" if "reorg" in (status, child_status) else "extended"
+                    disconnected += child_disconnected
+                    connected += child_connected
+            return status, disconnected, connected
+
+
+    def reorganize(self, node):
+        """
+        Make node the new tip: disconnect the main chain blocks above the fork point and connect
+        the branch. Only the differing blocks are touched, in memory and in storage.
+        Side branch blocks could not be checked against balances when they arrived, so their spending
+        is checked here as they are connected. If one overspends, the current chain stays, that block
+        and its descendants are marked invalid and ([], []) is returned.
+        """
+        on_main = lambda n: n.height < len(self.chain) and self.chain[n.height].hash == n.block.hash
+        fork, branch = self.tree.branch(node, on_main)
+        disconnected = self.chain[fork.height + 1:]
+        for block in reversed(disconnected):
+            self.state.revert_block(block)
+        for i, block in enumerate(branch):
+            if not self.state.can_apply(block):
+                print(f"Block {block.index} of the branch spends more than its senders have, keeping the current chain")
+                for applied in reversed(branch[:i]):
+                    self.state.revert_block(applied)
+                for block_back in disconnected:
+                    self.state.apply_block(block_back)
+                self.tree.invalidate(self.tree.get(block.hash), self.tree.get(self.chain[-1].hash))
+                return [], []
+            self.state.apply_block(block)
+        del self.chain[fork.height + 1:]
+        self.chain.extend(branch)
+        self.save_chain()
+        print(f"🔀 Reorg at height {fork.height}: {len(disconnected)} block(s) disconnected, {len(branch)} connected")
+        return disconnected, branch
 
 
     def create_genesis_block(self):
-        """Creates the first block with a fixed previous hash."""
-        block = Block(0, "empty_hash", "Genesis Block", miner=self.node_id, difficulty=self.difficulty)
+        """Creates the first block with a fixed previous hash, timestamp and miner: the same on every node of a given difficulty."""
+        block = Block(0, "empty_hash", "Genesis Block", miner=GENESIS_MINER, difficulty=self.difficulty, timestamp=GENESIS_TIMESTAMP)
         block.mine_block()  # Mine the genesis block
         return block
 
@@ -79,31 +322,115 @@ class Blockchain:
             print(f"Block cannot be added: latest block hash {latest_block.hash} does not match calculated hash {latest_block.calculate_hash()}")
             return None
         index = latest_block.index + 1  # or len(self.chain)
-        dificulty = max(latest_block.difficulty, self.difficulty)
-        
-        new_block = Block(index, latest_block.hash, transactions, self.node_id, dificulty)
-        new_hash = new_block.mine_block(stop_event=stop_event)
+        dificulty = self.next_difficulty(latest_block)
+
+        new_block = Block(index, latest_block.hash, transactions, self.miner_address, dificulty, version=BLOCK_VERSION)
+        if self.miner:
+            new_hash = self.miner.mine(new_block, stop_event=stop_event)
+        else:
+            new_hash = new_block.mine_block(stop_event=stop_event)
         if new_hash is None:
             print("⛔ Mining was interrupted on blockchain level.")
             return None
 
-        self.chain.append(new_block)
-        self.save_chain()  # <-- Save on every new block
+        with self.lock:
+            if new_block.previous_hash != self.get_latest_block().hash:
+                # The tip moved while mining, keep the block as a side branch
+                self.accept_block(new_block)
+                print("⛔ Mined block no longer extends the tip.")
+                return None
+            if not self.add_block(new_block):  # <-- Save on every new block
+                return None
+            BLOCKS_MINED.inc()
         return new_block
 
 
-    def validate_block(self, block, previous_block):
-        """Validates the block against the previous block."""
+    def ancestor_lookup(self, block):
+        """Returns height -> block along the branch that ends at `block` (main chain or side branch)."""
+        node = self.tree.get(block.hash)
+        on_main = block.index < len(self.chain) and self.chain[block.index].hash == block.hash
+        if on_main or node is None:
+            return self.chain.__getitem__
+
+        def lookup(height):
+            current = node
+            while current.height > height:
+                current = current.parent
+            return current.block
+        return lookup
+
+
+    def find_replay(self, block, get_block, mined=()):
+        """
+        tx_id of a transaction of block that was already mined below it on its branch, or None.
+        The index covers the main chain: a hit counts when the indexed block at that height is
+        also the branch's block there. `mined` holds tx_ids of the blocks the index does not cover.
+        """
+        for tx_id in block.tx_ids():
+            if tx_id in mined:
+                return tx_id
+            location = self.index.tx_location(tx_id)
+            if location and location[0] < block.index and self.index.block_height(get_block(location[0]).hash) == location[0]:
+                return tx_id
+        return None
+
+
+    def branch_tx_ids(self, node):
+        """tx_ids of a side branch from node down to the main chain, empty for a main chain node."""
+        tx_ids = set()
+        while node is not None and not (node.height < len(self.chain) and self.chain[node.height].hash == node.block.hash):
+            tx_ids.update(node.block.tx_ids())
+            node = node.parent
+        return tx_ids
+
+
+    def next_difficulty(self, previous_block, get_block=None):
+        """
+        Difficulty (in bits) a BITS_VERSION block on top of previous_block must have.
+        Every RETARGET_INTERVAL blocks it moves toward TARGET_BLOCK_TIME based on how long
+        the last window took; in between it stays the same. The first such block after
+        legacy ones inherits the previous difficulty converted to bits.
+        """
+        bits = previous_block.difficulty_bits()
+        height = previous_block.index + 1
+        interval = retargeting.RETARGET_INTERVAL
+        if previous_block.version < BITS_VERSION or height % interval or height <= interval:
+            return max(bits, retargeting.MIN_BITS)
+        get_block = get_block or self.ancestor_lookup(previous_block)
+        window_start = get_block(height - 1 - interval)
+        return retargeting.retarget(bits, previous_block.timestamp - window_start.timestamp, interval)
+
+
+    @metrics.timed(VALIDATION_SECONDS)
+    def validate_block(self, block, previous_block, get_block=None, checked=False):
+        """
+        Validates the block against the previous block.
+        get_block(height) returns the ancestors used for retargeting, by default looked up in the chain and block tree.
+        checked: the block passed check_block already (in the validation pipeline), only its place in the chain is checked.
+        """
         if block.index != previous_block.index + 1:
             print(f"Block index {block.index} is not in order with previous block index {previous_block.index}")
             return False
         if block.previous_hash != previous_block.hash:
             print(f"Block previous hash {block.previous_hash} does not match previous block hash {previous_block.hash}")
             return False
-        if block.hash != block.calculate_hash():
-            print(f"Block hash {block.hash} does not match calculated hash {block.calculate_hash()}")
+        if block.version > BLOCK_VERSION:
+            print(f"Block version {block.version} is unknown, the newest is {BLOCK_VERSION}")
             return False
-        if block.difficulty < previous_block.difficulty:
+        if not checked:
+            error = check_block(block)
+            if error:
+                print(f"Block {block.index}: {error}")
+                return False
+        if block.version < previous_block.version and previous_block.version >= BITS_VERSION:
+            print(f"Block version {block.version} is older than previous block version {previous_block.version}")
+            return False
+        if block.version >= BITS_VERSION:
+            expected = self.next_difficulty(previous_block, get_block)
+            if block.difficulty != expected:
+                print(f"Block difficulty {block.difficulty} bits does not match the expected {expected} bits")
+                return False
+        elif block.difficulty < previous_block.difficulty:
             print(f"Block difficulty {block.difficulty} is less than previous block difficulty {previous_block.difficulty}")
             return False
         if block.timestamp <= previous_block.timestamp:
@@ -115,20 +442,30 @@ class Blockchain:
         return True
 
 
-    # Validates entire chain
-    def validate_chain(self, chain):
+    # Validates entire chain, or only the blocks from `start` on when the ones below are trusted
+    def validate_chain(self, chain, start=0):
+        """
+        Blocks are checked on their own (hash, PoW, Merkle root, signatures) by the validation pipeline,
+        in parallel for long ranges, then against their parent in chain order.
+        """
         if not chain:
             print("Chain is empty")
             return False
         
-        if chain[0].hash != chain[0].calculate_hash():
+        if start == 0 and chain[0].hash != chain[0].calculate_hash():
             print(f"Genesis block {chain[0]} hash is invalid")
             return False
         
-        for i in range(1, len(chain)):
-            # print(f"Validating block {i} against block {i-1}")
-            if not self.validate_block(chain[i], chain[i - 1]):
-                print(f"Block {i} is invalid")
+        start = max(start, 1)
+        parallel = len(chain) - start >= PARALLEL_THRESHOLD and self.validator.workers > 1
+        mined = set()  # tx_ids of the blocks checked so far, the trusted ones below start are looked up in the index
+        for i, (block, error) in enumerate(self.validator.checked(chain[start:], parallel), start):
+            if error or not self.validate_block(block, chain[i - 1], chain.__getitem__, checked=True):
+                print(f"Block {i} is invalid{': ' + error if error else ''}")
                 return False
-        return True
-
+            replayed = self.find_replay(block, chain.__getitem__, mined)
+            if replayed:
+                print(f"Block {i} is invalid: transaction {replayed} was already mined")
+                return False
+            mined.update(block.tx_ids())
+        return True
\ No newline at end of file
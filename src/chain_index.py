@@ -0,0 +1,128 @@
+import sqlite3
+from threading import Lock
+
+PAGE_SIZE = 50  # Default page size of address history queries
+
+
+def index_rows(blocks):
+    """Rows of the blocks, txs and address_txs tables for some blocks."""
+    block_rows, tx_rows, address_rows = [], [], []
+    for block in blocks:
+        block_rows.append((block.hash, block.index))
+        for position, tx in enumerate(block.get_transactions()):
+            tx_rows.append((tx.tx_id, block.index, position))
+            for address in {tx.from_address, tx.to_address}:
+                address_rows.append((address, block.index, position, tx.tx_id))
+    return block_rows, tx_rows, address_rows
+
+
+class ChainIndex:
+    """
+    Persistent secondary indexes over the chain, kept in SQLite:
+    block hash -> height, tx_id -> (height, position), address -> its transactions.
+    Rows are keyed by height, so disconnecting blocks on a reorg is a range delete.
+    """
+
+    def __init__(self, path):
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS blocks (hash TEXT PRIMARY KEY, height INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS blocks_height ON blocks (height);
+            CREATE TABLE IF NOT EXISTS txs (tx_id TEXT PRIMARY KEY, height INTEGER NOT NULL, position INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS txs_height ON txs (height);
+            CREATE TABLE IF NOT EXISTS address_txs (
+                address TEXT NOT NULL, height INTEGER NOT NULL, position INTEGER NOT NULL, tx_id TEXT NOT NULL,
+                PRIMARY KEY (address, height, position)
+            );
+            CREATE INDEX IF NOT EXISTS address_txs_height ON address_txs (height);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.db.commit()
+
+
+    @property
+    def tip(self):
+        """(height, hash) of the last indexed block, (-1, None) when empty."""
+        with self.lock:
+            rows = dict(self.db.execute("SELECT key, value FROM meta WHERE key IN ('height', 'hash')").fetchall())
+        return int(rows.get('height', -1)), rows.get('hash')
+
+
+    def _set_tip(self, height, block_hash):
+        self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                            [('height', str(height)), ('hash', block_hash)])
+
+
+    def add_blocks(self, blocks):
+        """Index blocks appended on top of the current tip, in one transaction."""
+        if not blocks:
+            return
+        self.add_rows(*index_rows(blocks), blocks[-1].index, blocks[-1].hash)
+
+
+    def add_rows(self, block_rows, tx_rows, address_rows, height, block_hash):
+        """
+        Insert rows made by index_rows, e.g. in the snapshot import workers, and move the tip to height.
+        A tx_id that is indexed already raises sqlite3.IntegrityError and nothing is added:
+        a transaction is mined once, replacing its row would hide a replay.
+        """
+        with self.lock:
+            try:
+                self.db.executemany("INSERT OR REPLACE INTO blocks (hash, height) VALUES (?, ?)", block_rows)
+                self.db.executemany("INSERT INTO txs (tx_id, height, position) VALUES (?, ?, ?)", tx_rows)
+                self.db.executemany("INSERT OR REPLACE INTO address_txs (address, height, position, tx_id) VALUES (?, ?, ?, ?)",
+                                    address_rows)
+                self._set_tip(height, block_hash)
+            except sqlite3.IntegrityError:
+                self.db.rollback()
+                raise
+            self.db.commit()
+
+
+    def truncate(self, height, previous_hash=None):
+        """Drop everything indexed from height on, e.g. the blocks a reorg disconnects."""
+        with self.lock:
+            for table in ("blocks", "txs", "address_txs"):
+                self.db.execute(f"DELETE FROM {table} WHERE height >= ?", (height,))
+            self._set_tip(height - 1, previous_hash)
+            self.db.commit()
+
+
+    def block_height(self, block_hash):
+        with self.lock:
+            row = self.db.execute("SELECT height FROM blocks WHERE hash = ?", (block_hash,)).fetchone()
+        return row[0] if row else None
+
+
+    def tx_location(self, tx_id):
+        """(height, position) of a mined transaction, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT height, position FROM txs WHERE tx_id = ?", (tx_id,)).fetchone()
+        return tuple(row) if row else None
+
+
+    def address_history(self, address, cursor=None, limit=PAGE_SIZE):
+        """
+        Transactions of an address, newest first, as [(height, position, tx_id)].
+        Returns (page, next cursor). The cursor is "height:position" of the last row and None on the last page.
+        """
+        with self.lock:
+            if cursor:
+                height, position = (int(part) for part in cursor.split(":"))
+                rows = self.db.execute(
+                    "SELECT height, position, tx_id FROM address_txs WHERE address = ? AND (height, position) < (?, ?) "
+                    "ORDER BY height DESC, position DESC LIMIT ?", (address, height, position, limit)).fetchall()
+            else:
+                rows = self.db.execute(
+                    "SELECT height, position, tx_id FROM address_txs WHERE address = ? "
+                    "ORDER BY height DESC, position DESC LIMIT ?", (address, limit)).fetchall()
+        next_cursor = f"{rows[-1][0]}:{rows[-1][1]}" if len(rows) == limit else None
+        return rows, next_cursor
+
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,381 @@
+"""
+Compact binary encoding of blocks and transactions, for the wire and the block store.
+
+A block record encodes to the same dict its JSON form holds (Block.to_record), so both
+forms round-trip exactly:
+- header integers are varints, floats 8-byte doubles,
+- hashes, addresses, public keys and signatures are raw bytes instead of hex,
+- transactions with the usual field sizes use one fixed-width layout,
+- the transactions string is stored as structured transactions when re-encoding them
+  gives back the exact same string, and as raw text otherwise (legacy and genesis blocks).
+"""
+import json
+import struct
+
+from .block import Block
+from .transaction import Transaction
+
+CONTENT_TYPE = "application/x-chain-codec"  # Negotiated with Accept / Content-Type headers
+FORMAT = 1  # First byte of every encoded record, JSON records start with "{"
+
+DOUBLE = struct.Struct(">d")
+PUBLIC_KEY_SIZE = 64  # Raw secp256k1 point
+TX_KEYS = ('from_address', 'from_public_key', 'to_address', 'amount', 'fee', 'signature', 'tx_id')
+NONCE_TX_KEYS = TX_KEYS + ('nonce',)  # Transactions with a nonce, see Transaction.to_dict
+
+# Field tags
+NONE, HASH32, HASH64, RAW, TEXT = range(5)  # Hex-or-text fields
+INT, FLOAT = range(2)  # Numbers
+TXS_TEXT, TXS_DICTS, TXS_OBJECTS = range(3)  # Block transactions field
+
+
+class Writer:
+    def __init__(self):
+        self.out = bytearray()
+
+    def varint(self, n):
+        if n < 0:
+            raise ValueError("varint must be non-negative")
+        while n > 0x7f:
+            self.out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        self.out.append(n)
+
+    def raw(self, data):
+        self.varint(len(data))
+        self.out += data
+
+    def text(self, value):
+        self.raw(value.encode())
+
+    def number(self, value):
+        if type(value) is int:
+            self.out.append(INT)
+            self.varint(value * 2 if value >= 0 else -value * 2 - 1)  # Zigzag
+        elif type(value) is float:
+            self.out.append(FLOAT)
+            self.out += DOUBLE.pack(value)
+        else:
+            raise TypeError(f"not a number: {value!r}")
+
+    def hex_or_text(self, value):
+        """Hex strings (hashes, addresses, signatures) go as raw bytes, anything else as text."""
+        if value is None:
+            self.out.append(NONE)
+            return
+        if not isinstance(value, str):
+            raise TypeError(f"not a string: {value!r}")
+        try:
+            data = bytes.fromhex(value)
+        except ValueError:
+            data = None
+        if data is None or data.hex() != value:  # Odd length, uppercase or not hex at all
+            self.out.append(TEXT)
+            self.text(value)
+        elif len(data) == 32:
+            self.out.append(HASH32)
+            self.out += data
+        elif len(data) == 64:
+            self.out.append(HASH64)
+            self.out += data
+        else:
+            self.out.append(RAW)
+            self.raw(data)
+
+
+class Reader:
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def take(self, size):
+        if self.pos + size > len(self.data):
+            raise ValueError("truncated data")
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return bytes(chunk)
+
+    def byte(self):
+        return self.take(1)[0]
+
+    def varint(self):
+        n = shift = 0
+        while True:
+            b = self.byte()
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def raw(self):
+        return self.take(self.varint())
+
+    def text(self):
+        return self.raw().decode()
+
+    def number(self):
+        tag = self.byte()
+        if tag == INT:
+            n = self.varint()
+            return n // 2 if n % 2 == 0 else -(n + 1) // 2
+        if tag == FLOAT:
+            return DOUBLE.unpack(self.take(DOUBLE.size))[0]
+        raise ValueError(f"unknown number tag {tag}")
+
+    def hex_or_text(self):
+        tag = self.byte()
+        if tag == NONE:
+            return None
+        if tag == HASH32:
+            return self.take(32).hex()
+        if tag == HASH64:
+            return self.take(64).hex()
+        if tag == RAW:
+            return self.raw().hex()
+        if tag == TEXT:
+            return self.text()
+        raise ValueError(f"unknown field tag {tag}")
+
+
+def _fixed_tx_struct(flags):
+    amount, fee = ("d" if flags & 1 else "q"), ("d" if flags & 2 else "q")
+    return struct.Struct(f">{FIXED_HEX_SIZE}s{amount}{fee}")
+
+
+# Fast path for the usual transaction: 32-byte addresses and tx_id, 64-byte key and signature,
+# int64 or float amounts. The hex fields are converted in one go, the tag (0 to 3) tells
+# which of amount and fee are floats.
+FIXED_HEX = (('from_address', 32), ('from_public_key', 64), ('to_address', 32), ('signature', 64), ('tx_id', 32))
+FIXED_HEX_SIZE = sum(size for _, size in FIXED_HEX)
+FIXED_TX = [_fixed_tx_struct(flags) for flags in range(4)]
+GENERIC_TX = 4
+NONCE_FLAG = 8  # Set in the tag of a transaction with a nonce, which follows the other fields as a varint
+TX_ID_OFFSET = FIXED_HEX_SIZE - 32  # tx_id is the last hex field
+INT64 = (-2 ** 63, 2 ** 63)
+
+
+def _fixed_tx(tx):
+    """(tag, raw hex fields) if the transaction fits the fixed layout, else None."""
+    flags = 0
+    for bit, value in ((1, tx['amount']), (2, tx['fee'])):
+        if type(value) is float:
+            flags |= bit
+        elif type(value) is not int or not INT64[0] <= value < INT64[1]:
+            return None
+    values = [tx[key] for key, _ in FIXED_HEX]
+    for value, (_, size) in zip(values, FIXED_HEX):
+        if type(value) is not str or len(value) != 2 * size:
+            return None
+    joined = "".join(values)
+    try:
+        raw = bytes.fromhex(joined)
+    except ValueError:
+        return None
+    if raw.hex() != joined:  # Uppercase or whitespace would not round-trip
+        return None
+    return flags, raw
+
+
+def _write_tx(w, tx):
+    """One transaction dict in Transaction.to_dict form."""
+    keys = tuple(tx)
+    if keys == NONCE_TX_KEYS:
+        if type(tx['nonce']) is not int:
+            raise TypeError("not an integer nonce")
+        flag = NONCE_FLAG
+    elif keys == TX_KEYS:
+        flag = 0
+    else:
+        raise TypeError("not a canonical transaction dict")
+    fixed = _fixed_tx(tx)
+    if fixed is not None:
+        tag, raw = fixed
+        w.out.append(tag | flag)
+        w.out += FIXED_TX[tag].pack(raw, tx['amount'], tx['fee'])
+    else:
+        public_key = bytes.fromhex(tx['from_public_key'])
+        if len(public_key) != PUBLIC_KEY_SIZE or public_key.hex() != tx['from_public_key']:
+            raise TypeError("not a raw public key")
+        w.out.append(GENERIC_TX | flag)
+        w.hex_or_text(tx['from_address'])
+        w.out += public_key
+        w.hex_or_text(tx['to_address'])
+        w.number(tx['amount'])
+        w.number(tx['fee'])
+        w.hex_or_text(tx['signature'])
+        w.hex_or_text(tx['tx_id'])
+    if flag:
+        w.varint(tx['nonce'])
+
+
+def _read_tx(r):
+    tag = r.byte()
+    flag, tag = tag & NONCE_FLAG, tag & ~NONCE_FLAG
+    if tag < GENERIC_TX:
+        fixed = FIXED_TX[tag]
+        if r.pos + fixed.size > len(r.data):
+            raise ValueError("truncated data")
+        raw, amount, fee = fixed.unpack_from(r.data, r.pos)
+        r.pos += fixed.size
+        h = raw.hex()
+        tx = {
+            'from_address': h[:64],
+            'from_public_key': h[64:192],
+            'to_address': h[192:256],
+            'amount': amount,
+            'fee': fee,
+            'signature': h[256:384],
+            'tx_id': h[384:]
+        }
+    elif tag == GENERIC_TX:
+        tx = {
+            'from_address': r.hex_or_text(),
+            'from_public_key': r.take(PUBLIC_KEY_SIZE).hex(),
+            'to_address': r.hex_or_text(),
+            'amount': r.number(),
+            'fee': r.number(),
+            'signature': r.hex_or_text(),
+            'tx_id': r.hex_or_text()
+        }
+    else:
+        raise ValueError(f"unknown transaction tag {tag | flag}")
+    if flag:
+        tx['nonce'] = r.varint()
+    return tx
+
+
+def _write_transactions(w, transactions):
+    if isinstance(transactions, list):  # Transaction objects of a block built in memory
+        w.out.append(TXS_OBJECTS)
+        w.varint(len(transactions))
+        for tx in transactions:
+            _write_tx(w, tx.to_dict())
+        return
+    try:
+        txs = json.loads(transactions)
+        if not isinstance(txs, list) or json.dumps(txs) != transactions:
+            raise TypeError("not a canonical transactions list")
+        body = Writer()
+        body.varint(len(txs))
+        for tx in txs:
+            _write_tx(body, tx)
+    except (TypeError, ValueError, AttributeError):
+        w.out.append(TXS_TEXT)
+        w.text(transactions)
+        return
+    w.out.append(TXS_DICTS)
+    w.out += body.out
+
+
+def _read_transactions(r):
+    tag = r.byte()
+    if tag == TXS_TEXT:
+        return r.text()
+    if tag == TXS_DICTS:
+        return json.dumps([_read_tx(r) for _ in range(r.varint())])
+    if tag == TXS_OBJECTS:
+        return [Transaction.from_dict(_read_tx(r)) for _ in range(r.varint())]
+    raise ValueError(f"unknown transactions tag {tag}")
+
+
+def encode_record(record):
+    """Binary form of a block record (Block.to_record)."""
+    w = Writer()
+    w.out.append(FORMAT)
+    w.varint(record.get('version', 0))  # 0: legacy record without version and merkle_root keys
+    w.varint(record['index'])
+    w.number(record['timestamp'])
+    w.varint(record['difficulty'])
+    w.varint(record['nonce'])
+    w.hex_or_text(record['previous_hash'])
+    w.hex_or_text(record['hash'])
+    w.hex_or_text(record['miner'])
+    if 'version' in record:
+        w.hex_or_text(record['merkle_root'])
+    _write_transactions(w, record['transactions'])
+    return bytes(w.out)
+
+
+def decode_record(data):
+    """Block record from its binary form. Raises ValueError on malformed data."""
+    r = Reader(data)
+    if r.byte() != FORMAT:
+        raise ValueError("not an encoded block")
+    version = r.varint()
+    record = {'index': r.varint(), 'timestamp': r.number(), 'difficulty': r.varint(), 'nonce': r.varint()}
+    record['previous_hash'] = r.hex_or_text()
+    record['hash'] = r.hex_or_text()
+    record['miner'] = r.hex_or_text()
+    if version:
+        record['version'] = version
+        record['merkle_root'] = r.hex_or_text()
+    record['transactions'] = _read_transactions(r)
+    # Same key order as Block.to_record
+    keys = ['index', 'previous_hash', 'timestamp', 'transactions', 'miner', 'difficulty', 'nonce', 'hash']
+    return {key: record[key] for key in keys + (['version', 'merkle_root'] if version else [])}
+
+
+def encode_block(block):
+    return encode_record(block.to_record())
+
+
+def decode_block(data):
+    return Block.from_record(decode_record(data))
+
+
+def encode_transaction(tx):
+    w = Writer()
+    _write_tx(w, tx.to_dict())
+    return bytes(w.out)
+
+
+def decode_transaction(data):
+    return Transaction.from_dict(_read_tx(Reader(data)))
+
+
+def peek_tx_id(data):
+    """tx_id of an encoded transaction without decoding it. None for the generic layout."""
+    if len(data) >= 1 + FIXED_HEX_SIZE and (data[0] & ~NONCE_FLAG) < GENERIC_TX:
+        return bytes(data[1 + TX_ID_OFFSET:1 + FIXED_HEX_SIZE]).hex()
+    return None
+
+
+def pack_message(sender, payload):
+    """Sender URL followed by an encoded block or transaction, the binary counterpart of the JSON envelopes."""
+    w = Writer()
+    w.text(sender or "")
+    return bytes(w.out) + payload
+
+
+def unpack_message(data):
+    """Returns (sender URL or None, payload bytes)."""
+    r = Reader(data)
+    sender = r.text()
+    return sender or None, data[r.pos:]
+
+
+def frame(payload):
+    """Length prefix, so encoded blocks can be streamed back to back."""
+    w = Writer()
+    w.raw(payload)
+    return bytes(w.out)
+
+
+def iter_frames(chunks):
+    """Payloads of a stream of frames, yielded as soon as each one is complete."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while buffer:
+            r = Reader(buffer)
+            try:
+                size = r.varint()
+            except ValueError:
+                break  # Length prefix not complete yet
+            if len(buffer) - r.pos < size:
+                break
+            payload = bytes(buffer[r.pos:r.pos + size])
+            del buffer[:r.pos + size]
+            yield payload
+    if buffer:
+        raise ValueError("truncated stream")
@@ -0,0 +1,61 @@
+"""
+Compact block relay. A freshly mined block mostly holds transactions its peers already
+have in their mempools, flooded there by broadcast_transaction. Instead of the full block,
+the miner sends the header plus a short id per transaction; the receiver rebuilds the
+block from its mempool and asks the miner only for the transactions it is missing.
+
+Short ids are the first SHORT_ID_BYTES bytes of sha256(block hash + tx_id): salting
+with the block hash keeps anyone from crafting colliding transactions ahead of time.
+"""
+import hashlib
+
+from .block import Block, MERKLE_VERSION
+
+SHORT_ID_BYTES = 6
+
+
+def short_id(block_hash, tx_id):
+    return hashlib.sha256(f"{block_hash}{tx_id}".encode()).hexdigest()[:2 * SHORT_ID_BYTES]
+
+
+def make_compact(block):
+    """
+    Compact form of a block: header and short transaction ids. None when the block cannot be
+    rebuilt from its transactions alone (legacy blocks, raw text bodies), those are sent in full.
+    """
+    if block.version < MERKLE_VERSION:
+        return None
+    transactions = block.get_transactions()
+    if Block.encode_transactions(transactions) != block.transactions:
+        return None
+    return {
+        "header": block.to_header(),
+        "short_ids": [short_id(block.hash, tx.tx_id) for tx in transactions]
+    }
+
+
+def match_transactions(compact, pending):
+    """
+    Transactions of a compact block found among pending ones, in block order, None where missing.
+    Returns (transactions, indexes of the missing ones). Short ids shared by two pending transactions count as missing.
+    """
+    block_hash = compact["header"]["hash"]
+    by_short_id = {}
+    for tx in pending:
+        sid = short_id(block_hash, tx.tx_id)
+        by_short_id[sid] = None if sid in by_short_id else tx
+    transactions = [by_short_id.get(sid) for sid in compact["short_ids"]]
+    missing = [i for i, tx in enumerate(transactions) if tx is None]
+    return transactions, missing
+
+
+def rebuild(compact, transactions):
+    """
+    Full block from a compact block and all of its transactions.
+    Returns None if the transactions do not match the header's Merkle root (short id collision, bad peer).
+    """
+    record = dict(compact["header"], transactions=Block.encode_transactions(transactions))
+    block = Block.from_record(record)
+    if block.merkle_root != block.compute_merkle_root():
+        return None
+    return block
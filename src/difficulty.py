@@ -0,0 +1,31 @@
+import math
+
+TARGET_BLOCK_TIME = 10  # Seconds between blocks the network aims for
+RETARGET_INTERVAL = 10  # Blocks between difficulty adjustments
+MAX_STEP = 2  # Max bits added or removed per adjustment (x4 either way)
+MIN_BITS = 1
+MAX_BITS = 255
+
+
+def leading_zero_bits(block_hash):
+    """Number of leading zero bits of a hex hash."""
+    return 256 - int(block_hash, 16).bit_length()
+
+
+def target_bytes(bits):
+    """
+    Hashes strictly below this 32-byte big-endian value have at least `bits` leading zero bits.
+    Comparing raw digests against it avoids hex encoding every attempt.
+    """
+    return (1 << (256 - bits)).to_bytes(33, "big")[1:] if bits else b"\xff" * 33
+
+
+def retarget(bits, window_seconds, window_blocks=RETARGET_INTERVAL):
+    """
+    Difficulty in bits for the next window: one bit (x2 work) per doubling of the
+    gap between measured and target block time, clamped to MAX_STEP.
+    """
+    expected = window_blocks * TARGET_BLOCK_TIME
+    step = round(math.log2(expected / max(window_seconds, 1e-3)))
+    step = max(-MAX_STEP, min(MAX_STEP, step))
+    return max(MIN_BITS, min(MAX_BITS, bits + step))
@@ -0,0 +1,152 @@
+import json
+import time
+from collections import deque
+from threading import Condition
+
+from . import metrics
+
+HISTORY = 1024  # Recent events kept for clients resuming with Last-Event-ID
+QUEUE_SIZE = 256  # Events buffered per subscriber, the oldest are dropped beyond that
+MAX_SUBSCRIBERS = 500  # Open /stream connections
+HEARTBEAT = 15  # Seconds between keep-alive comments, they also reveal closed connections
+
+EVENTS_PUBLISHED = metrics.counter("events_published_total", "Events published to /stream subscribers, by type")
+EVENTS_DROPPED = metrics.counter("events_dropped_total", "Events dropped from full subscriber buffers")
+SUBSCRIBERS = metrics.gauge("event_subscribers", "Open /stream connections")
+
+
+class Event:
+    __slots__ = ("id", "type", "data", "coalesce")
+
+    def __init__(self, id, type, data, coalesce=None):
+        self.id = id
+        self.type = type
+        self.data = data
+        self.coalesce = coalesce  # Events sharing this key replace each other in a subscriber's backlog
+
+    def to_json(self):
+        return json.dumps({"id": self.id, "type": self.type, **self.data})
+
+    def to_sse(self):
+        """Server-sent event frame. Events without an id (notices) leave the client's Last-Event-ID alone."""
+        head = f"id: {self.id}\n" if self.id is not None else ""
+        return f"{head}data: {self.to_json()}\n\n"
+
+
+class Subscription:
+    __slots__ = ("buffer", "dropped")
+
+    def __init__(self, queue_size):
+        self.buffer = deque(maxlen=queue_size)  # Ring buffer: appending to a full one drops the oldest
+        self.dropped = 0
+
+
+class EventBus:
+    """
+    Fan-out of typed events to /stream subscribers.
+    Publishing never blocks: each subscriber has a bounded ring buffer that drops its oldest
+    events when the client reads too slowly, so a stalled browser tab costs at most
+    queue_size events. A reader that fell behind gets its backlog with coalesced events
+    (hash rate, mempool updates) reduced to the latest of each kind, plus a notice of what was dropped.
+    """
+
+    def __init__(self, history=HISTORY, queue_size=QUEUE_SIZE, max_subscribers=MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.history = deque(maxlen=history)
+        self.subscriptions = set()
+        self.changed = Condition()  # Guards everything above, notified on every publish
+        self.listeners = []  # Called after every publish, e.g. to wake subscribers waiting on an event loop
+        # Ids continue from the boot time, so a client resuming across a node restart misses nothing new
+        self.first_id = self.last_id = int(time.time() * 1000)
+        SUBSCRIBERS.set_function(lambda: len(self.subscriptions))
+
+
+    def publish(self, type, message=None, coalesce=None, **data):
+        if message is not None:
+            data["message"] = message
+        with self.changed:
+            self.last_id += 1
+            event = Event(self.last_id, type, data, coalesce)
+            self.history.append(event)
+            for subscription in self.subscriptions:
+                if len(subscription.buffer) == self.queue_size:
+                    subscription.dropped += 1
+                subscription.buffer.append(event)
+            self.changed.notify_all()
+        EVENTS_PUBLISHED.inc(type=type)
+        for listener in self.listeners:
+            listener()
+        return event
+
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+
+    def subscribe(self, last_event_id=None):
+        """
+        New subscription, or None when the subscriber limit is reached.
+        With the id of the last event a client saw, the events it missed are replayed from the history.
+        """
+        with self.changed:
+            if len(self.subscriptions) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self.queue_size)
+            if last_event_id is not None and last_event_id < self.last_id:
+                missed = [event for event in self.history if event.id > last_event_id]
+                # Events older than the history are gone
+                oldest = missed[0].id if missed else self.last_id + 1
+                subscription.dropped = oldest - max(last_event_id, self.first_id) - 1
+                for event in missed:
+                    if len(subscription.buffer) == self.queue_size:
+                        subscription.dropped += 1
+                    subscription.buffer.append(event)
+            self.subscriptions.add(subscription)
+            return subscription
+
+
+    def unsubscribe(self, subscription):
+        with self.changed:
+            self.subscriptions.discard(subscription)
+
+
+    def get(self, subscription, timeout=HEARTBEAT):
+        """
+        Wait up to timeout for events, then take the whole backlog at once.
+        Returns the events to send, oldest first, an empty list on timeout.
+        """
+        with self.changed:
+            if not subscription.buffer and not subscription.dropped:
+                self.changed.wait(timeout)
+            events = list(subscription.buffer)
+            subscription.buffer.clear()
+            dropped, subscription.dropped = subscription.dropped, 0
+        if dropped:
+            EVENTS_DROPPED.inc(dropped)
+            events.insert(0, Event(None, "dropped", {"message": f"{dropped} event(s) dropped", "count": dropped}))
+        return coalesce(events)
+
+
+def coalesce(events):
+    """Keep only the latest event of every coalescing key, the others keep their order."""
+    latest = {event.coalesce: i for i, event in enumerate(events) if event.coalesce is not None}
+    if not latest:
+        return events
+    return [event for i, event in enumerate(events) if event.coalesce is None or latest[event.coalesce] == i]
+
+
+def event_stream(bus, subscription, heartbeat=HEARTBEAT):
+    """SSE body for one subscriber, unsubscribed when the client goes away."""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            events = bus.get(subscription, heartbeat)
+            yield "".join(event.to_sse() for event in events) if events else ": keep-alive\n\n"
+    finally:
+        bus.unsubscribe(subscription)
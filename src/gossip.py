@@ -0,0 +1,166 @@
+"""
+Transaction gossip. Each node relays a new transaction to a few random peers instead of
+all of them, and peers relay it further: the network is covered in O(log n) hops with
+O(n * fanout) messages, where flooding every peer costs O(n^2).
+
+Transactions are announced in batches by tx_id (POST /tx_inv); a peer answers with the ids
+it has not seen and only those are sent, in one request (POST /submit_transactions).
+Received transactions are checked against a seen filter before they are decoded or verified.
+"""
+import json
+import random
+import time
+from collections import OrderedDict
+from threading import Condition, Lock, Thread
+
+from . import codec
+from . import metrics
+
+FANOUT = 8  # Peers a batch of transactions is announced to
+RELAY_INTERVAL = 0.1  # Seconds new transactions are collected before being announced
+MAX_BATCH = 500  # Transactions per announcement
+SEEN_SIZE = 100000  # tx_ids remembered by the seen filter
+SEEN_WINDOW = 600  # Seconds a tx_id stays in the seen filter
+
+ANNOUNCED = metrics.counter("gossip_announced_total", "tx_ids announced to peers")
+SENT = metrics.counter("gossip_sent_total", "Transactions sent to peers that asked for them")
+
+
+class SeenFilter:
+    """Time-windowed LRU set of ids: the SEEN_SIZE most recent ones, none older than SEEN_WINDOW seconds."""
+
+    def __init__(self, max_size=SEEN_SIZE, window=SEEN_WINDOW):
+        self.max_size = max_size
+        self.window = window
+        self.ids = OrderedDict()  # id -> time it was added, oldest first
+        self.lock = Lock()
+
+
+    def __len__(self):
+        return len(self.ids)
+
+
+    def __contains__(self, id):
+        with self.lock:
+            added = self.ids.get(id)
+            return added is not None and time.monotonic() - added < self.window
+
+
+    def add(self, id):
+        """Returns False if the id was already seen within the window."""
+        now = time.monotonic()
+        with self.lock:
+            added = self.ids.get(id)
+            if added is not None and now - added < self.window:
+                return False
+            self.ids[id] = now
+            self.ids.move_to_end(id)
+            while self.ids and (len(self.ids) > self.max_size or now - next(iter(self.ids.values())) >= self.window):
+                self.ids.popitem(last=False)
+            return True
+
+
+class TransactionRelay:
+    """
+    Background thread announcing new transactions to FANOUT random peers in batches.
+    Transactions are never announced back to the peer they came from.
+    """
+
+    def __init__(self, node, fanout=FANOUT, interval=RELAY_INTERVAL, max_batch=MAX_BATCH):
+        self.node = node
+        self.fanout = fanout
+        self.interval = interval
+        self.max_batch = max_batch
+        self.queue = []  # (transaction, peer it came from or None)
+        self.wake = Condition()  # Guards the fields above and below
+        self.running = False
+        self.thread = None
+
+
+    def start(self):
+        with self.wake:
+            if self.running:
+                return
+            self.running = True
+        self.thread = Thread(target=self._run, name="tx-relay", daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+        with self.wake:
+            self.running = False
+            self.wake.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+
+    def relay(self, tx, origin=None):
+        with self.wake:
+            self.queue.append((tx, origin))
+            self.wake.notify_all()
+
+
+    def _run(self):
+        while True:
+            with self.wake:
+                while self.running and not self.queue:
+                    self.wake.wait()
+                if not self.running:
+                    return
+            time.sleep(self.interval)  # Let a burst of transactions join the batch
+            try:
+                self.flush()
+            except Exception as e:
+                # One bad batch must not stop gossip for the life of the node
+                print(f"Error relaying transactions: {e}")
+
+
+    def flush(self):
+        """Announce the queued transactions, in batches of max_batch."""
+        with self.wake:
+            queue, self.queue = self.queue, []
+        for start in range(0, len(queue), self.max_batch):
+            self._announce(queue[start:start + self.max_batch])
+
+
+    def _announce(self, batch):
+        # Copied in one step: request threads add peers meanwhile (register_sender)
+        peers = [peer for peer in list(self.node.peers) if peer != self.node.node_url]
+        targets = random.sample(peers, min(self.fanout, len(peers)))
+        offers = {}
+        for peer in targets:
+            offer = [tx for tx, origin in batch if origin != peer]
+            if offer:
+                offers[peer] = offer
+        results = self.node.peer_client.map(lambda peer: self._offer(peer, offers[peer]), offers)
+        for peer, result in results.items():
+            if isinstance(result, Exception):
+                print(f"Error relaying transactions to {peer}: {result}")
+
+
+    def _offer(self, peer, transactions):
+        """Announce transactions to one peer, then send it those it asks for."""
+        client = self.node.peer_client
+        announcement = json.dumps({"peer": self.node.node_url, "tx_ids": [tx.tx_id for tx in transactions]})
+        ANNOUNCED.inc(len(transactions))
+        res = client.post(peer, "/tx_inv", data=announcement, headers={"Content-Type": "application/json"})
+        if res.status_code == 404:
+            # Peer without gossip support: one request per transaction, like before
+            for tx in transactions:
+                client.post(peer, "/submit_transaction", json={"transaction": tx.to_dict(), "peer": self.node.node_url})
+            return
+        res.raise_for_status()
+        wanted = set(res.json().get("want", []))
+        transactions = [tx for tx in transactions if tx.tx_id in wanted]
+        if not transactions:
+            return
+        SENT.inc(len(transactions))
+        body = codec.pack_message(self.node.node_url, b"".join(codec.frame(codec.encode_transaction(tx)) for tx in transactions))
+        res = client.post(peer, "/submit_transactions", data=body, headers={"Content-Type": codec.CONTENT_TYPE})
+        if res.status_code == 415:
+            res = client.post(peer, "/submit_transactions", json={
+                "peer": self.node.node_url,
+                "transactions": [tx.to_dict() for tx in transactions]
+            })
+        if not res.ok:
+            print(f"{peer} rejected transactions: {res.text}")
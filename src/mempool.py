@@ -0,0 +1,129 @@
+import heapq
+import itertools
+import json
+from collections import defaultdict
+from threading import Lock
+
+from .state import tx_cost
+
+MAX_TRANSACTIONS = 10000  # Pool size cap in transactions
+MAX_BYTES = 5_000_000  # Pool size cap in serialized bytes
+
+
+class MempoolEntry:
+    def __init__(self, tx, seq):
+        self.tx = tx
+        self.seq = seq  # Arrival order, older transactions win on equal fee rate
+        self.size = len(json.dumps(tx.to_dict()))
+        self.fee_rate = (tx.fee or 0) / self.size
+
+
+class Mempool:
+    """
+    Pending transactions keyed by tx_id, so membership checks and removals are O(1).
+    A max-heap on fee rate orders block assembly, a min-heap picks eviction victims
+    when the pool exceeds its count or byte cap. Both heaps delete lazily.
+    """
+
+    def __init__(self, max_transactions=MAX_TRANSACTIONS, max_bytes=MAX_BYTES):
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.entries = {}
+        self.bytes = 0
+        self.spending = defaultdict(float)  # What each sender has committed in pending transactions
+        self._by_priority = []  # (-fee_rate, seq, tx_id)
+        self._by_eviction = []  # (fee_rate, -seq, tx_id)
+        self._seq = itertools.count()
+        self.lock = Lock()
+
+
+    def __len__(self):
+        return len(self.entries)
+
+
+    def __contains__(self, tx_id):
+        return tx_id in self.entries
+
+
+    def __iter__(self):
+        """Pending transactions, highest fee rate first."""
+        with self.lock:
+            entries = sorted(self.entries.values(), key=lambda e: (-e.fee_rate, e.seq))
+        return iter([entry.tx for entry in entries])
+
+
+    def spent_by(self, address):
+        with self.lock:
+            return self.spending.get(address, 0)
+
+
+    def get(self, tx_id):
+        entry = self.entries.get(tx_id)
+        return entry.tx if entry else None
+
+
+    def add(self, tx):
+        """Add a transaction. Returns False if it is a duplicate or the pool is full of better paying ones."""
+        with self.lock:
+            if tx.tx_id in self.entries:
+                return False
+            entry = MempoolEntry(tx, next(self._seq))
+            self.entries[tx.tx_id] = entry
+            self.bytes += entry.size
+            self.spending[tx.from_address] += tx_cost(tx)
+            heapq.heappush(self._by_priority, (-entry.fee_rate, entry.seq, tx.tx_id))
+            heapq.heappush(self._by_eviction, (entry.fee_rate, -entry.seq, tx.tx_id))
+            evicted = self._evict()
+            return tx.tx_id not in evicted
+
+
+    def _evict(self):
+        evicted = set()
+        while len(self.entries) > self.max_transactions or self.bytes > self.max_bytes:
+            _, neg_seq, tx_id = heapq.heappop(self._by_eviction)
+            entry = self.entries.get(tx_id)
+            if entry and entry.seq == -neg_seq:
+                self._remove(tx_id)
+                evicted.add(tx_id)
+        if evicted:
+            print(f"Mempool full: evicted {len(evicted)} lowest fee transaction(s)")
+        return evicted
+
+
+    def _remove(self, tx_id):
+        entry = self.entries.pop(tx_id, None)
+        if entry is None:
+            return None
+        self.bytes -= entry.size
+        self.spending[entry.tx.from_address] -= tx_cost(entry.tx)
+        if self.spending[entry.tx.from_address] <= 0:
+            del self.spending[entry.tx.from_address]
+        # Stale heap items are skipped on pop, rebuild once they dominate the heaps
+        if len(self._by_priority) > 2 * len(self.entries) + 64:
+            self._by_priority = [(-e.fee_rate, e.seq, i) for i, e in self.entries.items()]
+            self._by_eviction = [(e.fee_rate, -e.seq, i) for i, e in self.entries.items()]
+            heapq.heapify(self._by_priority)
+            heapq.heapify(self._by_eviction)
+        return entry.tx
+
+
+    def remove(self, tx_id):
+        """Remove a transaction, e.g. once it is in a block. Returns it, or None if it was not pending."""
+        with self.lock:
+            return self._remove(tx_id)
+
+
+    def select(self, max_transactions):
+        """The best paying transactions for the next block template. They stay in the pool."""
+        with self.lock:
+            selected = []
+            popped = []
+            while self._by_priority and len(selected) < max_transactions:
+                item = heapq.heappop(self._by_priority)
+                entry = self.entries.get(item[2])
+                if entry and entry.seq == item[1]:
+                    popped.append(item)
+                    selected.append(entry.tx)
+            for item in popped:
+                heapq.heappush(self._by_priority, item)
+            return selected
@@ -0,0 +1,56 @@
+import hashlib
+
+# Leaves and inner nodes are hashed with different prefixes, so an inner node
+# can never be passed off as a transaction id (second preimage protection)
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def _leaf_hash(tx_id):
+    return hashlib.sha256(LEAF_PREFIX + tx_id.encode()).digest()
+
+
+def _node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def _next_level(level):
+    if len(level) % 2:
+        level = level + [level[-1]]  # Odd count: the last node is paired with itself
+    return [_node_hash(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+
+
+def merkle_root(tx_ids):
+    """Merkle root (hex) of a list of transaction ids."""
+    if not tx_ids:
+        return hashlib.sha256(b"").hexdigest()
+    level = [_leaf_hash(tx_id) for tx_id in tx_ids]
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0].hex()
+
+
+def merkle_proof(tx_ids, position):
+    """
+    Inclusion proof for tx_ids[position]: the sibling hashes from the leaf up to the root,
+    each as [hash hex, "left" or "right"] telling on which side the sibling sits.
+    """
+    level = [_leaf_hash(tx_id) for tx_id in tx_ids]
+    proof = []
+    while len(level) > 1:
+        if len(level) % 2:
+            level = level + [level[-1]]
+        sibling = position ^ 1
+        proof.append([level[sibling].hex(), "left" if sibling < position else "right"])
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_proof(tx_id, proof, root):
+    """Check that tx_id is included in the block whose header commits to root."""
+    current = _leaf_hash(tx_id)
+    for sibling_hex, side in proof:
+        sibling = bytes.fromhex(sibling_hex)
+        current = _node_hash(sibling, current) if side == "left" else _node_hash(current, sibling)
+    return current.hex() == root
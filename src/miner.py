@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .difficulty import target_bytes
+from .block import MINER_HASHES, MINER_HASH_RATE
+
+NONCE_CHUNK = 20000  # Nonces a worker tries before checking the stop flag again
+
+# Set in every worker process by the pool initializer
+_stop_flag = None
+
+
+def _init_worker(stop_flag):
+    global _stop_flag
+    _stop_flag = stop_flag
+
+
+def _mine_range(block, worker_index, workers, chunk):
+    """
+    Search the nonce ranges of one worker until a hash meets the block difficulty.
+    Worker i owns the ranges [i*chunk, (i+1)*chunk), [(i+workers)*chunk, ...), ...
+    Returns (nonce, hash, hashes tried) or (None, None, hashes tried) when stopped.
+    """
+    target = target_bytes(block.difficulty_bits())
+    hasher, suffix = block.nonce_hasher()
+    start = worker_index * chunk
+    hashes = 0
+    while not _stop_flag.is_set():
+        for nonce in range(start, start + chunk):
+            h = hasher.copy()
+            h.update(str(nonce).encode() + suffix)
+            if h.digest() < target:
+                _stop_flag.set()  # Let the other workers quit early
+                return nonce, h.hexdigest(), hashes + nonce - start + 1
+        hashes += chunk
+        start += workers * chunk
+    return None, None, hashes
+
+
+class Miner:
+    """
+    Process-pool PoW engine: the nonce space is split into interleaved ranges,
+    one per worker, and all workers stop on the first winning hash.
+    """
+
+    def __init__(self, workers=None, chunk=NONCE_CHUNK):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk = chunk
+        self.last_report = None  # Stats of the last mining run
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_flag = self._context.Event()
+        self._pool = None
+
+    def _get_pool(self):
+        # The pool is created once and reused, spawning workers is expensive
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self._context,
+                initializer=_init_worker,
+                initargs=(self._stop_flag,)
+            )
+        return self._pool
+
+    def mine(self, block, stop_event=None):
+        """Mine the block in place. Returns the hash, or None if stop_event was set."""
+        self._stop_flag.clear()
+        started = time.time()
+        futures = [
+            self._get_pool().submit(_mine_range, block, i, self.workers, self.chunk)
+            for i in range(self.workers)
+        ]
+
+        pending = set(futures)
+        interrupted = False
+        while pending:
+            done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            if stop_event and stop_event.is_set() and not self._stop_flag.is_set():
+                interrupted = True
+                self._stop_flag.set()  # Cancels every worker at once
+
+        results = [f.result() for f in futures]
+        hashes = sum(r[2] for r in results)
+        elapsed = time.time() - started
+        for worker, (_, _, worker_hashes) in enumerate(results):
+            MINER_HASHES.inc(worker_hashes, worker=str(worker))
+            if elapsed > 0:
+                MINER_HASH_RATE.set(worker_hashes / elapsed, worker=str(worker))
+        self._report(block, hashes, elapsed)
+
+        winners = [r for r in results if r[0] is not None]
+        if interrupted or not winners:
+            print("⛔ Mining interrupted on Miner level!")
+            return None
+
+        block.nonce, block.hash, _ = winners[0]
+        return block.hash
+
+    def _report(self, block, hashes, elapsed):
+        rate = hashes / elapsed if elapsed > 0 else 0.0
+        self.last_report = {
+            "index": block.index,
+            "workers": self.workers,
+            "hashes": hashes,
+            "seconds": round(elapsed, 3),
+            "hashes_per_sec": round(rate, 1)
+        }
+        print(f"⛏️  Block {block.index}: {hashes} hashes in {elapsed:.2f}s "
+              f"on {self.workers} workers ({rate:,.0f} H/s)")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._stop_flag.set()
+            self._pool.shutdown(wait=True)
+            self._pool = None
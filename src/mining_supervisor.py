@@ -0,0 +1,140 @@
+import time
+from threading import Condition, Event, Thread
+
+from .block import Block
+
+TEMPLATE_REFRESH = 2  # Seconds before new transactions may restart a block template that still has room
+
+
+class BlockTemplate:
+    __slots__ = ("tip_hash", "transactions", "created")
+
+    def __init__(self, tip_hash, transactions):
+        self.tip_hash = tip_hash
+        self.transactions = transactions
+        self.created = time.time()
+
+
+class MiningSupervisor:
+    """
+    One long-lived thread that mines for the node. It builds a block template from the tip
+    and the best paying affordable transactions, runs the PoW (on the blockchain's worker pool),
+    and starts over on a fresh template when the tip moves or the mempool has better content.
+    Only one block is ever mined at a time, so no hashes are wasted on a duplicate template.
+    """
+
+    def __init__(self, node, template_refresh=TEMPLATE_REFRESH):
+        self.node = node
+        self.template_refresh = template_refresh
+        self.stop_event = Event()  # Aborts the PoW run in progress
+        self.wake = Condition()  # Guards the fields below
+        self.requested = 0  # Blocks asked for with /mine, mined even without transactions
+        self.template = None  # Template being mined, None when idle
+        self.running = False
+        self.thread = None
+
+
+    @property
+    def is_mining(self):
+        with self.wake:
+            return self.template is not None
+
+
+    def start(self):
+        with self.wake:
+            if self.running:
+                return
+            self.running = True
+        self.thread = Thread(target=self._run, name="mining-supervisor", daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+        with self.wake:
+            self.running = False
+            self.stop_event.set()
+            self.wake.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+
+    def request_block(self):
+        """Mine one more block, with whatever transactions are pending."""
+        with self.wake:
+            self.requested += 1
+            self.wake.notify_all()
+
+
+    def notify_tip_changed(self):
+        """A block from the network or a sync moved the tip: the current template is stale."""
+        with self.wake:
+            if self.template is not None:
+                print("🛑 Tip changed, restarting mining on the new tip.")
+                self.stop_event.set()
+            self.wake.notify_all()
+
+
+    def notify_mempool_changed(self):
+        """New transactions arrived: start mining, or refresh a template that has room for them."""
+        with self.wake:
+            template = self.template
+            if (template is not None and len(template.transactions) < self.node.max_block_transactions
+                    and time.time() - template.created >= self.template_refresh):
+                self.stop_event.set()
+            self.wake.notify_all()
+
+
+    def _select_transactions(self):
+        node = self.node
+        return node.blockchain.state.affordable(node.mempool.select(node.max_block_transactions))
+
+
+    def _next_template(self):
+        """Wait until there is something to mine. Returns the template, or None on shutdown."""
+        with self.wake:
+            while self.running:
+                transactions = self._select_transactions()
+                if transactions or self.requested:
+                    self.stop_event.clear()
+                    self.template = BlockTemplate(self.node.blockchain.get_latest_block().hash, transactions)
+                    return self.template
+                self.wake.wait()
+            return None
+
+
+    def _run(self):
+        while True:
+            template = self._next_template()
+            if template is None:
+                return
+            try:
+                new_block = self._mine(template)
+            except Exception as e:
+                print(f"⛔ Mining failed: {e}")
+                new_block = None
+            with self.wake:
+                self.template = None
+                if new_block is not None:
+                    self.requested = max(0, self.requested - 1)
+
+
+    def _mine(self, template):
+        node = self.node
+        node.broadcast_message(f"⛏️  Mining block with {len(template.transactions)} transaction(s).", type="mining")
+        new_block = node.blockchain.mine_block(Block.encode_transactions(template.transactions), stop_event=self.stop_event)
+        if new_block is None:
+            print("⛔ Mining interrupted, building a new template.")
+            return None
+
+        # Remove the mined transactions from the pool
+        for tx in template.transactions:
+            node.mempool.remove(tx.tx_id)
+        node.broadcast_block(new_block)
+        node.broadcast_message(f"✅ Block {new_block.index} mined, saved and broadcasted.", type="block",
+                               index=new_block.index, hash=new_block.hash)
+        if node.blockchain.miner and node.blockchain.miner.last_report:
+            report = node.blockchain.miner.last_report
+            node.broadcast_message(f"⚡ Hash rate: {report['hashes_per_sec']:,.0f} H/s on {report['workers']} workers",
+                                   type="hash_rate", coalesce="hash_rate",
+                                   hashes_per_sec=report['hashes_per_sec'], workers=report['workers'])
+        return new_block
@@ -1,191 +1,332 @@
-import requests
-from threading import Thread, Event
+import json
+import time
+from . import codec
+from . import compact_block
+from . import metrics
 from .blockchain import Blockchain
 from .block import Block
+from .transaction import Transaction
+from .peer_client import PeerClient
+from .mempool import Mempool
+from .verifier import SignatureVerifier
+from .mining_supervisor import MiningSupervisor
+from .event_bus import EventBus
+from .gossip import SeenFilter, TransactionRelay
+
+HEADERS_BATCH = 2000  # Headers requested per /headers call
+NDJSON = "application/x-ndjson"  # Streamed /blocks responses, one block record per line
+MAX_BLOCK_TRANSACTIONS = 100  # Transactions packed into one block
+SENT_AT_HEADER = "X-Sent-At"  # Send time of a broadcast, for propagation latency
+
+SYNC_SECONDS = metrics.histogram("sync_seconds", "Duration of a chain sync with peers")
+SYNC_BLOCKS = metrics.counter("sync_blocks_total", "Blocks connected to the main chain by syncing")
+MEMPOOL_TRANSACTIONS = metrics.gauge("mempool_transactions", "Pending transactions in the mempool")
+MEMPOOL_BYTES = metrics.gauge("mempool_bytes", "Serialized size of the pending transactions")
+RELAY_BYTES = metrics.counter("block_relay_bytes_total", "Request body bytes sent to relay blocks, by message")
 
 class Node:
-    def __init__(self, app, node_id, port, peers=None):
+    def __init__(self, app, node_id, port, peers=None, mining_workers=None, full_verify=False, max_block_transactions=MAX_BLOCK_TRANSACTIONS, miner_address=None, headers_only=False, compact_relay=True):
         self.app = app
         self.node_id = node_id
         self.port = port
         self.node_url = f"http://localhost:{port}"
         self.peers = set(peers or [])  # Start with known peers
 
-        self.subscribers = []
-        self.stop_event = Event()  # Event to stop mining thread if needed
-        self.pending_transactions = []  # List to hold pending transactions
-        self.is_mining = False
-        self.mining_thread = None
+        self.events = EventBus()  # Typed events for the /stream subscribers of the web UI
+        self.mempool = Mempool()  # Pending transactions, best fee rate first
+        self.max_block_transactions = max_block_transactions
+        self.compact_relay = compact_relay  # Announce blocks and send header + short ids instead of full blocks
+        self.peer_client = PeerClient()  # Pooled connections and concurrent fan-out to peers
+        self.verifier = SignatureVerifier()  # Cached and batched signature checks
+        self.seen_transactions = SeenFilter()  # Recently received tx_ids, checked before decoding
+        self.tx_relay = TransactionRelay(self)  # Batched, bounded fan-out gossip of new transactions
+        MEMPOOL_TRANSACTIONS.set_function(lambda: len(self.mempool))
+        MEMPOOL_BYTES.set_function(lambda: self.mempool.bytes)
 
         # ✅ Initialize blockchain first
-        self.blockchain = Blockchain(node_id=node_id)
+        self.blockchain = Blockchain(node_id=node_id, mining_workers=mining_workers, full_verify=full_verify,
+                                     miner_address=miner_address, headers_only=headers_only)
+
+        # The only thread that mines: follows tip and mempool changes
+        self.mining_supervisor = MiningSupervisor(self)
 
         # self.setup_routes()
         self.register_with_peers()
         self.sync_chain()
+        self.mining_supervisor.start()
+        self.tx_relay.start()
 
 
-    # Broadcast message to subscribers            
-    def broadcast_message(self, msg):
-        for q in self.subscribers:
-            try:
-                q.put(msg)
-            except:
-                continue
-    
+    # Broadcast message to subscribers, never blocks the caller
+    def broadcast_message(self, msg, type="log", coalesce=None, **data):
+        self.events.publish(type, msg, coalesce=coalesce, **data)
+
 
     # Register with known peers and discover new peers
-    # This is a recursive function that will keep trying to register with new peers
+    # Registers with all known peers at once, then once more with the peers they told us about
     def register_with_peers(self):
 
         known_peers = set(self.peers)
         new_discovered_peers = set()
-        for peer_url in list(known_peers):
-            try:
-                res = requests.post(f"{peer_url}/register", json={"peer": self.node_url})
-                if res.status_code == 200:
-                    received_peers = set(res.json().get("peers", []))
-                    discovered_peers = received_peers - known_peers - {self.node_url}
-                    new_discovered_peers.update(discovered_peers)
-                    self.peers.update(discovered_peers)
-                    print(f"[+] Registered with {peer_url} — discovered {len(discovered_peers)} new peer(s)")
-            except Exception as e:
-                print(f"[!] Failed to register with {peer_url}: {e}")
+        payload = {"peer": self.node_url}
+        for peer_url, res in self.peer_client.fan_out("POST", known_peers, "/register", json=payload).items():
+            if isinstance(res, Exception):
+                print(f"[!] Failed to register with {peer_url}: {res}")
+            elif res.status_code == 200:
+                received_peers = set(res.json().get("peers", []))
+                discovered_peers = received_peers - known_peers - {self.node_url}
+                new_discovered_peers.update(discovered_peers)
+                self.peers.update(discovered_peers)
+                print(f"[+] Registered with {peer_url} — discovered {len(discovered_peers)} new peer(s)")
 
         # Recursive step: try registering with newly discovered peers
-        for new_peer in new_discovered_peers:
-            if new_peer != self.node_url:
-                try:
-                    res = requests.post(f"{new_peer}/register", json={"peer": self.node_url})
-                    if res.status_code == 200:
-                        received_peers = set(res.json().get("peers", []))
-                        self.peers.update(received_peers - {self.node_url})
-                        print(f"[+] Recursively registered with {new_peer}")
-                except Exception as e:
-                    print(f"[!] Failed to register with {new_peer}: {e}")
+        new_discovered_peers.discard(self.node_url)
+        for new_peer, res in self.peer_client.fan_out("POST", new_discovered_peers, "/register", json=payload).items():
+            if isinstance(res, Exception):
+                print(f"[!] Failed to register with {new_peer}: {res}")
+            elif res.status_code == 200:
+                received_peers = set(res.json().get("peers", []))
+                self.peers.update(received_peers - {self.node_url})
+                print(f"[+] Recursively registered with {new_peer}")
 
-        self.broadcast_message(f"Known peers: {known_peers}")
+        self.broadcast_message(f"Known peers: {known_peers}", type="peers", peers=sorted(known_peers))
 
 
     # Sync chain with other nodes
-    def sync_chain(self):
-        self.register_with_peers()  # Register with peers before syncing
-        longest_chain = self.blockchain.chain
-        self.broadcast_message("⏳ Syncing the blockchain with peers...")
-        for peer in self.peers:
-            # Skip self node
-            if peer == self.node_url:
-                continue  # 🔁 Skip self
-            print(f"Syncing with {peer}...")
+    # Headers first: ask all peers for their common ancestor with us at once,
+    # then download only the blocks above it from the peer with the most work
+    @metrics.timed(SYNC_SECONDS)
+    def sync_chain(self, peers=None):
+        if peers is None:
+            self.register_with_peers()  # Register with peers before syncing
+            peers = self.peers
+        local_chain = list(self.blockchain.chain)
+        local_tip = self.blockchain.tree.best
+        self.broadcast_message("⏳ Syncing the blockchain with peers...", type="sync")
+
+        peers = set(peers) - {self.node_url}  # 🔁 Skip self
+        candidates = []
+        for peer, result in self.peer_client.map(lambda peer: self.find_common_ancestor(peer, local_chain), peers).items():
+            if isinstance(result, Exception):
+                print(f"Could not sync with {peer}: {result}")
+                continue
+            ancestor, remote_tip, remote_work = result
+            if ancestor is None:
+                print(f"No common ancestor with {peer}: different genesis block")
+                continue
+            candidates.append((peer, ancestor, remote_tip, remote_work))
+
+        # Most cumulative work first, the earliest tip timestamp wins ties
+        candidates.sort(key=lambda c: (-c[3], c[2]['timestamp']))
+        updated = False
+        for peer, ancestor, remote_tip, remote_work in candidates:
+            if (remote_work, -remote_tip['timestamp']) <= (local_tip.work, -local_tip.block.timestamp):
+                break
             try:
-                res = requests.get(f"{peer}/chain", timeout=3)
-                remote_chain_data = res.json()
-                remote_chain = [Block.from_dict(b) for b in remote_chain_data]
-                
-                # Validate the remote chain
-                if not remote_chain:
-                    print(f"Empty chain from {peer}")
-                    continue
-                elif not self.blockchain.validate_chain(remote_chain):
-                    print(f"Invalid chain from {peer}: malformed")
-                    continue
-
-                if len(remote_chain) > len(longest_chain):
-                    longest_chain = remote_chain
-                elif len(remote_chain) == len(longest_chain):
-                    # Choose the chain with the earliest timestamp
-                    if remote_chain[-1].timestamp < longest_chain[-1].timestamp:
-                        longest_chain = remote_chain
-                    # Alternatively, you can compare the hashes of the last blocks
-                    # if remote_chain[-1].hash < longest_chain[-1].hash:
+                result = self.fetch_blocks(peer, ancestor + 1, remote_tip['index'])
             except Exception as e:
                 print(f"Could not sync with {peer}: {e}")
+                continue
+            if result is None:
+                print(f"Invalid chain from {peer}: malformed")
+                continue
+            disconnected, connected = result
+            SYNC_BLOCKS.inc(len(connected))
+            self.update_mempool(disconnected, connected)
+            print(f"{peer}: common ancestor at height {ancestor}, {len(connected)} block(s) connected")
+            updated = bool(connected)
+            break
 
-        if longest_chain != self.blockchain.chain:
-            self.blockchain.chain = longest_chain
-            self.blockchain.save_chain()
-            self.broadcast_message(f"✅ Chain updated from peers.")
+        if updated:
+            self.mining_supervisor.notify_tip_changed()
+            self.broadcast_message(f"✅ Chain updated from peers.", type="chain", height=self.blockchain.get_latest_block().index)
         else:
-            self.broadcast_message(f"✅ No updates from peers. Current chain is up to date.")
+            self.broadcast_message(f"✅ No updates from peers. Current chain is up to date.", type="sync")
 
 
-    # Mining in a separate thread
-    def start_mining(self):
-        def mine_block():
-            self.is_mining = True
-            # self.stop_event = Event()
-            self.stop_event.clear()
-
-            self.sync_chain()  # make sure this fetches the longest valid chain
-
-            # Mine and save the new block
-            transaction = self.pending_transactions[0] if self.pending_transactions else "empty"
-            transaction_data = transaction.to_json() if transaction != "empty" else "empty"
-
-            # TODO: Pass transaction as string and then parse it to multiple lines on frontend
-            # self.broadcast_message(f"⛏️  Mining block with data: {transaction_data}")
-            self.broadcast_message(f"⛏️  Mining block with transaction. Tx id: {transaction.tx_id}")
-            
-            new_block = self.blockchain.mine_block(transaction_data, stop_event=self.stop_event)
-
-            if new_block is None:
-                print("⛔ Mining interrupted on Node level!")
-                self.broadcast_message("⛔ Mining interrupted on receiving a valid block!")
-                self.is_mining = False
-                # If mining was interrupted, check if more transactions in the pool
-                # and start mining again
-                if self.pending_transactions:
-                    self.broadcast_message("🔁 More transactions in the pool. Starting mining again...")
-                    self.start_mining() # Recursive call to mine next block
-                return None
-            
-            # Remove the mined transaction from the pool
-            if transaction in self.pending_transactions:
-                self.pending_transactions.remove(transaction)
-            # Broadcast the new block to peers
-            self.broadcast_block(new_block)
-            # self.broadcast_to_subscribers(new_block)
-            self.broadcast_message(f"✅ Block {new_block.index} mined, saved and broadcasted.")
-            self.is_mining = False  # Stop mining after broadcasting
-
-            # ✅ Check if more transactions are still in the pool
-            if self.pending_transactions:
-                self.broadcast_message("🔁 Continuing mining pending transactions...")
-                self.start_mining()  # Recursive call to mine next block
-
-            return new_block
-        
-        self.mining_thread = Thread(target=mine_block)
-        self.mining_thread.start()
-
-
-    def broadcast_transaction(self, transaction):
-        payload = {
-            "transaction": transaction.to_dict(),
-            "peer": self.node_url
-        }
-        for peer in self.peers:
+    def find_common_ancestor(self, peer, chain):
+        """
+        Returns (height of the last block shared with the peer, peer's tip header, peer's cumulative work).
+        Steps back from our tip with exponentially growing steps, so a short fork costs one request.
+        """
+        start = len(chain) - 1
+        step = 1
+        while True:
+            res = self.peer_client.get(peer, "/headers", params={"from": start, "count": HEADERS_BATCH}, timeout=3)
+            data = res.json()
+            headers = data["headers"]
+            if headers and headers[0]["hash"] == chain[start].hash:
+                ancestor = start
+                for header in headers[1:]:
+                    if header["index"] >= len(chain) or header["hash"] != chain[header["index"]].hash:
+                        break
+                    ancestor = header["index"]
+                return ancestor, data["tip"], data["work"]
+            if start == 0:
+                return None, data["tip"], data["work"]
+            start = max(0, min(start - step, data["height"]))
+            step *= 2
+
+
+    def fetch_blocks(self, peer, start, end):
+        """
+        Download the blocks from height start to end and add them to the block tree one by one
+        as they arrive and pass the validation pipeline, which switches the main chain once the branch has more work.
+        Returns (disconnected, connected) main chain blocks, or None on the first invalid block,
+        in which case the rest of the download is dropped.
+        """
+        disconnected, connected = [], []
+        while start <= end:
+            res = self.peer_client.get(peer, "/blocks", params={"from": start, "to": end}, timeout=3,
+                                       stream=True, headers={"Accept": f"{codec.CONTENT_TYPE}, {NDJSON};q=0.9"})
+            received = 0
             try:
-                r = requests.post(f"{peer}/submit_transaction", json=payload, timeout=2)
-                if not r.ok:
-                    print(f"{peer} rejected transaction: {r.text}")
-            except Exception as e:
-                print(f"Error sending transaction to {peer}: {e}")
+                # Hashes, PoW and signatures are checked on the validation pool while the download goes on
+                for block, error in self.blockchain.validator.checked(self.iter_blocks(res)):
+                    if error:
+                        print(f"Invalid block {block.index} from {peer}: {error}")
+                        return None
+                    status, block_disconnected, block_connected = self.blockchain.accept_block(block, checked=True)
+                    if status in ("invalid", "orphan"):
+                        return None
+                    disconnected += block_disconnected
+                    connected += block_connected
+                    start = block.index + 1
+                    received += 1
+            finally:
+                res.close()
+            if not received:
+                return None
+        return disconnected, connected
+
+
+    @staticmethod
+    def iter_blocks(res):
+        """
+        Blocks of a /blocks response, decoded one at a time from a binary or NDJSON stream.
+        Peers that only answer with a JSON array (capped at their MAX_BLOCKS) are read in one piece.
+        """
+        content_type = res.headers.get("Content-Type", "")
+        if content_type.startswith(codec.CONTENT_TYPE):
+            for payload in codec.iter_frames(res.iter_content(chunk_size=65536)):
+                yield codec.decode_block(payload)
+        elif content_type.startswith(NDJSON):
+            for line in res.iter_lines():
+                if line:
+                    yield Block.from_record(json.loads(line))
+        else:
+            for record in res.json():
+                yield Block.from_record(record)
+
+
+    def update_mempool(self, disconnected, connected):
+        """Transactions of blocks that joined the main chain leave the pool, those of disconnected blocks return."""
+        mined = set()
+        for block in connected:
+            for tx in block.get_transactions():
+                mined.add(tx.tx_id)
+                if self.mempool.remove(tx.tx_id):
+                    print(f"Removed transactions from pending transactions. Removed ID: {tx.tx_id}")
+                    self.broadcast_message(f"Transaction removed from pending transactions. tx_id: {tx.tx_id} .",
+                                           type="mempool", coalesce="mempool", size=len(self.mempool))
+        for block in disconnected:
+            for tx in block.get_transactions():
+                if tx.tx_id not in mined:
+                    self.mempool.add(tx)
+
+
+    @property
+    def is_mining(self):
+        return self.mining_supervisor.is_mining
+
+
+    def start_mining(self):
+        """Ask the mining supervisor for a block, even if no transactions are pending."""
+        self.mining_supervisor.request_block()
+
+
+    def post_encoded(self, path, body, payload, peers=None):
+        """
+        POST the binary encoding to every peer, then the JSON payload to the peers
+        that do not accept it (HTTP 415). Returns {peer: response or exception}.
+        """
+        sent_at = {SENT_AT_HEADER: repr(time.time())}
+        peers = self.peers if peers is None else peers
+        results = self.peer_client.fan_out("POST", peers, path, data=body,
+                                           headers={"Content-Type": codec.CONTENT_TYPE, **sent_at})
+        legacy = [peer for peer, r in results.items() if not isinstance(r, Exception) and r.status_code == 415]
+        if legacy:
+            results.update(self.peer_client.fan_out("POST", legacy, path, json=payload, headers=sent_at))
+        return results
+
+
+    def broadcast_transaction(self, transaction, origin=None):
+        """Queue the transaction for gossip to a few random peers. origin: the peer it came from."""
+        self.tx_relay.relay(transaction, origin)
 
 
     def broadcast_block(self, block=None):
-        block_data = block.__dict__
+        compact = compact_block.make_compact(block) if self.compact_relay else None
+        if compact is None:
+            self.send_full_block(block, self.peers)
+            return
+        results = self.peer_client.map(lambda peer: self.relay_compact_block(peer, block, compact), self.peers)
+        # Peers that could not rebuild the block, or predate compact relay, get the full block
+        full = [peer for peer, needs_full in results.items() if needs_full is True]
+        for peer, r in results.items():
+            if isinstance(r, Exception):
+                print(f"Error sending block to {peer}: {r}")
+        if full:
+            self.send_full_block(block, full)
+
+
+    def relay_compact_block(self, peer, block, compact):
+        """
+        Announce the block to one peer, then send it the compact block if the peer wants it.
+        Returns True when the peer needs the full block instead.
+        """
+        announcement = json.dumps({"peer": self.node_url, "blocks": [block.hash]})
+        RELAY_BYTES.inc(len(announcement), message="inv")
+        res = self.peer_client.post(peer, "/inv", data=announcement, headers={"Content-Type": "application/json"})
+        if res.status_code == 404:
+            return True
+        if not res.ok or block.hash not in res.json().get("want", []):
+            return False
+        body = json.dumps({"miner": self.node_url, "block": compact})
+        RELAY_BYTES.inc(len(body), message="compact_block")
+        res = self.peer_client.post(peer, "/compact_block", data=body, headers={
+            "Content-Type": "application/json", SENT_AT_HEADER: repr(time.time())})
+        if res.status_code in (404, 409):
+            return True
+        if not res.ok:
+            print(f"{peer} rejected block: {res.text}")
+        return False
+
+
+    def send_full_block(self, block, peers):
+        body = codec.pack_message(self.node_url, codec.encode_block(block))
         payload = {
             "miner": self.node_url,
-            "block": block_data
+            "block": block.to_record()
         }
-        for peer in self.peers:
-            try:
-                r = requests.post(f"{peer}/receive_block", json=payload, timeout=2)
-                if not r.ok:
-                    print(f"{peer} rejected block: {r.text}")
-            except Exception as e:
-                print(f"Error sending block to {peer}: {e}")
+        RELAY_BYTES.inc(len(body) * len(peers), message="block")
+        for peer, r in self.post_encoded("/receive_block", body, payload, peers).items():
+            if isinstance(r, Exception):
+                print(f"Error sending block to {peer}: {r}")
+            elif not r.ok:
+                print(f"{peer} rejected block: {r.text}")
+
 
-    def run(self):
-        self.app.run(port=self.port, debug=False, threaded=True)
\ No newline at end of file
+    def fetch_block_transactions(self, peer, block_hash, indexes):
+        """Transactions of a peer's block at the given positions, asked for when rebuilding a compact block."""
+        res = self.peer_client.get(peer, f"/block/{block_hash}/txs", params={"indexes": ",".join(map(str, indexes))})
+        res.raise_for_status()
+        return [Transaction.from_dict(tx) for tx in res.json()["transactions"]]
+
+    def run(self, async_runtime=False):
+        if async_runtime:
+            # Connections on an event loop, handlers on thread pools
+            from .async_server import AsyncNodeServer
+            AsyncNodeServer(self).run()
+        else:
+            self.app.run(port=self.port, debug=False, threaded=True)
\ No newline at end of file
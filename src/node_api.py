@@ -1,17 +1,175 @@
 from flask import request, jsonify, render_template, Response
-import queue
-from urllib.parse import urlparse
+from ecdsa.errors import MalformedPointError
 import json
+import time
+from urllib.parse import urlparse
 
+from . import codec
+from . import compact_block
+from . import metrics
+from .event_bus import event_stream
 from .block import Block
+from .node import SENT_AT_HEADER
 from .transaction import Transaction
 
+MAX_HEADERS = 2000  # Headers returned by one /headers request
+MAX_BLOCKS = 500  # Blocks returned by one /blocks request
+MAX_PAGE = 100  # Transactions returned by one /address/<addr>/txs request
+NDJSON = "application/x-ndjson"  # One block record per line, requested with the Accept header
+# What decoding a block or transaction from a peer raises on bad input. Public keys are parsed
+# lazily, a malformed one surfaces as ecdsa's MalformedPointError wherever it is first used.
+MALFORMED = (ValueError, KeyError, TypeError, AttributeError, MalformedPointError)
+
+PROPAGATION_SECONDS = metrics.histogram("block_propagation_seconds", "Time from a peer broadcasting a block to receiving it")
+BLOCKS_RECEIVED = metrics.counter("blocks_received_total", "Blocks received from peers, by outcome")
+TRANSACTIONS_RECEIVED = metrics.counter("transactions_received_total", "Transactions submitted or gossiped to this node, by outcome")
+COMPACT_BLOCKS = metrics.counter("compact_blocks_total", "Compact blocks received: rebuilt from the mempool, with missing transactions fetched, or sent in full")
+
+
+def block_format():
+    """Response format for block lists picked from the Accept header: JSON array, NDJSON or binary frames."""
+    return request.accept_mimetypes.best_match(["application/json", NDJSON, codec.CONTENT_TYPE])
+
+
+def is_peer_url(url):
+    try:
+        parsed = urlparse(url)
+    except (TypeError, ValueError):
+        return False
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
+def is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def json_tx_id(tx_data):
+    """tx_id announced in a JSON transaction, checked against the seen filter before decoding."""
+    tx_id = tx_data.get("tx_id") if isinstance(tx_data, dict) else None
+    return tx_id if isinstance(tx_id, str) else None
+
+
+def is_binary():
+    return request.mimetype == codec.CONTENT_TYPE
+
+
+def stream_blocks(blocks, mimetype="application/json"):
+    """Serialize blocks one at a time as they are sent, so the response never holds the whole chain."""
+    if mimetype == codec.CONTENT_TYPE:
+        return Response((codec.frame(codec.encode_block(block)) for block in blocks), mimetype=codec.CONTENT_TYPE)
+    if mimetype == NDJSON:
+        return Response((json.dumps(block.to_record()) + "\n" for block in blocks), mimetype=NDJSON)
+    def json_array():
+        yield "["
+        for i, block in enumerate(blocks):
+            yield ("," if i else "") + json.dumps(block.to_record())
+        yield "]"
+    return Response(json_array(), mimetype="application/json")
+
 class NodeAPI:
     def __init__(self, app, node):
         self.app = app
         self.node = node
         self.setup_routes()
 
+    def has_funds(self, tx):
+        """Balance check against the state index, counting what the sender already has pending."""
+        pending = {tx.from_address: self.node.mempool.spent_by(tx.from_address)}
+        return bool(self.node.blockchain.state.affordable([tx], pending=pending))
+
+    def register_sender(self, peer):
+        if isinstance(peer, str) and is_peer_url(peer) and peer != self.node.node_url and peer not in self.node.peers:
+            self.node.broadcast_message(f"[+] Transaction submitted by unknown peer: {peer}. Registering the peer...")
+            self.node.peers.add(peer)
+
+    def admit_transaction(self, tx, peer=None, valid=None):
+        """
+        Check a new transaction and add it to the mempool, then gossip it on (never back to peer).
+        valid: result of verifying the transaction in a batch already, None verifies it here.
+        Returns (outcome: "accepted", "duplicate" or "rejected", message).
+        """
+        if not (self.node.verifier.verify(tx) if valid is None else valid):
+            print(f"⛏️  Invalid transaction: {tx} - Rejecting.")
+            outcome, message = "rejected", 'Invalid transaction'
+        elif tx.tx_id in self.node.mempool:
+            print(f"⛏️  Duplicate transaction: {tx} - Rejecting.")
+            outcome, message = "duplicate", 'Duplicate transaction'
+        elif self.node.blockchain.index.tx_location(tx.tx_id) is not None:
+            print(f"⛏️  Transaction already mined: {tx.tx_id} - Rejecting.")
+            outcome, message = "duplicate", 'Transaction already mined'
+        elif not self.has_funds(tx):
+            print(f"⛏️  Insufficient balance: {tx.tx_id} - Rejecting.")
+            outcome, message = "rejected", 'Insufficient balance'
+        elif not self.node.mempool.add(tx):
+            print(f"⛏️  Mempool full, fee too low: {tx.tx_id} - Rejecting.")
+            outcome, message = "rejected", 'Mempool full, fee too low'
+        else:
+            outcome, message = "accepted", 'Transaction accepted'
+            self.node.broadcast_transaction(tx, origin=peer)
+        if outcome != "rejected":
+            # Only verified transactions enter the filter: a forged copy cannot mask the real one
+            self.node.seen_transactions.add(tx.tx_id)
+        TRANSACTIONS_RECEIVED.inc(outcome=outcome)
+        return outcome, message
+
+    def accept_block(self, block, miner):
+        """Validate a block received from a peer and connect it. Returns the Flask response."""
+        sent_at = request.headers.get(SENT_AT_HEADER, type=float)
+        if sent_at is not None:
+            PROPAGATION_SECONDS.observe(max(time.time() - sent_at, 0))
+        try:                
+            # Validate the miner URL
+            if not is_peer_url(miner):
+                print(f"Block received from miner with invalid URL: {miner}")
+                return "Invalid miner URL", 400
+            print(f"Valid miner URL: {miner}")
+
+            # Add miner to peers if it's not self and not already added
+            if (miner != self.node.node_url) and (miner not in self.node.peers):
+                self.node.broadcast_message(f"[+] New block submitted by unknown peer: {miner}. Registering the peer...")
+                self.node.peers.add(miner)
+
+            # Validate received block
+            if block is None:
+                return jsonify({'error': 'Invalid block'}), 400
+            if block.hash in self.node.blockchain.tree:
+                return jsonify({'message': 'Block already known'}), 200
+
+            # Transactions already verified in our mempool are not checked again
+            if not self.node.verifier.verify_block(block):
+                print(f"Received block #{block.index} from {miner} has invalid transaction signatures.")
+                return jsonify({'error': 'Invalid transaction signature'}), 400
+
+            status, disconnected, connected = self.node.blockchain.accept_block(block)
+            BLOCKS_RECEIVED.inc(status=status)
+            if status == "invalid":
+                print(f"Received block {block} from {miner} is invalid.")
+                return jsonify({'error': 'Invalid block'}), 400
+            if status == "orphan":
+                # Only the blocks between our chain and the orphan are missing: fetch them from the miner
+                self.node.broadcast_message(f"Block #{block.index} from {miner} has an unknown parent. Syncing with the miner...")
+                self.node.sync_chain(peers=[miner])
+                return jsonify({'message': 'Block parent unknown, synced with miner'}), 202
+            if status in ("side", "known"):
+                print(f"Block #{block.index} from {miner} stored on a side branch.")
+                return jsonify({'message': 'Block stored on a side branch'}), 200
+
+            if status == "reorg":
+                self.node.broadcast_message(f"🔀 Chain reorganized by block {block.index} from {miner}: {len(disconnected)} block(s) replaced.",
+                                            type="reorg", index=block.index, replaced=len(disconnected))
+            self.node.broadcast_message(f"✅ Block {block.index} accepted from {miner}.", type="block",
+                                        index=block.index, hash=block.hash)
+            # Remove the transactions of new blocks from pending transactions
+            self.node.update_mempool(disconnected, connected)
+            # Mining on the old tip is wasted: restart on the new one
+            self.node.mining_supervisor.notify_tip_changed()
+            # self.node.broadcast_to_subscribers(block, miner)  # broadcast to frontend subscribers
+            return jsonify({'message': 'Block added'}), 200
+
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+
     def setup_routes(self):
         @self.app.route('/')
         def home():
@@ -19,12 +177,108 @@ class NodeAPI:
 
         @self.app.route('/chain', methods=['GET'])
         def get_chain():
-            return [block.__dict__ for block in self.node.blockchain.chain]
+            return stream_blocks(list(self.node.blockchain.chain), block_format())
         
+        @self.app.route('/headers', methods=['GET'])
+        def get_headers():
+            """Headers from height `from` on, plus the tip, so peers can find the common ancestor."""
+            chain = self.node.blockchain.chain
+            start = max(request.args.get('from', 0, type=int), 0)
+            count = min(request.args.get('count', MAX_HEADERS, type=int), MAX_HEADERS)
+            return jsonify({
+                "height": len(chain) - 1,
+                "tip": chain[-1].to_header(),
+                "work": self.node.blockchain.tree.best.work,
+                "headers": [block.to_header() for block in chain[start:start + count]]
+            })
+
+        @self.app.route('/blocks', methods=['GET'])
+        def get_blocks():
+            """
+            Full blocks from height `from` to height `to` (inclusive). A JSON array holds at most MAX_BLOCKS,
+            NDJSON and binary streams cover the whole range since they are sent block by block.
+            """
+            chain = self.node.blockchain.chain
+            start = max(request.args.get('from', 0, type=int), 0)
+            end = request.args.get('to', len(chain) - 1, type=int)
+            mimetype = block_format()
+            if mimetype not in (NDJSON, codec.CONTENT_TYPE):
+                end = min(end, start + MAX_BLOCKS - 1)
+            return stream_blocks(chain[start:end + 1], mimetype)
+
+        @self.app.route('/block/<block_hash>', methods=['GET'])
+        def get_block(block_hash):
+            height = self.node.blockchain.index.block_height(block_hash)
+            if height is None:
+                return jsonify({'error': 'Block not found'}), 404
+            return jsonify(self.node.blockchain.chain[height].to_record())
+
+        @self.app.route('/tx/<tx_id>', methods=['GET'])
+        def get_tx(tx_id):
+            location = self.node.blockchain.index.tx_location(tx_id)
+            if location is None:
+                return jsonify({'error': 'Transaction not found'}), 404
+            height, position = location
+            block = self.node.blockchain.chain[height]
+            return jsonify({
+                'tx': block.get_transactions()[position].to_dict(),
+                'height': height,
+                'position': position,
+                'block_hash': block.hash,
+                'proof': block.get_merkle_proof(tx_id)
+            })
+
+        @self.app.route('/address/<address>/txs', methods=['GET'])
+        def get_address_txs(address):
+            """Transactions of an address, newest first. Pass next_cursor back as ?cursor= for the next page."""
+            limit = max(1, min(request.args.get('limit', MAX_PAGE, type=int), MAX_PAGE))
+            try:
+                rows, next_cursor = self.node.blockchain.index.address_history(address, request.args.get('cursor'), limit)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            chain = self.node.blockchain.chain
+            txs = [{
+                'tx': chain[height].get_transactions()[position].to_dict(),
+                'height': height,
+                'position': position
+            } for height, position, _tx_id in rows]
+            return jsonify({'address': address, 'txs': txs, 'next_cursor': next_cursor})
+
+        @self.app.route('/block/<int:height>/proof/<tx_id>', methods=['GET'])
+        def get_merkle_proof(height, tx_id):
+            """Header plus Merkle inclusion proof, so light clients can check a transaction without the block body."""
+            chain = self.node.blockchain.chain
+            if height >= len(chain):
+                return jsonify({'error': 'Block not found'}), 404
+            block = chain[height]
+            proof = block.get_merkle_proof(tx_id)
+            if proof is None:
+                return jsonify({'error': 'Transaction not in a Merkle-root block'}), 404
+            return jsonify({'header': block.to_header(), 'tx_id': tx_id, 'proof': proof})
+
+        @self.app.route('/balance/<address>', methods=['GET'])
+        def get_balance(address):
+            return jsonify({
+                "address": address,
+                "balance": self.node.blockchain.state.balance(address),
+                "pending_spend": self.node.mempool.spent_by(address),
+                "height": self.node.blockchain.state.height
+            })
+
+        @self.app.route('/metrics', methods=['GET'])
+        def get_metrics():
+            """Counters, gauges and latency histograms in the Prometheus text format."""
+            return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
         @self.app.route('/peers', methods=['GET'])
         def get_peers():
             return jsonify({"peers": list(self.node.peers)})
         
+        @self.app.route('/peer_stats', methods=['GET'])
+        def get_peer_stats():
+            """Request count, failures and latency of the calls made to each peer."""
+            return jsonify(self.node.peer_client.get_stats())
+
         @self.app.route('/sync', methods=['POST'])
         def sync():
             try:
@@ -40,45 +294,105 @@ class NodeAPI:
             peer_url = data.get("peer")
             if peer_url and (peer_url != self.node.node_url) and peer_url not in self.node.peers:
                 self.node.peers.add(peer_url)
-                self.node.broadcast_message(f"[+] Discovered new peer: {peer_url}")
+                self.node.broadcast_message(f"[+] Discovered new peer: {peer_url}", type="peers", peers=sorted(self.node.peers))
             return jsonify({"peers": list(self.node.peers)})
 
         @self.app.route('/transactions', methods=['GET'])
         def get_transactions():
-            return [tx.to_dict() for tx in self.node.pending_transactions]
+            return [tx.to_dict() for tx in self.node.mempool]
         
 
         @self.app.route('/submit_transaction', methods=['POST'])
         def submit_transaction():
-            data = request.get_json()
-
-            peer = data.get("peer")
-            if peer and peer != self.node.node_url and peer not in self.node.peers:
-                self.node.broadcast_message(f"[+] Transaction submitted by unknown peer: {peer}. Registering the peer...")
-                self.node.peers.add(peer)
+            if is_binary():
+                try:
+                    peer, tx_data = codec.unpack_message(request.get_data())
+                except ValueError:
+                    return jsonify({'error': 'Malformed transaction'}), 400
+                tx_id = codec.peek_tx_id(tx_data)
+            else:
+                data = request.get_json(silent=True)
+                if not isinstance(data, dict):
+                    return jsonify({'error': 'Malformed transaction'}), 400
+                peer = data.get("peer")
+                tx_data = data.get("transaction")
+                tx_id = json_tx_id(tx_data)
+            self.register_sender(peer)
 
-            tx_data = data.get("transaction")
             if not tx_data:
                 return jsonify({'error': 'No transaction data provided'}), 400
-            
-            # Validate received transaction
-            tx = Transaction.from_dict(tx_data)
-            if not tx.is_valid():
-                print(f"⛏️  Invalid transaction: {tx} - Rejecting.")
-                return jsonify({'error': 'Invalid transaction'}), 400
-            if tx in self.node.pending_transactions:
-                print(f"⛏️  Duplicate transaction: {tx} - Rejecting.")
+            # Gossiped transactions arrive from several peers: drop repeats before decoding and verifying
+            if tx_id in self.node.seen_transactions:
+                TRANSACTIONS_RECEIVED.inc(outcome="duplicate")
                 return jsonify({'message': 'Duplicate transaction'}), 400
-            
-            self.node.broadcast_message(f"⛏️  New transaction submitted: {tx}")
-            self.node.pending_transactions.append(tx)
-            self.node.broadcast_transaction(tx)
+            try:
+                tx = codec.decode_transaction(tx_data) if is_binary() else Transaction.from_dict(tx_data)
+            except MALFORMED:
+                return jsonify({'error': 'Malformed transaction'}), 400
 
-            # ✅ If not already mining, start mining
-            if not self.node.is_mining:
-                print(f"⛏️  Starting mining on received transaction.")
-                self.node.start_mining()
-            return jsonify({'message': 'Transaction accepted'}), 200
+            outcome, message = self.admit_transaction(tx, peer)
+            if outcome != "accepted":
+                return jsonify({'message' if outcome == "duplicate" else 'error': message}), 400
+            self.node.broadcast_message(f"⛏️  New transaction submitted: {tx}", type="mempool", coalesce="mempool",
+                                        size=len(self.node.mempool))
+
+            # ✅ Mine it: wakes the mining supervisor, or refreshes the template it is mining
+            self.node.mining_supervisor.notify_mempool_changed()
+            return jsonify({'message': message}), 200
+
+        @self.app.route('/tx_inv', methods=['POST'])
+        def transaction_inventory():
+            """tx_ids announced by a peer. Answers with the ones this node wants to receive."""
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not is_string_list(data.get("tx_ids")):
+                return jsonify({'error': 'Malformed inventory'}), 400
+            self.register_sender(data.get("peer"))
+            seen = self.node.seen_transactions
+            want = [tx_id for tx_id in data["tx_ids"] if tx_id not in seen and tx_id not in self.node.mempool]
+            return jsonify({"want": want})
+
+        @self.app.route('/submit_transactions', methods=['POST'])
+        def submit_transactions():
+            """A batch of gossiped transactions: binary frames of encoded transactions, or a JSON list."""
+            if is_binary():
+                try:
+                    peer, payload = codec.unpack_message(request.get_data())
+                    frames = list(codec.iter_frames([payload]))
+                except ValueError:
+                    return jsonify({'error': 'Malformed transactions'}), 400
+                items = [(codec.peek_tx_id(frame), frame) for frame in frames]
+                decode = codec.decode_transaction
+            else:
+                data = request.get_json(silent=True)
+                if not isinstance(data, dict) or not isinstance(data.get("transactions"), list):
+                    return jsonify({'error': 'Malformed transactions'}), 400
+                peer = data.get("peer")
+                items = [(json_tx_id(tx), tx) for tx in data["transactions"]]
+                decode = Transaction.from_dict
+            self.register_sender(peer)
+
+            counts = {"accepted": 0, "duplicate": 0, "rejected": 0}
+            txs = []
+            for tx_id, tx_data in items:
+                if tx_id in self.node.seen_transactions:
+                    TRANSACTIONS_RECEIVED.inc(outcome="duplicate")
+                    counts["duplicate"] += 1
+                    continue
+                try:
+                    txs.append(decode(tx_data))
+                except MALFORMED:
+                    TRANSACTIONS_RECEIVED.inc(outcome="rejected")
+                    counts["rejected"] += 1
+            # Signatures of the whole batch at once, split across the verifier's pool when it is large
+            for tx, valid in zip(txs, self.node.verifier.verify_batch(txs)):
+                outcome, _ = self.admit_transaction(tx, peer, valid)
+                counts[outcome] += 1
+
+            if counts["accepted"]:
+                self.node.broadcast_message(f"⛏️  {counts['accepted']} transaction(s) received from {peer}", type="mempool",
+                                            coalesce="mempool", size=len(self.node.mempool))
+                self.node.mining_supervisor.notify_mempool_changed()
+            return jsonify(counts), 200
 
 
         @self.app.route('/submit_transaction_file', methods=['POST'])
@@ -93,18 +407,15 @@ class NodeAPI:
             transaction = Transaction.from_file_object(transaction_file)
             filename = transaction_file.filename
 
-            if not transaction.is_valid():
-                print(f"Invalid transaction in file {filename}.")
-                return jsonify({"error": f"Invalid transaction in file {filename}."}), 400
+            outcome, message = self.admit_transaction(transaction)
+            if outcome != "accepted":
+                return jsonify({"error": f"{message}: transaction in file {filename}."}), 400
 
-            self.node.broadcast_message(f"⛏️  New transaction submitted from file: {filename}")
-            self.node.pending_transactions.append(transaction)
-            self.node.broadcast_transaction(transaction)
+            self.node.broadcast_message(f"⛏️  New transaction submitted from file: {filename}", type="mempool",
+                                        coalesce="mempool", size=len(self.node.mempool))
 
-            # ✅ If not already mining, start mining
-            if not self.node.is_mining:
-                print(f"⛏️  Starting mining on received transaction.")
-                self.node.start_mining()
+            # ✅ Mine it: wakes the mining supervisor, or refreshes the template it is mining
+            self.node.mining_supervisor.notify_mempool_changed()
             
             return jsonify({"message": "Transaction submitted, validated and broadcasted successfully!"}), 200
 
@@ -113,7 +424,7 @@ class NodeAPI:
         @self.app.route('/mine', methods=['POST'])
         def mine():
             try:
-                # Starts asynchronous mining
+                # Handled by the mining supervisor thread
                 self.node.start_mining()
                 return jsonify({"message": f"Mining started !!!"})
             except Exception as e:
@@ -123,80 +434,88 @@ class NodeAPI:
         # Route to receive block from other nodes
         @self.app.route('/receive_block', methods=['POST'])
         def receive_block():
+            try:
+                if is_binary():
+                    miner, block_data = codec.unpack_message(request.get_data())
+                    block = codec.decode_block(block_data)
+                    if block.hash != block.calculate_hash():
+                        block = None
+                else:
+                    data = request.get_json()
+                    miner = data.get("miner")
+                    block_data = data.get("block")
+                    block = Block.from_dict(block_data)
+            except MALFORMED:
+                return jsonify({'error': 'Malformed block'}), 400
+            print(f"New block {block_data if block is None else block.index} received from miner: {miner}")
+            return self.accept_block(block, miner)
+
+        @self.app.route('/inv', methods=['POST'])
+        def inventory():
+            """Block hashes announced by a peer. Answers with the ones this node does not have yet."""
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not is_string_list(data.get("blocks")):
+                return jsonify({'error': 'Malformed inventory'}), 400
+            return jsonify({"want": [h for h in data["blocks"] if h not in self.node.blockchain.tree]})
+
+        @self.app.route('/compact_block', methods=['POST'])
+        def receive_compact_block():
+            """
+            Header plus short transaction ids. The block is rebuilt from the mempool, only the
+            missing transactions are fetched from the miner. 409 asks the miner for the full block.
+            """
             data = request.get_json()
             miner = data.get("miner")
-            block_data = data.get("block")
-            print(f"New block {block_data} received from miner: {miner}")
-            try:                
-                # Validate the miner URL
+            compact = data.get("block")
+            if not is_peer_url(miner):
+                return "Invalid miner URL", 400
+            try:
+                block_hash = compact["header"]["hash"]
+                if block_hash in self.node.blockchain.tree:
+                    return jsonify({'message': 'Block already known'}), 200
+                transactions, missing = compact_block.match_transactions(compact, self.node.mempool)
+            except (KeyError, TypeError):
+                return jsonify({'error': 'Malformed compact block'}), 400
+            if missing:
                 try:
-                    parsed = urlparse(miner)
-                    if parsed.scheme not in ["http", "https"] or not parsed.netloc:
-                        raise ValueError("Invalid URL")
-                    print(f"Valid miner URL: {miner}")
+                    fetched = self.node.fetch_block_transactions(miner, block_hash, missing)
                 except Exception as e:
-                    print(f"Block received from miner with invalid URL: {miner}")
-                    return "Invalid miner URL", 400
-
-                # Add miner to peers if it's not self and not already added
-                if (miner != self.node.node_url) and (miner not in self.node.peers):
-                    self.node.broadcast_message(f"[+] New block submitted by unknown peer: {miner}. Registering the peer...")
-                    self.node.peers.add(miner)
-
-                # Get and validate received block
-                block = Block.from_dict(block_data)
-                latest = self.node.blockchain.get_latest_block()
-
-                if not self.node.blockchain.validate_block(block, latest):
-                    print(f"Received block #{block.index} from {miner} does not align with the current chain.")
-                    self.node.broadcast_message(f"Could not accept received block #{block.index} from {miner}. Syncing chain instead...")
-                    self.node.sync_chain()  # Sync the chain to get the latest chain version
-                    latest = self.node.blockchain.get_latest_block()
-                    if latest != block:
-                        print(f"Received block {block} from {miner} is invalid.")
-                        return jsonify({'error': 'Invalid block'}), 400
-                    else:
-                        print(f"Received block {block} from {miner} is valid after syncing.")
-                        return jsonify({'message': 'Block accepted after syncing'}), 200
-
-                # stop mining if valid block received
-                if hasattr(self.node, 'stop_event'):
-                    self.node.stop_event.set()
-                    print("🛑 Valid incoming block! Any mining will be stopped.")
-
-                # Now safely add the received block to the chain
-                self.node.blockchain.chain.append(block)                
-                self.node.broadcast_message(f"✅ Block {block.index} accepted from {miner}.")
-                self.node.blockchain.save_chain()
-
-                # Remove the transactions of new block from pending transactions
-                received_transactions = Transaction.from_dict(json.loads(block.transactions))
-                
-                duplicate_transaction = False
-                for tx in self.node.pending_transactions:
-                    if tx == received_transactions:
-                        self.node.pending_transactions.remove(tx)
-                        duplicate_transaction = True
-                        print(f"Removed transactions from pending transactions. Removed ID: {tx.tx_id}")
-                        self.node.broadcast_message(f"Transaction removed from pending transactions. tx_id: {tx.tx_id} .")
-                if not duplicate_transaction:
-                    print(f"Transactions {received_transactions.tx_id} not found in pending transactions.")
-                # self.node.broadcast_to_subscribers(block, miner)  # broadcast to frontend subscribers
-                return jsonify({'message': 'Block added'}), 200
+                    print(f"Could not fetch {len(missing)} missing transaction(s) of block {block_hash} from {miner}: {e}")
+                    fetched = None
+                if fetched is None or len(fetched) != len(missing):
+                    COMPACT_BLOCKS.inc(outcome="full_block")
+                    return jsonify({'error': 'Missing transactions, send the full block'}), 409
+                for i, tx in zip(missing, fetched):
+                    transactions[i] = tx
+            block = compact_block.rebuild(compact, transactions)
+            if block is None:
+                COMPACT_BLOCKS.inc(outcome="full_block")
+                return jsonify({'error': 'Transactions do not match the Merkle root, send the full block'}), 409
+            if block.hash != block.calculate_hash():
+                return jsonify({'error': 'Invalid block'}), 400
+            COMPACT_BLOCKS.inc(outcome="fetched_missing" if missing else "rebuilt")
+            print(f"Compact block {block.index} received from miner: {miner}, {len(missing)}/{len(transactions)} transaction(s) fetched")
+            return self.accept_block(block, miner)
 
-            except Exception as e:
-                return jsonify({'error': str(e)}), 500
+        @self.app.route('/block/<block_hash>/txs', methods=['GET'])
+        def get_block_transactions(block_hash):
+            """Transactions of a known block (main chain or side branch) at the given ?indexes=1,5,..."""
+            node = self.node.blockchain.tree.get(block_hash)
+            if node is None:
+                return jsonify({'error': 'Block not found'}), 404
+            transactions = node.block.get_transactions()
+            try:
+                indexes = [int(i) for i in request.args.get('indexes', '').split(',') if i]
+                return jsonify({'transactions': [transactions[i].to_dict() for i in indexes]})
+            except (ValueError, IndexError):
+                return jsonify({'error': 'Invalid transaction index'}), 400
 
         @self.app.route('/stream')
         def stream():
-            def event_stream():
-                q = queue.Queue()
-                self.node.subscribers.append(q)
-                try:
-                    while True:
-                        data = q.get()
-                        yield f"data: {data}\n\n"
-                except GeneratorExit:
-                    self.node.subscribers.remove(q)
-
-            return Response(event_stream(), content_type='text/event-stream')
+            # EventSource sends the id of the last event it got when it reconnects
+            last_event_id = request.headers.get("Last-Event-ID", type=int)
+            subscription = self.node.events.subscribe(last_event_id)
+            if subscription is None:
+                return jsonify({'error': 'Too many subscribers'}), 503
+            return Response(event_stream(self.node.events, subscription), content_type='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
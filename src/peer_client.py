@@ -0,0 +1,113 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+DEFAULT_TIMEOUT = 2  # Seconds per peer request
+LATENCY_SMOOTHING = 0.2  # Weight of the newest sample in the moving latency average
+
+REQUEST_SECONDS = metrics.histogram("peer_request_seconds", "Latency of requests to each peer")
+REQUEST_ERRORS = metrics.counter("peer_request_errors_total", "Failed requests (connection errors and HTTP errors) per peer")
+
+
+class PeerStats:
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.avg_latency = None
+        self.last_latency = None
+        self.last_error = None
+
+    def record(self, latency, error=None):
+        self.requests += 1
+        self.last_latency = latency
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency += LATENCY_SMOOTHING * (latency - self.avg_latency)
+        if error is not None:
+            self.failures += 1
+            self.last_error = str(error)
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'failures': self.failures,
+            'avg_latency_ms': round(self.avg_latency * 1000, 2) if self.avg_latency is not None else None,
+            'last_latency_ms': round(self.last_latency * 1000, 2) if self.last_latency is not None else None,
+            'last_error': self.last_error
+        }
+
+
+class PeerClient:
+    """
+    Peer communication layer: one keep-alive requests.Session shared by all calls,
+    concurrent fan-out to many peers with per-peer timeouts, and latency/failure stats per peer.
+    """
+
+    def __init__(self, max_workers=16, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=64, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="peer")
+        self.stats = {}
+        self.lock = Lock()
+
+
+    def _record(self, peer, latency, error=None):
+        with self.lock:
+            self.stats.setdefault(peer, PeerStats()).record(latency, error)
+        REQUEST_SECONDS.observe(latency, peer=peer)
+        if error is not None:
+            REQUEST_ERRORS.inc(peer=peer)
+
+
+    def request(self, method, peer, path, timeout=None, **kwargs):
+        """Single request to one peer. Raises on connection errors, like requests does."""
+        started = time.perf_counter()
+        try:
+            res = self.session.request(method, f"{peer}{path}", timeout=timeout or self.timeout, **kwargs)
+        except Exception as e:
+            self._record(peer, time.perf_counter() - started, e)
+            raise
+        error = None if res.ok else f"HTTP {res.status_code}"
+        self._record(peer, time.perf_counter() - started, error)
+        return res
+
+
+    def get(self, peer, path, **kwargs):
+        return self.request("GET", peer, path, **kwargs)
+
+
+    def post(self, peer, path, **kwargs):
+        return self.request("POST", peer, path, **kwargs)
+
+
+    def map(self, fn, peers):
+        """
+        Run fn(peer) for every peer concurrently.
+        Returns {peer: result or the exception it raised}. Takes as long as the slowest peer.
+        """
+        futures = {peer: self.executor.submit(fn, peer) for peer in peers}
+        wait(futures.values())
+        results = {}
+        for peer, future in futures.items():
+            error = future.exception()
+            results[peer] = error if error is not None else future.result()
+        return results
+
+
+    def fan_out(self, method, peers, path, timeout=None, **kwargs):
+        """Send the same request to all peers at once. Returns {peer: response or exception}."""
+        return self.map(lambda peer: self.request(method, peer, path, timeout=timeout, **kwargs), peers)
+
+
+    def get_stats(self):
+        with self.lock:
+            return {peer: stats.to_dict() for peer, stats in self.stats.items()}
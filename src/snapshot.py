@@ -0,0 +1,234 @@
+"""
+Chain snapshots: a node's chain and account state in one file, to start a new node from
+without syncing the chain over the network and revalidating it block by block.
+
+Layout: MAGIC, then the chunks, then the manifest, then a fixed-size footer locating the manifest.
+A chunk is CHUNK_BLOCKS block records in the binary codec, framed back to back and zlib
+compressed; the manifest (compressed JSON) lists every chunk with its sha256, the tip and
+the balances. Chunks are read, checked and decoded on a process pool, each worker on its own
+file handle; the blocks are then checked against their parents in order, like validate_chain.
+The chain index is not shipped: the workers compute its rows from the blocks they decode.
+"""
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import codec
+from .block import Block
+from .block_store import BlockStore
+from .blockchain import Blockchain
+from .chain_index import ChainIndex, index_rows
+from .state import AccountState
+from .validation import check_block
+
+MAGIC = b"CHAINSNP"
+FORMAT = 1
+CHUNK_BLOCKS = 1000  # Blocks per chunk, the unit of parallel decoding
+COMPRESSION_LEVEL = 6
+FOOTER = struct.Struct("<QI32s8s")  # manifest offset, manifest length, sha256 of the manifest, MAGIC
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def export_snapshot(blockchain, path, chunk_blocks=CHUNK_BLOCKS, level=COMPRESSION_LEVEL):
+    """Write the chain and state of a blockchain to path. Returns the manifest."""
+    chunks = []
+    tmp_path = path + ".tmp"
+    with blockchain.lock, open(tmp_path, "wb") as f:
+        tip = blockchain.get_latest_block()
+        with blockchain.state.lock:
+            state = {"height": blockchain.state.height, "tip_hash": blockchain.state.tip_hash,
+                     "balances": dict(blockchain.state.balances)}
+        if (state["height"], state["tip_hash"]) != (tip.index, tip.hash):
+            raise SnapshotError(f"Account state at height {state['height']} does not match the tip at {tip.index}")
+
+        f.write(MAGIC)
+        for start in range(0, tip.index + 1, chunk_blocks):
+            records = blockchain.store.read_range(start, min(start + chunk_blocks, tip.index + 1))
+            data = zlib.compress(b"".join(codec.frame(codec.encode_record(record)) for record in records), level)
+            chunks.append({"offset": f.tell(), "length": len(data), "first_height": start,
+                           "blocks": min(chunk_blocks, tip.index + 1 - start), "sha256": hashlib.sha256(data).hexdigest()})
+            f.write(data)
+
+        manifest = {
+            "format": FORMAT,
+            "node_id": blockchain.node_id,
+            "created": time.time(),
+            "height": tip.index,
+            "tip_hash": tip.hash,
+            "chunks": chunks,
+            "state": state,
+        }
+        data = zlib.compress(json.dumps(manifest).encode(), level)
+        offset = f.tell()
+        f.write(data)
+        f.write(FOOTER.pack(offset, len(data), hashlib.sha256(data).digest(), MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def read_manifest(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        f.seek(-FOOTER.size, os.SEEK_END)
+        offset, length, digest, magic = FOOTER.unpack(f.read(FOOTER.size))
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is truncated")
+        f.seek(offset)
+        data = f.read(length)
+    if hashlib.sha256(data).digest() != digest:
+        raise SnapshotError("Manifest checksum mismatch")
+    manifest = json.loads(zlib.decompress(data))
+    if manifest["format"] != FORMAT:
+        raise SnapshotError(f"Unsupported snapshot format {manifest['format']}")
+    return manifest
+
+
+def load_chunk(path, chunk, verify_signatures=True):
+    """
+    Worker task: read one chunk, check it on its own and prepare it for import.
+    Returns (encoded records, headers, index rows, balance changes, (height, reason) of the first invalid block or None).
+    """
+    with open(path, "rb") as f:
+        f.seek(chunk["offset"])
+        data = f.read(chunk["length"])
+    height = chunk["first_height"]
+    if hashlib.sha256(data).hexdigest() != chunk["sha256"]:
+        return None, None, None, None, (height, "chunk checksum mismatch")
+    try:
+        payloads = list(codec.iter_frames([zlib.decompress(data)]))
+        blocks = [Block.from_record(codec.decode_record(payload)) for payload in payloads]
+    except (zlib.error, ValueError, KeyError) as e:
+        return None, None, None, None, (height, f"undecodable chunk: {e}")
+    if len(blocks) != chunk["blocks"]:
+        return None, None, None, None, (height, f"chunk holds {len(blocks)} blocks instead of {chunk['blocks']}")
+
+    state = AccountState()  # Starts empty: ends up with the balance changes of the chunk
+    for i, block in enumerate(blocks):
+        if block.index != height + i:
+            return None, None, None, None, (height + i, f"block {block.index} out of order")
+        if i and block.previous_hash != blocks[i - 1].hash:
+            return None, None, None, None, (height + i, "previous hash does not match the previous block")
+        error = check_block(block, verify_signatures)
+        if error:
+            return None, None, None, None, (height + i, error)
+        state.apply_block(block)
+    return payloads, [block.to_header() for block in blocks], index_rows(blocks), dict(state.balances), None
+
+
+class _ImportTarget(Blockchain):
+    """A Blockchain with nothing loaded: the file layout and block rules of a node, without opening its files."""
+
+    def __init__(self, node_id):
+        self.node_id = node_id
+
+
+def import_snapshot(path, node_id, workers=None, verify_signatures=True, force=False):
+    """
+    Build the block store, chain index, account state and checkpoint of node_id from a snapshot.
+    Chunks are decoded and checked on `workers` processes (every core by default).
+    Nothing is replaced until the whole snapshot checked out. Returns the manifest.
+    """
+    manifest = read_manifest(path)
+    target = _ImportTarget(node_id)
+    store_path, index_path = target.get_store_path(), target.get_index_path()
+    if os.path.exists(store_path + ".dat") and os.path.getsize(store_path + ".dat") and not force:
+        raise SnapshotError(f"Node {node_id} already has a chain, import with force=True to replace it")
+
+    staged_store, staged_index = store_path + ".import", index_path + ".import"
+    for file_path in (staged_store + ".dat", staged_store + ".idx", staged_index):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    store = BlockStore(staged_store, binary=True)
+    index = ChainIndex(staged_index)
+    try:
+        balances = _import_chunks(path, manifest, target, store, index, workers or os.cpu_count() or 1, verify_signatures)
+    except Exception:
+        store.close()
+        index.close()
+        for file_path in (staged_store + ".dat", staged_store + ".idx", staged_index):
+            os.remove(file_path)
+        raise
+    store.close()
+    index.close()
+
+    state = manifest["state"]
+    for address in set(balances) | set(state["balances"]):
+        if not math.isclose(balances.get(address, 0), state["balances"].get(address, 0), rel_tol=1e-9, abs_tol=1e-6):
+            raise SnapshotError(f"Balance of {address} does not match the chain")
+    if (state["height"], state["tip_hash"]) != (manifest["height"], manifest["tip_hash"]):
+        raise SnapshotError("Account state does not match the tip")
+
+    for suffix in ("-wal", "-shm"):  # Left over by the replaced index, they would be replayed into the new one
+        if os.path.exists(index_path + suffix):
+            os.remove(index_path + suffix)
+    os.replace(staged_store + ".dat", store_path + ".dat")
+    os.replace(staged_store + ".idx", store_path + ".idx")
+    os.replace(staged_index, index_path)
+    AccountState(state["balances"], state["height"], state["tip_hash"]).save(target.get_state_path())
+    # The node trusts the chain up to here on its next start, like the chain it validated itself
+    tmp_path = target.get_checkpoint_path() + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"height": manifest["height"], "hash": manifest["tip_hash"]}, f)
+    os.replace(tmp_path, target.get_checkpoint_path())
+    return manifest
+
+
+def _import_chunks(path, manifest, target, store, index, workers, verify_signatures):
+    """Decode the chunks, several ahead on the pool, and write them in order. Returns the balances the chain adds up to."""
+    chunks = manifest["chunks"]
+    headers = []  # Header-only blocks of the whole chain, for the parent and retarget checks
+    balances = {}
+    pending = deque()
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) if workers > 1 else None
+    try:
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < 2 * workers:
+                if pool:
+                    pending.append(pool.submit(load_chunk, path, chunks[next_chunk], verify_signatures))
+                else:
+                    pending.append(load_chunk(path, chunks[next_chunk], verify_signatures))
+                next_chunk += 1
+            result = pending.popleft()
+            payloads, chunk_headers, rows, changes, error = result.result() if pool else result
+            if error:
+                raise SnapshotError(f"Block {error[0]}: {error[1]}")
+
+            for header in chunk_headers:
+                block = Block.from_record(dict(header, transactions=None))
+                if headers and not target.validate_block(block, headers[-1], headers.__getitem__, checked=True):
+                    raise SnapshotError(f"Block {block.index} does not follow block {block.index - 1}")
+                if not headers and block.index != 0:
+                    raise SnapshotError("Snapshot does not start at the genesis block")
+                headers.append(block)
+            try:
+                index.add_rows(*rows, headers[-1].index, headers[-1].hash)
+            except sqlite3.IntegrityError:
+                raise SnapshotError(f"Chunk at height {chunk_headers[0]['index']} holds a transaction that was already mined")
+            store.append_encoded(payloads)
+            for address, change in changes.items():
+                balances[address] = balances.get(address, 0) + change
+    finally:
+        if pool:
+            # Invalid chunk: drop the ones not started yet
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+
+    if not headers or (headers[-1].index, headers[-1].hash) != (manifest["height"], manifest["tip_hash"]):
+        raise SnapshotError("Chain does not end at the tip of the manifest")
+    return balances
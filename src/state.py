@@ -0,0 +1,99 @@
+import json
+import os
+from collections import defaultdict
+from threading import Lock
+
+BLOCK_REWARD = 50  # Credited to the miner of every block, on top of the fees
+
+
+def tx_cost(tx):
+    """What the sender pays: amount plus fee."""
+    return tx.amount + (tx.fee or 0)
+
+
+class AccountState:
+    """
+    Balance of every address, updated block by block, so balance lookups never scan the chain.
+    Blocks are reverted by applying their effects in reverse, no undo data is needed.
+    `height` and `tip_hash` identify the last applied block (-1 and None when empty).
+    """
+
+    def __init__(self, balances=None, height=-1, tip_hash=None):
+        self.balances = defaultdict(float, balances or {})
+        self.height = height
+        self.tip_hash = tip_hash
+        self.lock = Lock()
+
+
+    def balance(self, address):
+        with self.lock:
+            return self.balances.get(address, 0)
+
+
+    def _apply(self, block, sign):
+        transactions = block.get_transactions()
+        fees = 0
+        for tx in transactions:
+            self.balances[tx.from_address] -= sign * tx_cost(tx)
+            self.balances[tx.to_address] += sign * tx.amount
+            fees += tx.fee or 0
+        self.balances[block.miner] += sign * (BLOCK_REWARD + fees)
+
+
+    def apply_block(self, block):
+        with self.lock:
+            self._apply(block, 1)
+            self.height = block.index
+            self.tip_hash = block.hash
+
+
+    def revert_block(self, block):
+        """Undo the tip block, e.g. when a reorg disconnects it."""
+        with self.lock:
+            self._apply(block, -1)
+            self.height = block.index - 1
+            self.tip_hash = block.previous_hash
+            for address in [a for a, amount in self.balances.items() if amount == 0]:
+                del self.balances[address]
+
+
+    def affordable(self, transactions, pending=None):
+        """
+        The transactions that can be paid for when applied in order on top of the current state.
+        `pending` optionally maps addresses to amounts they already committed elsewhere.
+        """
+        spent = defaultdict(float, pending or {})
+        accepted = []
+        with self.lock:
+            for tx in transactions:
+                cost = tx_cost(tx)
+                if tx.amount <= 0 or (tx.fee or 0) < 0 or not tx.sender_matches_key():
+                    continue
+                if self.balances.get(tx.from_address, 0) - spent[tx.from_address] >= cost:
+                    spent[tx.from_address] += cost
+                    accepted.append(tx)
+        return accepted
+
+
+    def can_apply(self, block):
+        """A block may only spend what its senders have."""
+        transactions = block.get_transactions()
+        return len(self.affordable(transactions)) == len(transactions)
+
+
+    def save(self, path):
+        with self.lock:
+            data = {"height": self.height, "tip_hash": self.tip_hash, "balances": dict(self.balances)}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+    @staticmethod
+    def load(path):
+        if not os.path.exists(path):
+            return AccountState()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return AccountState(balances=data["balances"], height=data["height"], tip_hash=data["tip_hash"])
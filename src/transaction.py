@@ -1,31 +1,84 @@
 import hashlib
+from functools import lru_cache
 from ecdsa import VerifyingKey, SECP256k1
 import json
+import math
+import time
+
+
+@lru_cache(maxsize=4096)
+def parse_public_key(public_key_hex):
+    """Parsing a secp256k1 point is expensive, the same senders keep coming back."""
+    return VerifyingKey.from_string(bytes.fromhex(public_key_hex), curve=SECP256k1)
+
+
+def valid_amount(value):
+    """Amounts and fees are finite int or float numbers: a bool, string or NaN would break the balances."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
 
 class Transaction:
-    def __init__(self, from_address, from_public_key, to_address, amount, signature=None, tx_id=None):
-        
+    # Slots keep the many short-lived transactions decoded from block bodies small
+    __slots__ = ("from_address", "_public_key", "_public_key_hex", "to_address", "amount", "fee", "nonce", "signature", "tx_id")
+
+    def __init__(self, from_address, from_public_key, to_address, amount, signature=None, tx_id=None, fee=0, nonce=None):
+
         self.from_address = from_address
-        self.from_public_key = from_public_key
+        self.from_public_key = from_public_key  # VerifyingKey, or its hex form parsed on first use
         self.to_address = to_address
         self.amount = amount
+        self.fee = fee  # Paid to the miner, higher fee per byte gets mined first
+        # Signed, so the same payment made twice gets two tx_ids while a replayed copy keeps the mined one's
+        self.nonce = time.time_ns() if nonce is None else nonce
         self.signature = signature
         self.tx_id = tx_id or self.calculate_hash()
 
-    def calculate_hash(self):
+    @property
+    def from_public_key(self):
+        if self._public_key is None and self._public_key_hex is not None:
+            self._public_key = parse_public_key(self._public_key_hex)
+        return self._public_key
+
+    @from_public_key.setter
+    def from_public_key(self, key):
+        if isinstance(key, str):
+            self._public_key, self._public_key_hex = None, key
+        else:
+            self._public_key, self._public_key_hex = key, None
+
+    def public_key_hex(self):
+        if self._public_key_hex is None and self._public_key is not None:
+            self._public_key_hex = self._public_key.to_string().hex()
+        return self._public_key_hex
+
+    def message(self):
+        """Signed content. The fee and nonce are only appended when set, so older transactions keep their signatures."""
         message = f"{self.from_public_key}{self.to_address}{self.amount}"
-        return hashlib.sha256(message.encode()).hexdigest()
+        if self.fee:
+            message = f"{message}|{self.fee}"
+        return f"{message}#{self.nonce}" if self.nonce else message
+
+    def calculate_hash(self):
+        return hashlib.sha256(self.message().encode()).hexdigest()
+
+    def sender_matches_key(self):
+        """
+        from_address is not signed: it must be the address of the signing key (Wallet.address),
+        or anyone could sign a payment from someone else's balance with their own key.
+        """
+        try:
+            return self.from_address == hashlib.sha256(bytes.fromhex(self.public_key_hex())).hexdigest()
+        except (TypeError, ValueError):
+            return False
 
     def sign_transaction(self, private_key):
-        message = f"{self.from_public_key}{self.to_address}{self.amount}"
-        self.signature = private_key.sign(message.encode()).hex()
+        self.signature = private_key.sign(self.message().encode()).hex()
 
     def is_valid(self):
         if not self.signature:
             return False
-        message = f"{self.from_public_key}{self.to_address}{self.amount}"
         try:
-            return self.from_public_key.verify(bytes.fromhex(self.signature), message.encode())
+            return self.from_public_key.verify(bytes.fromhex(self.signature), self.message().encode())
         except:
             return False
 
@@ -34,9 +87,11 @@ class Transaction:
         if not isinstance(other, Transaction):
             return False
         return (self.from_address == other.from_address and
-                self.from_public_key == other.from_public_key and
+                self.public_key_hex() == other.public_key_hex() and
                 self.to_address == other.to_address and
                 self.amount == other.amount and
+                self.fee == other.fee and
+                self.nonce == other.nonce and
                 self.signature == other.signature and
                 self.tx_id == other.tx_id)
     
@@ -46,31 +101,49 @@ class Transaction:
             from_public_key: {self.from_public_key.to_string().hex()},\n \
             to_address: {self.to_address},\n \
             amount: {self.amount},\n \
+            fee: {self.fee},\n \
+            nonce: {self.nonce},\n \
             signature: {self.signature},\n \
             tx_id: {self.tx_id}"
     
 
     def to_dict(self):
-        """Return dictionary representation for saving, JSON, etc."""
-        return {
+        """Return dictionary representation for saving, JSON, etc. The nonce is left out when not set, like in older transactions."""
+        data = {
             'from_address': self.from_address,
-            'from_public_key': self.from_public_key.to_string().hex(),
+            'from_public_key': self.public_key_hex(),
             'to_address': self.to_address,
             'amount': self.amount,
+            'fee': self.fee,
             'signature': self.signature,
             'tx_id': self.tx_id
         }
+        if self.nonce:
+            data['nonce'] = self.nonce
+        return data
     
     @classmethod
     def from_dict(cls, data):
-        """Create a Transaction instance from a dictionary."""
+        """
+        Create a Transaction instance from a dictionary.
+        The public key is only parsed when the signed message or the signature is needed,
+        reading addresses, amounts and ids stays cheap.
+        Raises ValueError if the amount or fee is not a number, or the nonce not a non-negative integer.
+        """
+        amount, fee, nonce = data['amount'], data.get('fee') or 0, data.get('nonce', 0)
+        if not valid_amount(amount) or not valid_amount(fee):
+            raise ValueError(f"Invalid amount {amount!r} or fee {fee!r}")
+        if type(nonce) is not int or nonce < 0:
+            raise ValueError(f"Invalid nonce {nonce!r}")
         return cls(
             from_address=data['from_address'],
-            from_public_key=VerifyingKey.from_string(bytes.fromhex(data['from_public_key']), curve=SECP256k1),
+            from_public_key=data['from_public_key'],
             to_address=data['to_address'],
-            amount=data['amount'],
+            amount=amount,
             signature=data['signature'],
-            tx_id=data['tx_id']
+            tx_id=data['tx_id'],
+            fee=fee,
+            nonce=nonce
         )
     
     
@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .block import Block, MERKLE_VERSION
+from .merkle import merkle_root
+from .transaction import valid_amount
+
+BATCH_SIZE = 256  # Blocks per task sent to a worker
+PARALLEL_THRESHOLD = 512  # Fewer blocks are checked in-process, starting the pool costs more
+
+
+def check_block(block, verify_signatures=False):
+    """
+    The checks that need nothing but the block itself: hash, proof of work, Merkle root,
+    and optionally transaction signatures. Returns why the block is invalid, or None.
+    """
+    if block.hash != block.calculate_hash():
+        return f"hash {block.hash} does not match calculated hash {block.calculate_hash()}"
+    if not block.meets_difficulty():
+        return f"hash {block.hash} does not meet difficulty {block.difficulty}"
+    try:
+        transactions = block.get_transactions()  # Parsed once for every check below
+    except (ValueError, KeyError) as e:
+        return f"malformed transactions: {e}"
+    for tx in transactions:
+        if not valid_amount(tx.amount) or not valid_amount(tx.fee):
+            return f"transaction {tx.tx_id} has an invalid amount or fee"
+        if not tx.sender_matches_key():
+            return f"transaction {tx.tx_id} spends from {tx.from_address}, which is not the address of its key"
+    if block.version >= MERKLE_VERSION:
+        tx_ids = [tx.tx_id for tx in transactions]
+        if len(set(tx_ids)) != len(tx_ids):
+            return "duplicate transactions"
+        if block.merkle_root != merkle_root(tx_ids):
+            return f"merkle root {block.merkle_root} does not match its transactions"
+    if verify_signatures:
+        for tx in transactions:
+            if tx.tx_id != tx.calculate_hash() or not tx.is_valid():
+                return f"invalid signature in transaction {tx.tx_id}"
+    return None
+
+
+def _check_blocks(blocks, verify_signatures):
+    """(position of the first invalid block, reason), or None if all blocks are valid on their own."""
+    for i, block in enumerate(blocks):
+        error = check_block(block, verify_signatures)
+        if error:
+            return i, error
+    return None
+
+
+def _check_records(records, verify_signatures):
+    """Worker task: blocks travel to the pool as records."""
+    return _check_blocks([Block.from_record(record) for record in records], verify_signatures)
+
+
+class ValidationPipeline:
+    """
+    Block validation split in two stages. Everything a block can be checked on by itself
+    (hash, PoW, Merkle root, signatures) runs in batches across a process pool, several
+    batches ahead; the caller then runs the cheap checks against the parent (linkage,
+    timestamps, difficulty) in order, while the workers check the next batches.
+    """
+
+    def __init__(self, workers=None, batch_size=BATCH_SIZE, verify_signatures=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.verify_signatures = verify_signatures
+        self._pool = None
+
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+
+    def checked(self, blocks, parallel=None):
+        """
+        Yields (block, reason it is invalid or None) in order, for any iterable of blocks
+        including a download in progress. Stops after the first invalid block.
+        parallel: use the pool, by default when there are several workers and at least a full batch of blocks.
+        """
+        blocks = iter(blocks)
+        pending = deque()  # (batch, future), oldest first
+        in_flight = 2 * self.workers
+
+        def results(batch, result):
+            failed_at, error = result if result else (len(batch), None)
+            for block in batch[:failed_at]:
+                yield block, None
+            if error:
+                yield batch[failed_at], error
+
+        first = self._next_batch(blocks)
+        if parallel is None:
+            parallel = self.workers > 1 and len(first) == self.batch_size
+        if not parallel:
+            batch = first
+            while batch:
+                result = _check_blocks(batch, self.verify_signatures)
+                yield from results(batch, result)
+                if result:
+                    return
+                batch = self._next_batch(blocks)
+            return
+
+        batch = first
+        try:
+            while batch or pending:
+                # Keep the workers busy: submit until enough batches are in flight
+                while batch and len(pending) < in_flight:
+                    records = [block.to_record() for block in batch]
+                    pending.append((batch, self._get_pool().submit(_check_records, records, self.verify_signatures)))
+                    batch = self._next_batch(blocks)
+                done_batch, future = pending.popleft()
+                result = future.result()
+                yield from results(done_batch, result)
+                if result:
+                    return
+        finally:
+            # Invalid block, or the caller stopped reading: drop the batches not started yet
+            for _, future in pending:
+                future.cancel()
+
+
+    def _next_batch(self, blocks):
+        batch = []
+        for block in blocks:
+            batch.append(block)
+            if len(batch) == self.batch_size:
+                break
+        return batch
+
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
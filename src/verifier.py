@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from .transaction import Transaction
+
+MAX_VERIFIED = 100000  # tx_ids remembered as verified
+PARALLEL_THRESHOLD = 16  # Smaller batches are verified in-process, a round trip to the pool costs more
+
+
+def _verify_dicts(tx_dicts):
+    return [Transaction.from_dict(data).is_valid() for data in tx_dicts]
+
+
+class SignatureVerifier:
+    """
+    ECDSA verification service.
+    Remembers which transactions were already verified (bounded LRU keyed by tx_id and signature),
+    so a transaction checked on submission is not checked again when it arrives in a block,
+    and verifies large batches on a process pool.
+    """
+
+    def __init__(self, workers=None, max_verified=MAX_VERIFIED):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_verified = max_verified
+        self.verified = OrderedDict()
+        self.lock = Lock()
+        self._pool = None
+
+
+    def _key(self, tx):
+        return (tx.tx_id, tx.signature)
+
+
+    def is_verified(self, tx):
+        with self.lock:
+            if self._key(tx) in self.verified:
+                self.verified.move_to_end(self._key(tx))
+                return True
+            return False
+
+
+    def _remember(self, tx):
+        with self.lock:
+            self.verified[self._key(tx)] = True
+            self.verified.move_to_end(self._key(tx))
+            while len(self.verified) > self.max_verified:
+                self.verified.popitem(last=False)
+
+
+    def verify(self, tx):
+        """Verify one transaction, skipping the signature check if it already passed."""
+        # The cache is keyed by tx_id, so the tx_id must really be the hash of the signed content,
+        # and the unsigned sender address must belong to the key, checked before the cache too
+        if tx.tx_id != tx.calculate_hash() or not tx.sender_matches_key():
+            return False
+        if self.is_verified(tx):
+            return True
+        if not tx.is_valid():
+            return False
+        self._remember(tx)
+        return True
+
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+
+    def verify_batch(self, transactions):
+        """Returns one bool per transaction. Unverified ones are split across the worker pool."""
+        results = [None] * len(transactions)
+        pending = []
+        for i, tx in enumerate(transactions):
+            if tx.tx_id != tx.calculate_hash() or not tx.sender_matches_key():
+                results[i] = False
+            elif self.is_verified(tx):
+                results[i] = True
+            else:
+                pending.append(i)
+
+        if len(pending) < PARALLEL_THRESHOLD or self.workers == 1:
+            for i in pending:
+                results[i] = transactions[i].is_valid()
+        else:
+            chunk = -(-len(pending) // self.workers)
+            chunks = [pending[n:n + chunk] for n in range(0, len(pending), chunk)]
+            futures = [self._get_pool().submit(_verify_dicts, [transactions[i].to_dict() for i in c]) for c in chunks]
+            for c, future in zip(chunks, futures):
+                for i, valid in zip(c, future.result()):
+                    results[i] = valid
+
+        for i in pending:
+            if results[i]:
+                self._remember(transactions[i])
+        return results
+
+
+    def verify_block(self, block):
+        """Signatures of every transaction in the block. Those verified in the mempool are skipped."""
+        return all(self.verify_batch(block.get_transactions()))
+
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
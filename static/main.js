@@ -106,19 +106,40 @@ function setDarkTheme() {
     document.getElementById('themeToggle').checked = theme === 'dark';
 }
 
+// Bursts of events (a block with many transactions) trigger one re-fetch, not one per event
+const pendingRefresh = new Set();
+function scheduleRefresh(what) {
+    if (pendingRefresh.size === 0) {
+        setTimeout(() => {
+            if (pendingRefresh.has('chain')) fetchChain();
+            if (pendingRefresh.has('transactions')) fetchPendingTransactions();
+            pendingRefresh.clear();
+        }, 250);
+    }
+    pendingRefresh.add(what);
+}
+
 function startSSE() {
+    // Typed JSON events; the browser resumes after a reconnect with the Last-Event-ID header
     const source = new EventSource('/stream');
     source.onmessage = (e) => {
-        msg = e.data;
-        log("📥 " + msg);
-        if (msg.includes("accepted from") 
-            || msg.includes("mined, saved and broadcasted")
-            || msg.includes("Chain updated from peers")) {
-            fetchChain();  // 🟢 re-fetch the chain from backend
-            fetchPendingTransactions();  // 🟢 re-fetch the transactions from backend
-        }
-        if (msg.includes("removed from pending transactions")) {
-            fetchPendingTransactions();  // 🟢 re-fetch the transactions from backend
+        const event = JSON.parse(e.data);
+        log("📥 " + event.message);
+        switch (event.type) {
+            case "block":
+            case "reorg":
+            case "chain":
+                scheduleRefresh('chain');  // 🟢 re-fetch the chain from backend
+                scheduleRefresh('transactions');  // 🟢 re-fetch the transactions from backend
+                break;
+            case "mempool":
+                scheduleRefresh('transactions');  // 🟢 re-fetch the transactions from backend
+                break;
+            case "dropped":
+                // Events were lost while this tab was too slow: reload everything
+                scheduleRefresh('chain');
+                scheduleRefresh('transactions');
+                break;
         }
     }
     fetchPeers();  // 🟢 fetch peers on load
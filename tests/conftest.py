@@ -0,0 +1,25 @@
+import pytest
+
+from benchmarks.run import start_node as serve_node
+
+
+@pytest.fixture
+def start_node(tmp_path, monkeypatch):
+    """
+    start_node(node_id, **Node kwargs) returns a node served over HTTP on a free local port,
+    with its chain files under tmp_path. Servers, mining supervisors and transaction relays
+    are stopped after the test.
+    """
+    monkeypatch.chdir(tmp_path)
+    started = []
+
+    def start(node_id, **kwargs):
+        node, server = serve_node(node_id, **kwargs)
+        started.append((node, server))
+        return node
+
+    yield start
+    for node, server in started:
+        node.tx_relay.stop()
+        node.mining_supervisor.stop()
+        server.shutdown()
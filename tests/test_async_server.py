@@ -0,0 +1,78 @@
+import json
+import socket
+import threading
+import time
+
+import requests
+from flask import Flask
+
+from src.async_server import AsyncNodeServer
+from src.node import Node, NDJSON
+from src.node_api import NodeAPI
+
+
+def start_async_node(tmp_path, monkeypatch, **kwargs):
+    monkeypatch.chdir(tmp_path)
+    app = Flask("node_a")
+    node = Node(app=app, node_id="node_a", port=0, mining_workers=1)
+    NodeAPI(app, node)
+    server = AsyncNodeServer(node, **kwargs)
+    port = server.serve_in_background()
+    return node, server, f"http://127.0.0.1:{port}"
+
+
+def test_serves_node_api_routes(tmp_path, monkeypatch):
+    node, server, url = start_async_node(tmp_path, monkeypatch)
+    node.blockchain.mine_block("empty")
+    with requests.Session() as session:  # Keep-alive: every request on the same connection
+        assert session.get(f"{url}/peers").json() == {"peers": []}
+        res = session.post(f"{url}/submit_transaction", json={"transaction": None})
+        assert res.status_code == 400
+
+        # Streamed responses come chunked
+        res = session.get(f"{url}/blocks?from=0", headers={"Accept": NDJSON})
+        assert res.headers["Transfer-Encoding"] == "chunked"
+        assert [json.loads(line)["index"] for line in res.iter_lines()] == [0, 1]
+        assert session.get(f"{url}/block/unknown").status_code == 404
+    node.mining_supervisor.stop()
+    server.shutdown()
+
+    # Publishing after shutdown must not reach the closed loop
+    deadline = time.time() + 5
+    while not server.loop.is_closed() and time.time() < deadline:
+        time.sleep(0.01)
+    assert server.loop.is_closed()
+    node.broadcast_message("after shutdown")
+    server._on_publish()
+
+
+def test_stream_subscribers_do_not_hold_threads(tmp_path, monkeypatch):
+    node, server, url = start_async_node(tmp_path, monkeypatch, heartbeat=0.2)
+    threads = threading.active_count()
+    subscribers = []
+    for _ in range(200):
+        sock = socket.create_connection(("127.0.0.1", server.port))
+        sock.sendall(b"GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        subscribers.append(sock)
+    deadline = time.time() + 10
+    while len(node.events.subscriptions) < 200 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(node.events.subscriptions) == 200
+    assert threading.active_count() <= threads + 2
+
+    res = requests.get(f"{url}/stream", stream=True, headers={"Last-Event-ID": str(node.events.last_id)})
+    event = node.events.publish("block", "Block 1 mined", index=1)
+    lines = res.iter_lines(decode_unicode=True)
+    assert next(lines) == "retry: 3000"
+    frame = [line for line in (next(lines) for _ in range(3)) if line]
+    assert frame == [f"id: {event.id}", f'data: {{"id": {event.id}, "type": "block", "index": 1, "message": "Block 1 mined"}}']
+    res.close()
+
+    for sock in subscribers:
+        sock.close()
+    deadline = time.time() + 10
+    while node.events.subscriptions and time.time() < deadline:
+        time.sleep(0.05)
+    assert not node.events.subscriptions  # Closed connections found by the heartbeat
+    node.mining_supervisor.stop()
+    server.shutdown()
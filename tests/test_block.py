@@ -0,0 +1,20 @@
+import json
+from src.block import Block
+
+
+def test_nonce_hasher_matches_calculate_hash():
+    transactions = json.dumps({"tx_id": "abc", "note": '"nonce": 1'}, indent=4)
+    block = Block(3, "previous_hash", transactions, miner="test_node", difficulty=2)
+    hasher, suffix = block.nonce_hasher()
+    for nonce in (0, 1, 42, 123456789):
+        block.nonce = nonce
+        h = hasher.copy()
+        h.update(str(nonce).encode() + suffix)
+        assert h.hexdigest() == block.calculate_hash()
+
+
+def test_mine_block():
+    block = Block(1, "previous_hash", "empty", miner="test_node", difficulty=2)
+    block_hash = block.mine_block()
+    assert block_hash.startswith("00")
+    assert block_hash == block.calculate_hash()
@@ -0,0 +1,52 @@
+from src.block_store import BlockStore
+from src.blockchain import Blockchain
+
+
+def test_append_and_read(tmp_path):
+    store = BlockStore(str(tmp_path / "blocks"))
+    for i in range(5):
+        store.append({"index": i})
+    assert len(store) == 5
+    assert store.read(3) == {"index": 3}
+    assert [r["index"] for r in store.read_range(2)] == [2, 3, 4]
+
+    store.truncate(2)
+    store.append({"index": 9})
+    store.close()
+
+    reopened = BlockStore(str(tmp_path / "blocks"))
+    assert [r["index"] for r in reopened.read_range()] == [0, 1, 9]
+
+
+def test_torn_record_is_truncated(tmp_path):
+    store = BlockStore(str(tmp_path / "blocks"))
+    for i in range(3):
+        store.append({"index": i})
+    store.close()
+
+    # Simulate a crash in the middle of writing the last record
+    with open(tmp_path / "blocks.dat", "r+b") as f:
+        f.truncate(f.seek(0, 2) - 3)
+
+    reopened = BlockStore(str(tmp_path / "blocks"))
+    assert len(reopened) == 2
+    reopened.append({"index": 2})
+    assert reopened.read(2) == {"index": 2}
+
+
+def test_blockchain_persistence_and_csv(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    blockchain.mine_block("empty")
+    blockchain.mine_block("empty")
+    blockchain.export_csv()
+    blockchain.store.close()
+
+    reloaded = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    assert [b.hash for b in reloaded.chain] == [b.hash for b in blockchain.chain]
+
+    # A node with only a CSV chain imports it into its block store
+    (tmp_path / "blockchain" / "blockchain_test.csv").rename(tmp_path / "blockchain" / "blockchain_csv.csv")
+    imported = Blockchain(node_id="csv", difficulty=1, mining_workers=1)
+    assert [b.hash for b in imported.chain] == [b.hash for b in blockchain.chain]
+    assert len(imported.store) == 3
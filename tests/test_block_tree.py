@@ -0,0 +1,88 @@
+from src.block import Block, BLOCK_VERSION
+from src.block_tree import BlockTree
+from src.blockchain import Blockchain
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+
+def make_block(previous_block, miner="fork_miner", transactions="empty"):
+    block = Block(previous_block.index + 1, previous_block.hash, transactions, miner, difficulty=previous_block.difficulty_bits(), version=BLOCK_VERSION)
+    block.mine_block()
+    return block
+
+
+def test_reorg_to_branch_with_more_work(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    genesis = blockchain.chain[0]
+    main_1 = blockchain.mine_block("empty")
+    main_2 = blockchain.mine_block("empty")
+
+    fork_1 = make_block(genesis)
+    fork_2 = make_block(fork_1)
+    fork_3 = make_block(fork_2)
+
+    assert blockchain.accept_block(fork_1)[0] == "side"
+    assert blockchain.accept_block(fork_1)[0] == "known"
+    # fork_3 arrives before its parent
+    assert blockchain.accept_block(fork_3)[0] == "orphan"
+
+    status, disconnected, connected = blockchain.accept_block(fork_2)
+    assert status == "reorg"
+    assert disconnected == [main_1, main_2]
+    assert connected == [fork_1, fork_2, fork_3]
+    assert [b.hash for b in blockchain.chain] == [genesis.hash, fork_1.hash, fork_2.hash, fork_3.hash]
+    assert len(blockchain.store) == 4
+    assert blockchain.index.block_height(main_2.hash) is None
+
+    # The old branch is still known and wins again once it has more work
+    main_3 = make_block(main_2)
+    assert blockchain.accept_block(main_3)[0] == "side"
+    assert blockchain.accept_block(make_block(main_3))[0] == "reorg"
+    assert blockchain.chain[1] is main_1
+
+
+def test_reorg_onto_an_overspending_branch_keeps_the_chain(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    genesis = blockchain.chain[0]
+    main_1 = blockchain.mine_block("empty")
+    main_2 = blockchain.mine_block("empty")
+
+    unfunded = Wallet()
+    tx = Transaction(unfunded.address, unfunded.public_key, Wallet().address, 1000)
+    tx.sign_transaction(unfunded.private_key)
+    fork_1 = make_block(genesis, transactions=Block.encode_transactions([tx]))
+    fork_2 = make_block(fork_1)
+    assert blockchain.accept_block(fork_1)[0] == "side"
+    assert blockchain.accept_block(fork_2)[0] == "side"
+
+    assert blockchain.accept_block(make_block(fork_2))[0] == "invalid"
+    assert blockchain.chain == [genesis, main_1, main_2]
+    assert blockchain.tree.best.block is main_2
+    assert fork_1.hash not in blockchain.tree and fork_2.hash in blockchain.tree.invalid
+    assert blockchain.state.balance(unfunded.address) == 0
+    assert blockchain.state.tip_hash == main_2.hash
+
+    # Nothing can be built on the invalid branch any more
+    assert blockchain.accept_block(make_block(fork_2))[0] == "invalid"
+    assert blockchain.accept_block(make_block(main_2))[0] == "extended"
+
+
+def test_invalidate_drops_the_subtree_and_remembers_a_bounded_set():
+    genesis = Block(0, "empty_hash", "Genesis Block", miner="miner", difficulty=1)
+    genesis.mine_block()
+    main = make_block(genesis, miner="main")
+    fork_1 = make_block(genesis)
+    fork_2a, fork_2b = make_block(fork_1, miner="a"), make_block(fork_1, miner="b")
+    fork_3 = make_block(fork_2a)
+    tree = BlockTree(max_invalid=3).reset([genesis, main])
+    for block in (fork_1, fork_2a, fork_2b, fork_3):
+        tree.insert(block, tree.get(block.previous_hash))
+    assert tree.best.block is fork_3
+
+    tree.invalidate(tree.get(fork_1.hash), tree.get(main.hash))
+    assert tree.best.block is main
+    assert set(tree.nodes) == {genesis.hash, main.hash}
+    assert tree.get(genesis.hash).children == [tree.get(main.hash)]
+    assert len(tree.invalid) == 3 and fork_3.hash in tree.invalid  # The oldest hash was forgotten
@@ -0,0 +1,121 @@
+from src.block import Block, BLOCK_VERSION
+from src.blockchain import Blockchain
+from src.state import BLOCK_REWARD
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+
+def test_checkpoint_skips_trusted_blocks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    for _ in range(3):
+        blockchain.mine_block("empty")
+    blockchain.save_chain()
+    blockchain.store.close()
+
+    validated = []
+    original_validate_block = Blockchain.validate_block
+    def counting_validate_block(self, block, previous_block, *args, **kwargs):
+        validated.append(block.index)
+        return original_validate_block(self, block, previous_block, *args, **kwargs)
+    monkeypatch.setattr(Blockchain, "validate_block", counting_validate_block)
+
+    reloaded = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    assert len(reloaded.chain) == 4
+    assert validated == []
+    reloaded.store.close()
+
+    Blockchain(node_id="test", difficulty=1, mining_workers=1, full_verify=True)
+    assert validated == [1, 2, 3]
+
+
+def test_account_state_follows_the_chain(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    miner, receiver = Wallet(), Wallet()
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1, miner_address=miner.address)
+    blockchain.mine_block("empty")
+    assert blockchain.state.balance(miner.address) == BLOCK_REWARD
+
+    tx = Transaction(miner.address, miner.public_key, receiver.address, 30, fee=5)
+    tx.sign_transaction(miner.private_key)
+    too_much = Transaction(miner.address, miner.public_key, receiver.address, 40)
+    assert blockchain.state.affordable([tx, too_much]) == [tx]
+
+    blockchain.mine_block(Block.encode_transactions([tx]))
+    assert blockchain.state.balance(receiver.address) == 30
+    assert blockchain.state.balance(miner.address) == 2 * BLOCK_REWARD - 30
+    blockchain.save_chain()
+    blockchain.store.close()
+
+    # Reloaded from the snapshot
+    reloaded = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    assert reloaded.state.balance(receiver.address) == 30
+
+    # Reorg: the block with the transaction leaves the chain
+    reloaded.chain = reloaded.chain[:2]
+    reloaded.save_chain()
+    assert reloaded.state.balance(receiver.address) == 0
+    assert reloaded.state.balance(miner.address) == BLOCK_REWARD
+
+
+def test_headers_only_pages_bodies_from_the_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("src.blockchain.RESIDENT_BODIES", 1)
+    miner, receiver = Wallet(), Wallet()
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1, miner_address=miner.address, headers_only=True)
+    blockchain.mine_block("empty")
+    tx = Transaction(miner.address, miner.public_key, receiver.address, 10)
+    tx.sign_transaction(miner.private_key)
+    with_tx = blockchain.mine_block(Block.encode_transactions([tx]))
+    blockchain.mine_block("empty")
+
+    assert not with_tx.has_body()
+    assert with_tx.get_transactions() == [tx]
+    assert blockchain.get_latest_block().has_body()
+    blockchain.save_chain()
+    blockchain.store.close()
+
+    reloaded = Blockchain(node_id="test", difficulty=1, mining_workers=1, full_verify=True, headers_only=True)
+    assert not any(block.has_body() for block in reloaded.chain[:-1])
+    assert reloaded.chain[2].tx_ids() == [tx.tx_id]
+
+    # Blocks disconnected from the store get their body back
+    disconnected = reloaded.chain[2]
+    reloaded.chain = reloaded.chain[:2]
+    reloaded.save_chain()
+    assert disconnected.has_body() and disconnected.tx_ids() == [tx.tx_id]
+
+
+def test_mined_transactions_cannot_be_replayed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    miner, receiver = Wallet(), Wallet()
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1, miner_address=miner.address)
+    blockchain.mine_block("empty")
+    blockchain.mine_block("empty")
+    tx = Transaction(miner.address, miner.public_key, receiver.address, 30)
+    tx.sign_transaction(miner.private_key)
+    body = Block.encode_transactions([tx])
+    blockchain.mine_block(body)
+
+    def make_block(parent):
+        block = Block(parent.index + 1, parent.hash, body, miner.address,
+                      difficulty=blockchain.next_difficulty(parent), version=BLOCK_VERSION)
+        block.mine_block()
+        return block
+
+    replay = make_block(blockchain.get_latest_block())
+    assert blockchain.accept_block(replay)[0] == "invalid"
+    assert not blockchain.validate_chain(blockchain.chain + [replay])
+    assert blockchain.state.balance(receiver.address) == 30
+
+    # On a side branch, against the side branch's own blocks
+    fork = make_block(blockchain.chain[2])
+    assert blockchain.accept_block(fork)[0] == "side"
+    assert blockchain.accept_block(make_block(fork))[0] == "invalid"
+
+    # The same payment made again is signed with a new nonce: a new transaction
+    repeat = Transaction(miner.address, miner.public_key, receiver.address, 30)
+    repeat.sign_transaction(miner.private_key)
+    assert repeat.tx_id != tx.tx_id
+    blockchain.mine_block(Block.encode_transactions([repeat]))
+    assert blockchain.state.balance(receiver.address) == 60
@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+from flask import Flask
+
+from src.block import Block
+from src.blockchain import Blockchain
+from src.node import Node
+from src.node_api import NodeAPI
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+
+def test_indexes_follow_appends_and_reorgs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    miner, receiver = Wallet(), Wallet()
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1, miner_address=miner.address)
+    blockchain.mine_block("empty")
+
+    transactions = []
+    for amount in (1, 2, 3):
+        tx = Transaction(miner.address, miner.public_key, receiver.address, amount)
+        tx.sign_transaction(miner.private_key)
+        transactions.append(tx)
+    block = blockchain.mine_block(Block.encode_transactions(transactions))
+
+    index = blockchain.index
+    assert index.block_height(block.hash) == 2
+    assert index.tx_location(transactions[1].tx_id) == (2, 1)
+
+    page, cursor = index.address_history(receiver.address, limit=2)
+    assert [row[2] for row in page] == [transactions[2].tx_id, transactions[1].tx_id]
+    page, cursor = index.address_history(receiver.address, cursor=cursor, limit=2)
+    assert [row[2] for row in page] == [transactions[0].tx_id]
+    assert cursor is None
+
+    # Reorg below the block drops its entries
+    blockchain.chain = blockchain.chain[:2]
+    blockchain.save_chain()
+    assert index.block_height(block.hash) is None
+    assert index.tx_location(transactions[0].tx_id) is None
+    assert index.tip == (1, blockchain.chain[1].hash)
+
+    # A transaction is indexed once, a second block with it is refused as a whole
+    blockchain.mine_block(Block.encode_transactions(transactions[:1]))
+    replay = Block(3, blockchain.chain[2].hash, Block.encode_transactions(transactions[:1]), miner.address)
+    with pytest.raises(sqlite3.IntegrityError):
+        index.add_blocks([replay])
+    assert index.tx_location(transactions[0].tx_id) == (2, 0)
+    assert index.block_height(replay.hash) is None and index.tip == (2, blockchain.chain[2].hash)
+    assert not blockchain.add_block(replay)
+    assert len(blockchain.chain) == len(blockchain.store) == 3
+    assert replay.hash not in blockchain.tree and blockchain.state.height == 2
+
+
+def test_address_history_page_size_is_clamped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    wallet = Wallet()
+    app = Flask("node_a")
+    node = Node(app=app, node_id="node_a", port=6001, mining_workers=1, miner_address=wallet.address)
+    NodeAPI(app, node)
+    node.mining_supervisor.stop()
+    node.blockchain.mine_block("empty")
+    transactions = []
+    for amount in (1, 2):
+        tx = Transaction(wallet.address, wallet.public_key, Wallet().address, amount)
+        tx.sign_transaction(wallet.private_key)
+        transactions.append(tx)
+    node.blockchain.mine_block(Block.encode_transactions(transactions))
+
+    client = app.test_client()
+    for limit, count in ((0, 1), (-5, 1), (1, 1), (500, 2)):
+        res = client.get(f"/address/{wallet.address}/txs", query_string={"limit": limit})
+        assert res.status_code == 200 and len(res.get_json()["txs"]) == count
+    node.tx_relay.stop()
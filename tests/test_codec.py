@@ -0,0 +1,104 @@
+import json
+from flask import Flask
+
+from src import codec
+from src.block import Block, MERKLE_VERSION, BITS_VERSION
+from src.block_store import BlockStore
+from src.node import Node
+from src.node_api import NodeAPI
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+
+def make_transaction(amount=12.5, fee=1, nonce=None):
+    sender = Wallet()
+    tx = Transaction(sender.address, sender.public_key, Wallet().address, amount, fee=fee, nonce=nonce)
+    tx.sign_transaction(sender.private_key)
+    return tx
+
+
+def test_records_round_trip_exactly():
+    tx = make_transaction()
+    blocks = [
+        Block(0, "empty_hash", "Genesis Block", miner="node_1"),
+        Block(1, "0" * 64, json.dumps(make_transaction(amount=3, fee=0).to_dict()), miner="node_1"),
+        Block(2, "0" * 64, Block.encode_transactions([tx, make_transaction(amount=-1)]), miner=tx.to_address, version=MERKLE_VERSION),
+        Block(3, "0" * 64, "empty", miner="node_1", difficulty=20, nonce=2 ** 40, version=BITS_VERSION),
+        Block(4, "0" * 64, Block.encode_transactions([make_transaction(nonce=0), tx]), miner="node_1", version=BITS_VERSION),
+    ]
+    for block in blocks:
+        record = block.to_record()
+        encoded = codec.encode_record(record)
+        assert codec.decode_record(encoded) == record
+        assert json.dumps(codec.decode_record(encoded)) == json.dumps(record)
+        assert len(encoded) < len(json.dumps(record))
+        assert codec.decode_block(encoded) == block
+
+    for tx in (tx, make_transaction(nonce=0)):
+        encoded = codec.encode_transaction(tx)
+        decoded = codec.decode_transaction(encoded)
+        assert decoded == tx and decoded.is_valid()
+        assert codec.peek_tx_id(encoded) == tx.tx_id
+
+
+def test_store_reads_json_and_binary_records(tmp_path):
+    block = Block(1, "0" * 64, Block.encode_transactions([make_transaction()]), miner="node_1", version=MERKLE_VERSION)
+    store = BlockStore(str(tmp_path / "blocks"))
+    store.append(block.to_record())
+    store.close()
+    store = BlockStore(str(tmp_path / "blocks"), binary=True)
+    store.append(block.to_record())
+    assert list(store.read_range()) == [block.to_record()] * 2
+
+
+def test_binary_block_is_accepted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = Flask("node_a")
+    node = Node(app=app, node_id="node_a", port=6001, mining_workers=1)
+    NodeAPI(app, node)
+    latest = node.blockchain.get_latest_block()
+    block = Block(1, latest.hash, "empty", "http://miner", difficulty=node.blockchain.next_difficulty(latest), version=BITS_VERSION)
+    block.mine_block()
+
+    client = app.test_client()
+    res = client.post("/receive_block", data=codec.pack_message("http://localhost:6002", codec.encode_block(block)),
+                      content_type=codec.CONTENT_TYPE)
+    assert res.status_code == 200
+    assert node.blockchain.get_latest_block().hash == block.hash
+
+    res = client.get("/chain", headers={"Accept": codec.CONTENT_TYPE})
+    frames = list(codec.iter_frames([res.get_data()]))
+    assert [codec.decode_block(f).hash for f in frames] == [b.hash for b in node.blockchain.chain]
+
+
+def test_malformed_blocks_are_rejected_with_400(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = Flask("node_a")
+    node = Node(app=app, node_id="node_a", port=6001, mining_workers=1)
+    NodeAPI(app, node)
+    client = app.test_client()
+
+    bad_key = {"from_address": "a", "from_public_key": "00" * 64, "to_address": "b", "amount": 1, "signature": "", "tx_id": ""}
+    for body in ({"miner": "http://localhost:6002", "block": {"index": 1}},
+                 {"miner": "http://localhost:6002", "block": {"transactions": [bad_key]}},
+                 {"miner": "http://localhost:6002", "block": None},
+                 ["not", "an", "object"]):
+        assert client.post("/receive_block", json=body).status_code == 400
+    res = client.post("/receive_block", data=codec.pack_message("http://localhost:6002", b"\x01garbage"),
+                      content_type=codec.CONTENT_TYPE)
+    assert res.status_code == 400
+
+
+def test_non_numeric_amounts_are_rejected_with_400(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = Flask("node_a")
+    node = Node(app=app, node_id="node_a", port=6001, mining_workers=1)
+    NodeAPI(app, node)
+    client = app.test_client()
+
+    tx = make_transaction()
+    for field, value in (("amount", "5"), ("amount", True), ("amount", float("nan")), ("fee", float("inf"))):
+        body = {"transaction": dict(tx.to_dict(), **{field: value})}
+        res = client.post("/submit_transaction", data=json.dumps(body), content_type="application/json")
+        assert res.status_code == 400 and res.get_json() == {"error": "Malformed transaction"}
+    assert len(node.mempool) == 0
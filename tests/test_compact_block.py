@@ -0,0 +1,63 @@
+from src import compact_block
+from src.block import Block
+from src.node import RELAY_BYTES
+from src.node_api import COMPACT_BLOCKS
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+
+def signed_tx(wallet, amount):
+    tx = Transaction(wallet.address, wallet.public_key, Wallet().address, amount, fee=1)
+    tx.sign_transaction(wallet.private_key)
+    return tx
+
+
+def test_match_and_rebuild():
+    wallet = Wallet()
+    txs = [signed_tx(wallet, 1), signed_tx(wallet, 2)]
+    block = Block(1, "0" * 64, Block.encode_transactions(txs), "miner", version=3)
+    compact = compact_block.make_compact(block)
+    assert len(compact["short_ids"]) == 2 and "transactions" not in compact["header"]
+
+    transactions, missing = compact_block.match_transactions(compact, [txs[1]])
+    assert missing == [0] and transactions[1] is txs[1]
+    transactions[0] = txs[0]
+    assert compact_block.rebuild(compact, transactions).to_record() == block.to_record()
+    assert compact_block.rebuild(compact, [txs[1], txs[0]]) is None  # Merkle root mismatch
+    # Legacy blocks hash the raw transactions string, they are relayed in full
+    assert compact_block.make_compact(Block(1, "0" * 64, "empty", "miner")) is None
+
+
+def test_compact_relay_fetches_only_missing_transactions(start_node):
+    wallet = Wallet()
+    node_a = start_node("node_a", miner_address=wallet.address)
+    node_a.blockchain.mine_block("empty")  # Funds the wallet
+    node_b = start_node("node_b")
+    node_b.blockchain.chain = list(node_a.blockchain.chain)
+    node_b.blockchain.save_chain()
+    node_b.blockchain.tree.reset(node_b.blockchain.chain)
+    node_a.peers = {node_b.node_url}
+
+    known, missing = signed_tx(wallet, 5), signed_tx(wallet, 6)
+    node_b.mempool.add(known)
+    block = node_a.blockchain.mine_block(Block.encode_transactions([known, missing]))
+
+    fetched_before = COMPACT_BLOCKS.get(outcome="fetched_missing")
+    node_a.broadcast_block(block)
+    assert node_b.blockchain.get_latest_block().hash == block.hash
+    assert COMPACT_BLOCKS.get(outcome="fetched_missing") == fetched_before + 1
+    assert known.tx_id not in node_b.mempool
+
+    # Announced again: node_b already has it, only the announcement is sent
+    sent = RELAY_BYTES.get(message="compact_block"), RELAY_BYTES.get(message="block")
+    node_a.broadcast_block(block)
+    assert (RELAY_BYTES.get(message="compact_block"), RELAY_BYTES.get(message="block")) == sent
+
+
+def test_malformed_inventory_is_rejected_with_400(start_node):
+    node = start_node("node_a")
+    client = node.app.test_client()
+    for body in (["not", "a", "dict"], {"blocks": "abc"}, {"blocks": [["abc"]]}, {"peer": node.node_url}):
+        assert client.post("/inv", json=body).status_code == 400
+    tip = node.blockchain.get_latest_block().hash
+    assert client.post("/inv", json={"blocks": [tip, "f" * 64]}).get_json() == {"want": ["f" * 64]}
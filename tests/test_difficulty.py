@@ -0,0 +1,52 @@
+from src import difficulty
+from src.block import Block, BITS_VERSION, BLOCK_VERSION
+from src.blockchain import Blockchain
+
+
+def test_bits_match_hex_digits_for_legacy_blocks():
+    block = Block(1, "0" * 64, "empty", "miner", difficulty=2)
+    block.mine_block()
+    assert block.hash.startswith("00")
+    assert block.difficulty_bits() == 8
+    assert difficulty.leading_zero_bits(block.hash) >= 8
+
+    bits_block = Block(1, "0" * 64, "empty", "miner", difficulty=6, version=BITS_VERSION)
+    bits_block.mine_block()
+    assert bits_block.meets_difficulty()
+    assert bits_block.work() == 2 ** 6
+
+
+def test_retarget_moves_toward_target_interval():
+    expected = difficulty.RETARGET_INTERVAL * difficulty.TARGET_BLOCK_TIME
+    assert difficulty.retarget(10, expected) == 10
+    assert difficulty.retarget(10, expected / 2) == 11  # Too fast: twice the work
+    assert difficulty.retarget(10, expected * 4) == 8
+    assert difficulty.retarget(10, 0.001) == 10 + difficulty.MAX_STEP
+    assert difficulty.retarget(1, expected * 100) == difficulty.MIN_BITS
+
+
+def test_validate_block_enforces_retargeted_difficulty(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(difficulty, "RETARGET_INTERVAL", 2)
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    for _ in range(4):
+        blockchain.mine_block("empty")  # Mined far faster than the target interval
+    # Block 1 inherits the genesis hex difficulty as bits, block 4 closes the window of blocks 1 to 3
+    assert [b.difficulty for b in blockchain.chain[1:]] == [4, 4, 4, 4 + difficulty.MAX_STEP]
+
+    latest = blockchain.get_latest_block()
+    for bits in (latest.difficulty, latest.difficulty + 1):
+        block = Block(latest.index + 1, latest.hash, "empty", "miner", difficulty=bits, version=BITS_VERSION)
+        block.mine_block()
+        assert blockchain.validate_block(block, latest) == (bits == latest.difficulty)
+    assert blockchain.validate_chain(blockchain.chain)
+
+
+def test_validate_block_rejects_unknown_versions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1)
+    latest = blockchain.mine_block("empty")
+    for version in (BLOCK_VERSION, BLOCK_VERSION + 1):
+        block = Block(latest.index + 1, latest.hash, "empty", "miner", difficulty=latest.difficulty, version=version)
+        block.mine_block()
+        assert blockchain.validate_block(block, latest) == (version == BLOCK_VERSION)
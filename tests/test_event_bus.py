@@ -0,0 +1,59 @@
+import json
+
+from src.event_bus import EventBus, event_stream
+
+
+def test_slow_subscriber_drops_oldest_events():
+    bus = EventBus(queue_size=3)
+    subscription = bus.subscribe()
+    for i in range(5):
+        bus.publish("log", f"message {i}")
+
+    events = bus.get(subscription, timeout=0)
+    assert events[0].type == "dropped" and events[0].data["count"] == 2
+    assert [e.data["message"] for e in events[1:]] == ["message 2", "message 3", "message 4"]
+    assert bus.get(subscription, timeout=0) == []
+
+
+def test_coalescing_keeps_latest_event_of_each_key():
+    bus = EventBus()
+    subscription = bus.subscribe()
+    bus.publish("hash_rate", "1 H/s", coalesce="hash_rate")
+    bus.publish("block", "block 1")
+    bus.publish("hash_rate", "2 H/s", coalesce="hash_rate")
+
+    events = bus.get(subscription, timeout=0)
+    assert [e.data["message"] for e in events] == ["block 1", "2 H/s"]
+
+
+def test_resume_from_last_event_id():
+    bus = EventBus(history=3)
+    seen = [bus.publish("log", f"message {i}") for i in range(2)]
+    for i in range(2, 6):
+        bus.publish("log", f"message {i}")
+
+    # History holds messages 3 to 5, message 2 is lost
+    subscription = bus.subscribe(last_event_id=seen[-1].id)
+    events = bus.get(subscription, timeout=0)
+    assert events[0].type == "dropped" and events[0].data["count"] == 1
+    assert [e.data["message"] for e in events[1:]] == ["message 3", "message 4", "message 5"]
+
+    up_to_date = bus.subscribe(last_event_id=bus.last_id)
+    assert bus.get(up_to_date, timeout=0) == []
+
+
+def test_event_stream_frames_and_unsubscribes():
+    bus = EventBus(max_subscribers=1)
+    subscription = bus.subscribe()
+    assert bus.subscribe() is None
+    event = bus.publish("block", "block 1", index=1)
+
+    stream = event_stream(bus, subscription, heartbeat=0)
+    assert next(stream).startswith("retry:")
+    frame = next(stream)
+    assert frame.startswith(f"id: {event.id}\n")
+    assert json.loads(frame.split("data: ", 1)[1]) == {"id": event.id, "type": "block", "index": 1, "message": "block 1"}
+    assert next(stream) == ": keep-alive\n\n"
+
+    stream.close()
+    assert bus.subscriptions == set()
@@ -0,0 +1,158 @@
+import time
+
+from flask import Flask
+
+from src import codec
+from src import gossip
+from src.gossip import SeenFilter
+from src.node import Node
+from src.node_api import NodeAPI
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_seen_filter_is_bounded_in_size_and_time(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(gossip.time, "monotonic", lambda: now[0])
+    seen = SeenFilter(max_size=2, window=10)
+    assert seen.add("a") and seen.add("b")
+    assert not seen.add("a")
+    seen.add("c")  # Evicts the oldest
+    assert "a" not in seen and "b" in seen and len(seen) == 2
+    now[0] = 15
+    assert "c" not in seen
+    assert seen.add("c")
+
+
+def test_fanout_is_bounded_and_skips_the_origin(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    node = Node(app=Flask("node_a"), node_id="node_a", port=6001, mining_workers=1)
+    node.tx_relay.stop()
+    node.peers = {f"http://peer{i}" for i in range(20)}
+    offered = {}
+    monkeypatch.setattr(node.tx_relay, "_offer", lambda peer, txs: offered.setdefault(peer, txs))
+    wallet = Wallet()
+    txs = []
+    for amount in (1, 2):
+        tx = Transaction(wallet.address, wallet.public_key, Wallet().address, amount)
+        tx.sign_transaction(wallet.private_key)
+        txs.append(tx)
+
+    node.tx_relay.relay(txs[0], origin="http://peer0")
+    node.tx_relay.relay(txs[1])
+    node.tx_relay.flush()
+    assert len(offered) == gossip.FANOUT
+    for peer, offer in offered.items():
+        assert offer == (txs[1:] if peer == "http://peer0" else txs)
+    node.mining_supervisor.stop()
+
+
+def test_relay_thread_survives_a_failed_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    node = Node(app=Flask("node_a"), node_id="node_a", port=6001, mining_workers=1)
+    announced = []
+    def announce(batch):
+        announced.append(batch)
+        if len(announced) == 1:
+            raise RuntimeError("Set changed size during iteration")
+    monkeypatch.setattr(node.tx_relay, "_announce", announce)
+    node.tx_relay.interval = 0.01
+
+    node.tx_relay.relay("first")
+    assert wait_for(lambda: len(announced) == 1)
+    node.tx_relay.relay("second")
+    assert wait_for(lambda: len(announced) == 2)
+    assert node.tx_relay.thread.is_alive()
+    node.tx_relay.stop()
+    node.mining_supervisor.stop()
+
+
+def test_gossip_reaches_peers_once(start_node, monkeypatch):
+    wallet = Wallet()
+    node_a = start_node("node_a", miner_address=wallet.address)
+    node_a.blockchain.mine_block("empty")  # Funds the wallet
+    node_b, node_c = start_node("node_b"), start_node("node_c")
+    for node in (node_a, node_b, node_c):
+        node.mining_supervisor.stop()  # Mining would take the transaction out of the mempools
+    for node in (node_b, node_c):
+        node.blockchain.chain = list(node_a.blockchain.chain)
+        node.blockchain.save_chain()
+        node.blockchain.tree.reset(node.blockchain.chain)
+    node_a.peers = {node_b.node_url, node_c.node_url}
+    node_b.peers = {node_a.node_url, node_c.node_url}
+    node_c.peers = {node_a.node_url, node_b.node_url}
+
+    verified = []
+    verify, verify_batch = node_c.verifier.verify, node_c.verifier.verify_batch
+    monkeypatch.setattr(node_c.verifier, "verify", lambda tx: verified.append(tx.tx_id) or verify(tx))
+    monkeypatch.setattr(node_c.verifier, "verify_batch", lambda txs: verified.extend(tx.tx_id for tx in txs) or verify_batch(txs))
+
+    tx = Transaction(wallet.address, wallet.public_key, Wallet().address, 5, fee=1)
+    tx.sign_transaction(wallet.private_key)
+    res = node_a.app.test_client().post("/submit_transaction", json={"transaction": tx.to_dict()})
+    assert res.status_code == 200
+    assert wait_for(lambda: tx.tx_id in node_b.mempool and tx.tx_id in node_c.mempool)
+    time.sleep(3 * gossip.RELAY_INTERVAL)  # node_b and node_c announce it to each other: both already have it
+    assert verified == [tx.tx_id]
+
+    # A repeat is dropped by the seen filter before it is decoded or verified
+    body = codec.pack_message(node_b.node_url, codec.encode_transaction(tx))
+    res = node_c.app.test_client().post("/submit_transaction", data=body, content_type=codec.CONTENT_TYPE)
+    assert res.status_code == 400 and res.get_json() == {"message": "Duplicate transaction"}
+    assert verified == [tx.tx_id]
+
+
+def test_malformed_gossip_is_rejected_with_400(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = Flask("node_a")
+    node = Node(app=app, node_id="node_a", port=6001, mining_workers=1)
+    NodeAPI(app, node)
+    client = app.test_client()
+
+    for body in (["not", "an", "object"], {"tx_ids": "abc"}, {"tx_ids": [["abc"]]}, {"tx_ids": [{}]}):
+        assert client.post("/tx_inv", json=body).status_code == 400
+    assert client.post("/tx_inv", json={"tx_ids": ["abc"], "peer": ["x"]}).get_json() == {"want": ["abc"]}
+    for body in (["not", "an", "object"], {"transactions": "abc"}, {"transactions": None}):
+        assert client.post("/submit_transactions", json=body).status_code == 400
+    res = client.post("/submit_transactions", json={"transactions": [{"tx_id": ["abc"]}]})
+    assert res.status_code == 200 and res.get_json()["rejected"] == 1
+    node.tx_relay.stop()
+    node.mining_supervisor.stop()
+
+
+def test_gossiped_batch_is_verified_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    wallet = Wallet()
+    app = Flask("node_a")
+    node = Node(app=app, node_id="node_a", port=6001, mining_workers=1, miner_address=wallet.address)
+    NodeAPI(app, node)
+    node.mining_supervisor.stop()
+    node.tx_relay.stop()
+    node.blockchain.mine_block("empty")  # Funds the wallet
+
+    txs = []
+    for amount in (1, 2, 3):
+        tx = Transaction(wallet.address, wallet.public_key, Wallet().address, amount, fee=1)
+        tx.sign_transaction(wallet.private_key)
+        txs.append(tx)
+    txs[2].signature = txs[0].signature  # Forged
+
+    checked = []
+    is_valid = Transaction.is_valid
+    monkeypatch.setattr(Transaction, "is_valid", lambda tx: checked.append(tx.tx_id) or is_valid(tx))
+    batches = []
+    verify_batch = node.verifier.verify_batch
+    monkeypatch.setattr(node.verifier, "verify_batch", lambda batch: batches.append(len(batch)) or verify_batch(batch))
+
+    res = app.test_client().post("/submit_transactions", json={"transactions": [tx.to_dict() for tx in txs]})
+    assert res.get_json() == {"accepted": 2, "duplicate": 0, "rejected": 1}
+    assert batches == [3] and sorted(checked) == sorted(tx.tx_id for tx in txs)
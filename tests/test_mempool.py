@@ -0,0 +1,45 @@
+from src.wallet import Wallet
+from src.transaction import Transaction
+from src.mempool import Mempool
+
+
+def make_transaction(wallet, amount, fee=0):
+    tx = Transaction(wallet.address, wallet.public_key, Wallet().address, amount, fee=fee)
+    tx.sign_transaction(wallet.private_key)
+    return tx
+
+
+def test_select_by_fee_rate():
+    wallet = Wallet()
+    mempool = Mempool()
+    low, high, free = make_transaction(wallet, 1, fee=1), make_transaction(wallet, 2, fee=50), make_transaction(wallet, 3)
+    for tx in (low, high, free):
+        assert mempool.add(tx)
+    assert not mempool.add(high)  # Duplicate
+
+    assert mempool.select(2) == [high, low]
+    assert len(mempool) == 3
+
+    mempool.remove(high.tx_id)
+    assert high.tx_id not in mempool
+    assert mempool.select(5) == [low, free]
+
+
+def test_evicts_lowest_fee_rate():
+    wallet = Wallet()
+    mempool = Mempool(max_transactions=2)
+    cheap = make_transaction(wallet, 1, fee=1)
+    mempool.add(cheap)
+    mempool.add(make_transaction(wallet, 2, fee=10))
+    assert mempool.add(make_transaction(wallet, 3, fee=20))
+    assert cheap.tx_id not in mempool
+    assert not mempool.add(make_transaction(wallet, 4))  # Too cheap to get in
+    assert len(mempool) == 2
+
+
+def test_fee_is_signed():
+    wallet = Wallet()
+    tx = make_transaction(wallet, 5, fee=2)
+    assert tx.is_valid()
+    tx.fee = 0
+    assert not tx.is_valid()
@@ -0,0 +1,34 @@
+from src.block import Block, MERKLE_VERSION
+from src.merkle import merkle_root, merkle_proof, verify_proof
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+
+def test_proofs_verify():
+    for count in range(1, 8):
+        tx_ids = [f"{i:064x}" for i in range(count)]
+        root = merkle_root(tx_ids)
+        for position, tx_id in enumerate(tx_ids):
+            proof = merkle_proof(tx_ids, position)
+            assert verify_proof(tx_id, proof, root)
+            assert not verify_proof("f" * 64, proof, root)
+
+
+def test_block_versions():
+    wallet = Wallet()
+    a, b, c = [Transaction(wallet.address, wallet.public_key, "receiver", amount) for amount in (1, 2, 3)]
+    transactions = Block.encode_transactions([a, b])
+
+    legacy = Block(1, "previous_hash", transactions, miner="test_node")
+    assert "version" not in legacy.to_record()
+    assert legacy.get_merkle_proof(a.tx_id) is None
+
+    block = Block(1, "previous_hash", transactions, miner="test_node", version=MERKLE_VERSION)
+    assert block.merkle_root == merkle_root([a.tx_id, b.tx_id])
+    assert verify_proof(b.tx_id, block.get_merkle_proof(b.tx_id), block.to_header()["merkle_root"])
+    assert Block.from_record(block.to_record()) == block
+
+    # The body only reaches the hash through the Merkle root
+    block.transactions = Block.encode_transactions([a, c])
+    assert block.calculate_hash() == block.hash
+    assert block.compute_merkle_root() != block.merkle_root
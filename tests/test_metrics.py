@@ -0,0 +1,43 @@
+from flask import Flask
+
+from src import metrics
+from src.node import Node
+from src.node_api import NodeAPI
+
+
+def test_registry_renders_prometheus_text():
+    registry = metrics.Registry()
+    requests = registry.counter("requests_total", "Requests")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    requests.inc(peer='http://a"')
+    requests.inc(2, peer='http://a"')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+    assert registry.counter("requests_total", "Requests") is requests
+
+    text = registry.render()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{peer="http://a\\""} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text
+
+
+def test_metrics_endpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    app = Flask("node_a")
+    node = Node(app=app, node_id="node_a", port=6001, mining_workers=1)
+    NodeAPI(app, node)
+    validated = metrics.REGISTRY.metrics["block_validation_seconds"].get()[0]
+    node.blockchain.mine_block("empty")
+    node.blockchain.validate_chain(node.blockchain.chain)
+
+    res = app.test_client().get("/metrics")
+    assert res.status_code == 200
+    text = res.get_data(as_text=True)
+    assert "chain_height 1" in text
+    assert "mempool_transactions 0" in text
+    assert 'miner_hashes_total{worker="in-process"}' in text
+    assert metrics.REGISTRY.metrics["block_validation_seconds"].get()[0] == validated + 1
@@ -0,0 +1,27 @@
+from threading import Event
+from src.block import Block
+from src.miner import Miner
+
+
+def test_parallel_mining():
+    miner = Miner(workers=2, chunk=500)
+    block = Block(1, "previous_hash", "empty", miner="test_node", difficulty=3)
+    try:
+        new_hash = miner.mine(block)
+    finally:
+        miner.shutdown()
+
+    assert new_hash.startswith("000")
+    assert new_hash == block.calculate_hash()
+    assert miner.last_report["hashes"] > 0
+
+
+def test_parallel_mining_stopped():
+    stop_event = Event()
+    stop_event.set()
+    miner = Miner(workers=2, chunk=500)
+    block = Block(1, "previous_hash", "empty", miner="test_node", difficulty=64)
+    try:
+        assert miner.mine(block, stop_event=stop_event) is None
+    finally:
+        miner.shutdown()
@@ -0,0 +1,43 @@
+import time
+from flask import Flask
+
+from src.node import Node
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_one_block_per_request_and_restart_on_tip_change(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    node = Node(app=Flask("node_a"), node_id="node_a", port=6001, mining_workers=1)
+    node.blockchain.difficulty = 1
+    monkeypatch.setattr(node, "broadcast_block", lambda block: None)
+
+    # Concurrent requests are queued on the single supervisor thread, never mined side by side
+    node.start_mining()
+    node.start_mining()
+    assert wait_for(lambda: len(node.blockchain.chain) == 3 and not node.is_mining)
+    assert [b.index for b in node.blockchain.chain] == [0, 1, 2]
+
+    # A tip change aborts the PoW run in progress and mining starts over on a new template
+    original_mine_block = node.blockchain.mine_block
+    templates = []
+    def slow_mine_block(transactions, stop_event=None):
+        templates.append(node.blockchain.get_latest_block().index)
+        if len(templates) == 1:
+            stop_event.wait(5)
+            return None
+        return original_mine_block(transactions, stop_event)
+    monkeypatch.setattr(node.blockchain, "mine_block", slow_mine_block)
+    node.start_mining()
+    assert wait_for(lambda: node.is_mining)
+    node.mining_supervisor.notify_tip_changed()
+    assert wait_for(lambda: len(node.blockchain.chain) == 4 and not node.is_mining)
+    assert templates == [2, 2]
+    node.mining_supervisor.stop()
@@ -0,0 +1,54 @@
+import pytest
+
+from src.block import Block
+from src.blockchain import Blockchain
+from src.snapshot import SnapshotError, export_snapshot, import_snapshot, read_manifest
+from src.transaction import Transaction
+from src.wallet import Wallet
+
+
+def make_blockchain(blocks):
+    miner, receiver = Wallet(), Wallet()
+    blockchain = Blockchain(node_id="source", difficulty=1, mining_workers=1, miner_address=miner.address)
+    for amount in range(1, blocks + 1):
+        tx = Transaction(miner.address, miner.public_key, receiver.address, amount, fee=1)
+        tx.sign_transaction(miner.private_key)
+        blockchain.mine_block(Block.encode_transactions([tx]) if amount > 1 else "empty")
+    return blockchain, receiver
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source, receiver = make_blockchain(7)
+    manifest = export_snapshot(source, "chain.snap", chunk_blocks=3)
+    assert [chunk["blocks"] for chunk in read_manifest("chain.snap")["chunks"]] == [3, 3, 2]
+
+    for workers in (1, 2):
+        node_id = f"copy_{workers}"
+        assert import_snapshot("chain.snap", node_id, workers=workers) == manifest
+        copy = Blockchain(node_id=node_id, difficulty=1, mining_workers=1)
+        assert [block.hash for block in copy.chain] == [block.hash for block in source.chain]
+        assert copy.checkpoint == {"height": 7, "hash": source.chain[-1].hash}
+        assert copy.state.balance(receiver.address) == source.state.balance(receiver.address) == sum(range(2, 8))
+        tx_id = source.chain[5].get_transactions()[0].tx_id
+        assert copy.index.tx_location(tx_id) == (5, 0)
+        assert copy.index.tip == (7, source.chain[-1].hash)
+
+    with pytest.raises(SnapshotError):
+        import_snapshot("chain.snap", "copy_1", workers=1)  # Already has a chain
+
+
+def test_corrupted_chunk_is_rejected_before_anything_is_replaced(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source, _ = make_blockchain(5)
+    manifest = export_snapshot(source, "chain.snap", chunk_blocks=2)
+    with open("chain.snap", "r+b") as f:
+        f.seek(manifest["chunks"][1]["offset"] + 3)
+        byte = f.read(1)
+        f.seek(-1, 1)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    with pytest.raises(SnapshotError, match="Block 2: chunk checksum mismatch"):
+        import_snapshot("chain.snap", "copy", workers=1)
+    assert not (tmp_path / "blockchain" / "blocks_copy.dat").exists()
+    assert not (tmp_path / "blockchain" / "blocks_copy.import.dat").exists()
@@ -0,0 +1,101 @@
+import json
+from urllib.parse import urlparse
+from flask import Flask
+from src.node import Node
+from src.node_api import NodeAPI
+
+
+class FakeResponse:
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.ok = response.status_code < 400
+        self.headers = response.headers
+        self._data = response.get_data()
+
+    def json(self):
+        return json.loads(self._data)
+
+    def iter_lines(self):
+        return iter(self._data.splitlines())
+
+    def iter_content(self, chunk_size=1):
+        return (self._data[i:i + chunk_size] for i in range(0, len(self._data), chunk_size))
+
+    def close(self):
+        pass
+
+
+def make_node(node_id, port):
+    app = Flask(node_id)
+    node = Node(app=app, node_id=node_id, port=port, mining_workers=1)
+    node.blockchain.difficulty = 1
+    NodeAPI(app, node)
+    return node
+
+
+def test_headers_first_sync(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    node_a = make_node("node_a", 6001)
+    node_b = make_node("node_b", 6002)
+
+    # Node B starts from A's genesis, A then mines ahead
+    node_b.blockchain.chain = node_a.blockchain.chain[:1]
+    node_b.blockchain.save_chain()
+    node_b.blockchain.tree.reset(node_b.blockchain.chain)
+    for _ in range(5):
+        node_a.blockchain.mine_block("empty")
+
+    requested = []
+    client = node_a.app.test_client()
+    def fake_request(method, url, params=None, timeout=None, headers=None, **kwargs):
+        path = urlparse(url).path
+        requested.append((path, params))
+        return FakeResponse(client.get(path, query_string=params, headers=headers))
+    monkeypatch.setattr(node_b.peer_client.session, "request", fake_request)
+    monkeypatch.setattr(node_b, "register_with_peers", lambda: None)
+
+    node_b.peers = {node_a.node_url}
+    node_b.sync_chain()
+
+    assert [b.hash for b in node_b.blockchain.chain] == [b.hash for b in node_a.blockchain.chain]
+    assert requested == [("/headers", {"from": 0, "count": 2000}), ("/blocks", {"from": 1, "to": 5})]
+    assert node_b.peer_client.get_stats()[node_a.node_url]["requests"] == 2
+
+
+def test_blocks_stream_as_ndjson(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    node = make_node("node_a", 6001)
+    for _ in range(3):
+        node.blockchain.mine_block("empty")
+    client = node.app.test_client()
+
+    res = client.get("/blocks", query_string={"from": 1}, headers={"Accept": "application/x-ndjson"})
+    assert res.mimetype == "application/x-ndjson"
+    lines = res.get_data().splitlines()
+    assert [json.loads(line)["index"] for line in lines] == [1, 2, 3]
+
+    chain = client.get("/chain").get_json()
+    assert [b["hash"] for b in chain] == [b.hash for b in node.blockchain.chain]
+
+    # A tampered block stops the download at that block
+    records = [json.loads(line) for line in lines]
+    records[1]["nonce"] += 1
+    tampered = FakeResponse(client.get("/chain"))
+    tampered.headers = {"Content-Type": "application/x-ndjson"}
+    tampered._data = b"\n".join(json.dumps(r).encode() for r in records)
+    node.peer_client.session.request = lambda *args, **kwargs: tampered
+    node.blockchain.chain = node.blockchain.chain[:1]
+    node.blockchain.save_chain()
+    node.blockchain.tree.reset(node.blockchain.chain)
+    assert node.fetch_blocks("http://peer", 1, 3) is None
+    assert len(node.blockchain.chain) == 2
+
+
+def test_independently_started_nodes_share_the_genesis_block(start_node):
+    node_a = start_node("node_a")
+    node_b = start_node("node_b")
+    assert node_a.blockchain.chain[0].hash == node_b.blockchain.chain[0].hash
+    node_a.blockchain.mine_block("empty")
+
+    node_b.sync_chain(peers=[node_a.node_url])
+    assert [b.hash for b in node_b.blockchain.chain] == [b.hash for b in node_a.blockchain.chain]
@@ -0,0 +1,76 @@
+import json
+
+from src.block import Block, BLOCK_VERSION
+from src.blockchain import Blockchain
+from src.transaction import Transaction
+from src.validation import ValidationPipeline, check_block
+from src.wallet import Wallet
+
+
+def make_blocks(count, tamper_at=None):
+    wallet = Wallet()
+    blocks = []
+    previous_hash = "0" * 64
+    for index in range(1, count + 1):
+        tx = Transaction(wallet.address, wallet.public_key, Wallet().address, index)
+        tx.sign_transaction(wallet.private_key)
+        if index == tamper_at:
+            tx.signature = tx.signature[::-1]
+        block = Block(index, previous_hash, Block.encode_transactions([tx]), "miner", difficulty=1, version=BLOCK_VERSION)
+        block.mine_block()
+        blocks.append(block)
+        previous_hash = block.hash
+    return blocks
+
+
+def test_pipeline_yields_blocks_in_order_and_stops_at_the_first_invalid():
+    blocks = make_blocks(9, tamper_at=6)
+    for parallel in (False, True):
+        pipeline = ValidationPipeline(workers=2, batch_size=2)
+        results = list(pipeline.checked(iter(blocks), parallel))
+        pipeline.shutdown()
+        assert [block.index for block, _ in results] == [1, 2, 3, 4, 5, 6]
+        assert [error for _, error in results[:5]] == [None] * 5
+        assert "invalid signature" in results[5][1]
+
+
+def test_blocks_with_non_numeric_amounts_are_invalid():
+    wallet = Wallet()
+    tx = Transaction(wallet.address, wallet.public_key, Wallet().address, float("nan"))
+    tx.sign_transaction(wallet.private_key)
+    block = Block(1, "0" * 64, [tx], "miner", difficulty=1, version=BLOCK_VERSION)
+    block.mine_block()
+    assert "invalid amount" in check_block(block)
+
+    data = dict(tx.to_dict(), amount="5")
+    block = Block(1, "0" * 64, json.dumps([data]), "miner", difficulty=1, version=BLOCK_VERSION, merkle_root="0" * 64)
+    block.mine_block()
+    assert "malformed transactions" in check_block(block)
+
+
+def test_validate_chain_checks_signatures_and_linkage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(node_id="test", difficulty=1, mining_workers=1, validation_workers=2)
+    blockchain.validator.batch_size = 2
+    monkeypatch.setattr("src.blockchain.PARALLEL_THRESHOLD", 4)
+    genesis = blockchain.chain[0]
+
+    chain = [genesis]
+    wallet = Wallet()
+    for index in range(1, 7):
+        tx = Transaction(wallet.address, wallet.public_key, Wallet().address, index)
+        tx.sign_transaction(wallet.private_key)
+        block = Block(index, chain[-1].hash, Block.encode_transactions([tx]), "miner",
+                      difficulty=blockchain.next_difficulty(chain[-1], chain.__getitem__), version=BLOCK_VERSION)
+        block.mine_block()
+        chain.append(block)
+    assert blockchain.validate_chain(chain)
+    assert not blockchain.validate_chain(chain[:3] + chain[4:])  # Broken linkage, caught in order
+
+    forged = Transaction.from_dict(chain[5].get_transactions()[0].to_dict())
+    forged.signature = forged.signature[::-1]
+    tampered = Block(5, chain[4].hash, Block.encode_transactions([forged]), "miner",
+                     difficulty=chain[5].difficulty, version=BLOCK_VERSION)
+    tampered.mine_block()
+    assert not blockchain.validate_chain(chain[:5] + [tampered])
+    blockchain.validator.shutdown()
@@ -0,0 +1,56 @@
+from src.block import Block, BLOCK_VERSION
+from src.state import AccountState
+from src.transaction import Transaction
+from src.validation import check_block
+from src.verifier import SignatureVerifier
+from src.wallet import Wallet
+
+
+def make_transaction(wallet, amount):
+    tx = Transaction(wallet.address, wallet.public_key, "receiver", amount)
+    tx.sign_transaction(wallet.private_key)
+    return tx
+
+
+def test_verified_transactions_are_cached():
+    wallet = Wallet()
+    verifier = SignatureVerifier(workers=1)
+    tx = make_transaction(wallet, 10)
+    assert verifier.verify(tx)
+    assert verifier.is_verified(tx)
+
+    # Same tx_id and signature over different content must not hit the cache
+    forged = Transaction(wallet.address, wallet.public_key, "receiver", 1000, signature=tx.signature, tx_id=tx.tx_id)
+    assert not verifier.verify(forged)
+
+
+def test_verify_batch_on_worker_pool():
+    wallet = Wallet()
+    verifier = SignatureVerifier(workers=2)
+    transactions = [make_transaction(wallet, amount) for amount in range(20)]
+    transactions[5].signature = transactions[6].signature
+    try:
+        results = verifier.verify_batch(transactions)
+    finally:
+        verifier.shutdown()
+    assert results == [i != 5 for i in range(20)]
+    assert verifier.is_verified(transactions[0])
+    assert not verifier.is_verified(transactions[5])
+
+
+def test_sender_address_must_belong_to_the_signing_key():
+    victim, attacker = Wallet(), Wallet()
+    theft = Transaction(victim.address, attacker.public_key, attacker.address, 40)
+    theft.sign_transaction(attacker.private_key)
+    assert theft.is_valid()  # The signature itself is fine
+    assert not theft.sender_matches_key()
+
+    verifier = SignatureVerifier(workers=1)
+    assert not verifier.verify(theft)
+    assert verifier.verify_batch([theft, make_transaction(attacker, 1)]) == [False, True]
+
+    state = AccountState({victim.address: 100})
+    assert state.affordable([theft]) == []
+    block = Block(1, "0" * 64, Block.encode_transactions([theft]), "miner", difficulty=1, version=BLOCK_VERSION)
+    block.mine_block()
+    assert "not the address of its key" in check_block(block)